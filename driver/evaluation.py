@@ -1,5 +1,158 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import Counter
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Tuple, NamedTuple, Optional
+
+class QueryResult(NamedTuple):
+    """Outcome of one query of a batch: the rows (or their fingerprint), or the error raised, and the latency"""
+    rows: Optional[List[Dict]]
+    error: Optional[Exception]
+    latency_ms: float
+
+class QueryRejected(Exception):
+    """Raised instead of executing a query that a pre-check (e.g. the plan cost) refused"""
+
+class ResultFingerprint(NamedTuple):
+    """
+    Summary of a result set that is enough to compare two results for equality.
+
+    unordered is a multiset hash (equal for the same rows in any order),
+    ordered also depends on the row order; either is None when not requested.
+    """
+    row_count: int
+    unordered: Optional[str]
+    ordered: Optional[str]
+
+FINGERPRINT_MODES = ("unordered", "ordered", "both")
+
+def normalize_value(value):
+    """Canonical, hashable form of a result value, shared by result comparison and fingerprints"""
+    if isinstance(value, float):
+        return round(value, 9)
+    elif isinstance(value, (int, str, bool)) or value is None:
+        return value
+    elif hasattr(value, "isoformat"):
+        return value.isoformat()
+    elif hasattr(value, "total_seconds"):
+        return str(value)
+    elif isinstance(value, (list, tuple)):
+        return tuple(normalize_value(v) for v in value)
+    elif isinstance(value, dict):
+        return tuple(sorted((k, normalize_value(v)) for k, v in value.items()))
+    else:
+        return str(value)
+
+# Tolerance for floats in compare_rows (e.g. avg() computed in a different order)
+FLOAT_REL_TOL = 1e-6
+FLOAT_ABS_TOL = 1e-9
+# Rows left unmatched by hash beyond which compare_rows gives up on tolerant matching
+MAX_TOLERANT_ROWS = 1000
+
+def normalize_row(row: Dict) -> tuple:
+    """Canonical form of a result row: its normalized values in column order (column names are ignored)"""
+    return tuple(normalize_value(v) for v in row.values())
+
+def values_close(a, b) -> bool:
+    """Equality of normalized values, with floats compared up to FLOAT_REL_TOL / FLOAT_ABS_TOL"""
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return len(a) == len(b) and all(values_close(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        numbers = (int, float)
+        if isinstance(a, numbers) and isinstance(b, numbers) and not isinstance(a, bool) and not isinstance(b, bool):
+            return math.isclose(a, b, rel_tol=FLOAT_REL_TOL, abs_tol=FLOAT_ABS_TOL)
+    return a == b
+
+def compare_rows(res_gold: List[Dict], res_predict: List[Dict]) -> bool:
+    """
+    Whether two results hold the same rows as multisets (row order is ignored,
+    duplicates count). Rows are matched by the hash of their normalized values
+    in linear time; only the rows left unmatched are compared pairwise with
+    float tolerance.
+    """
+    if len(res_gold) != len(res_predict):
+        return False
+    balance = Counter(normalize_row(row) for row in res_gold)
+    balance.subtract(normalize_row(row) for row in res_predict)
+    missing = list((+balance).elements())
+    if not missing:
+        return True
+    extra = list((-balance).elements())
+    if len(missing) > MAX_TOLERANT_ROWS:
+        return False
+    for row in missing:
+        for i, candidate in enumerate(extra):
+            if values_close(row, candidate):
+                extra[i] = extra[-1]
+                extra.pop()
+                break
+        else:
+            return False
+    return True
+
+# Significant digits kept by fingerprints, matching the relative tolerance of compare_rows
+FINGERPRINT_FLOAT_DIGITS = round(-math.log10(FLOAT_REL_TOL))
+
+def fingerprint_value(value):
+    """
+    Form of a normalized value that is hashed by fingerprints. Numbers that
+    compare_rows treats as equal hash alike: integral floats (and bools)
+    become ints, other floats are rounded to FINGERPRINT_FLOAT_DIGITS
+    significant digits. Floats that straddle a rounding boundary can still
+    fingerprint differently, so fingerprint EA is marginally stricter.
+    """
+    if isinstance(value, tuple):
+        return tuple(fingerprint_value(v) for v in value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float):
+        if abs(value) <= FLOAT_ABS_TOL:
+            return 0
+        value = float(f"{value:.{FINGERPRINT_FLOAT_DIGITS}g}")
+        return int(value) if value.is_integer() else value
+    return value
+
+class ResultFingerprinter:
+    """
+    Incrementally fingerprints a stream of result rows (dicts), keeping only
+    the running hashes: each row is normalized (see fingerprint_value), hashed with BLAKE2b, and
+    either summed modulo 2**128 (unordered) or chained (ordered).
+    """
+    _MASK = (1 << 128) - 1
+
+    def __init__(self, mode: str = "both"):
+        if mode not in FINGERPRINT_MODES:
+            raise ValueError(f"Unknown fingerprint mode: {mode} (expected one of {FINGERPRINT_MODES})")
+        self.row_count = 0
+        self._unordered = 0 if mode in ("unordered", "both") else None
+        self._ordered = hashlib.blake2b(digest_size=16) if mode in ("ordered", "both") else None
+
+    def add(self, row: Dict):
+        digest = hashlib.blake2b(
+            repr(fingerprint_value(normalize_row(row))).encode("utf-8"), digest_size=16
+        ).digest()
+        self.row_count += 1
+        if self._unordered is not None:
+            self._unordered = (self._unordered + int.from_bytes(digest, "big")) & self._MASK
+        if self._ordered is not None:
+            self._ordered.update(digest)
+
+    def result(self) -> ResultFingerprint:
+        return ResultFingerprint(
+            self.row_count,
+            f"{self._unordered:032x}" if self._unordered is not None else None,
+            self._ordered.hexdigest() if self._ordered is not None else None,
+        )
+
+def _timed(fn, *args) -> QueryResult:
+    start = time.perf_counter()
+    try:
+        value, error = fn(*args), None
+    except Exception as e:
+        value, error = None, e
+    return QueryResult(value, error, round((time.perf_counter() - start) * 1000, 3))
 
 class DatabaseDriver(ABC):
     """Database Driver Interface"""
@@ -8,19 +161,118 @@ class DatabaseDriver(ABC):
         """Establish connection"""
         pass
 
+    def is_connected(self) -> bool:
+        """Whether connect() succeeded (adapters that report connection errors instead of raising override this)"""
+        return True
+
     @abstractmethod
     def query(self, cypher: str, db_name: str) -> Union[List[Dict], None]:
         """Execute the query and return the result list; return None if an error occurs."""
         pass
 
+    def execute(self, cypher: str, db_name: str, guard: bool = False) -> List[Dict]:
+        """
+        Execute the query and return the result list; raise if an error occurs.
+        guard applies the driver's pre-execution checks (e.g. a cost guard) to
+        the query; drivers without such checks ignore it.
+        """
+        result = self.query(cypher, db_name)
+        if result is None:
+            raise RuntimeError("Query execution failed")
+        return result
+
+    def query_many(self, queries: List[Tuple]) -> List[QueryResult]:
+        """
+        Execute (cypher, db_name) pairs, or (cypher, db_name, guard) triples,
+        and return one QueryResult per entry, in order.
+        """
+        return [_timed(self.execute, *query) for query in queries]
+
+    def fingerprint(self, cypher: str, db_name: str, mode: str = "both", guard: bool = False) -> ResultFingerprint:
+        """
+        Execute the query and return the ResultFingerprint of its rows; raise if an error occurs.
+        Drivers that can stream results should override this so that no rows are kept in memory.
+        """
+        fingerprinter = ResultFingerprinter(mode)
+        for row in self.execute(cypher, db_name, guard):
+            fingerprinter.add(row)
+        return fingerprinter.result()
+
+    def fingerprint_many(self, queries: List[Tuple], mode: str = "both") -> List[QueryResult]:
+        """Like query_many, with the ResultFingerprint of each query in place of its rows."""
+        return [_timed(self.fingerprint, cypher, db_name, mode, *guard) for cypher, db_name, *guard in queries]
+
     @abstractmethod
     def close(self):
         """Close connection"""
         pass
 
+class AsyncDatabaseDriver(ABC):
+    """Asynchronous Database Driver Interface"""
+    @abstractmethod
+    async def connect(self):
+        """Establish connection"""
+        pass
+
+    def is_connected(self) -> bool:
+        """Whether connect() succeeded (adapters that report connection errors instead of raising override this)"""
+        return True
+
+    @abstractmethod
+    async def execute(self, cypher: str, db_name: str, guard: bool = False) -> List[Dict]:
+        """Execute the query and return the result list; raise if an error occurs (see DatabaseDriver.execute for guard)."""
+        pass
+
+    async def query(self, cypher: str, db_name: str) -> Union[List[Dict], None]:
+        """Execute the query and return the result list; return None if an error occurs."""
+        try:
+            return await self.execute(cypher, db_name)
+        except Exception:
+            return None
+
+    async def query_many(self, queries: List[Tuple], max_in_flight: int = 64) -> List[QueryResult]:
+        """
+        Execute (cypher, db_name) pairs, or (cypher, db_name, guard) triples, with
+        at most max_in_flight queries outstanding, and return one QueryResult
+        per entry, in order.
+        """
+        return await self._gather(self.execute, queries, max_in_flight)
+
+    async def fingerprint(self, cypher: str, db_name: str, mode: str = "both", guard: bool = False) -> ResultFingerprint:
+        """Execute the query and return the ResultFingerprint of its rows; raise if an error occurs."""
+        fingerprinter = ResultFingerprinter(mode)
+        for row in await self.execute(cypher, db_name, guard):
+            fingerprinter.add(row)
+        return fingerprinter.result()
+
+    async def fingerprint_many(self, queries: List[Tuple], max_in_flight: int = 64,
+                               mode: str = "both") -> List[QueryResult]:
+        """Like query_many, with the ResultFingerprint of each query in place of its rows."""
+        return await self._gather(lambda c, d, *guard: self.fingerprint(c, d, mode, *guard), queries, max_in_flight)
+
+    @staticmethod
+    async def _gather(fn, queries, max_in_flight):
+        semaphore = asyncio.Semaphore(max_in_flight)
+
+        async def run_one(query):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    value, error = await fn(*query), None
+                except Exception as e:
+                    value, error = None, e
+                return QueryResult(value, error, round((time.perf_counter() - start) * 1000, 3))
+
+        return list(await asyncio.gather(*(run_one(query) for query in queries)))
+
+    @abstractmethod
+    async def close(self):
+        """Close connection"""
+        pass
+
 class BaseMetric(ABC):
     """Evaluation Metrics Interface"""
     @abstractmethod
     def compute(self, predictions: List[str], golds: List[str], **kwargs) -> Any:
         """Metric Calculation"""
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from neo4j import AsyncGraphDatabase, Query
+from driver.evaluation import AsyncDatabaseDriver, DatabaseDriver, ResultFingerprint, ResultFingerprinter
+from impl.db_driver.cost_guard import CostGuard
+
+class AsyncTuGraphAdapter(AsyncDatabaseDriver):
+    """
+    Asynchronous TuGraph Database Adapter (neo4j async driver over Bolt)
+    """
+    def __init__(self, uri, user, password, max_connection_pool_size=None, query_timeout=None, max_query_cost=None):
+        self.uri = uri
+        self.auth = (user, password)
+        self.max_connection_pool_size = max_connection_pool_size
+        self.query_timeout = query_timeout # Transaction timeout in seconds (None: server default)
+        # EXPLAIN pre-check rejecting queries estimated above this cost (None: disabled)
+        self.cost_guard = CostGuard(max_query_cost) if max_query_cost else None
+        self.driver = None
+
+    async def connect(self):
+        try:
+            kwargs = {}
+            if self.max_connection_pool_size:
+                kwargs["max_connection_pool_size"] = self.max_connection_pool_size
+            self.driver = AsyncGraphDatabase.driver(self.uri, auth=self.auth, **kwargs)
+            await self.driver.verify_connectivity()
+            print(f"Connected to TuGraph at {self.uri} (async)")
+        except Exception as e:
+            print(f"Failed to connect to TuGraph: {e}")
+            self.driver = None
+
+    def is_connected(self) -> bool:
+        return self.driver is not None
+
+    async def _check_cost(self, session, cypher, db_name):
+        if self.cost_guard:
+            async def run(text):
+                result = await session.run(Query(text, timeout=self.query_timeout))
+                return await result.data()
+            await self.cost_guard.check_async(db_name, cypher, run)
+
+    async def execute(self, cypher: str, db_name: str = "default", guard: bool = False) -> list:
+        """
+        Executes a Cypher query against the specified graph in TuGraph; raises on errors.
+        With guard, the cost guard (if configured) checks the query first.
+        """
+        if not self.driver:
+            raise RuntimeError(f"Not connected to TuGraph at {self.uri}")
+
+        async with self.driver.session(database=db_name) as session:
+            if guard:
+                await self._check_cost(session, cypher, db_name)
+            result = await session.run(Query(cypher, timeout=self.query_timeout))
+            return await result.data()
+
+    async def fingerprint(self, cypher: str, db_name: str = "default", mode: str = "both",
+                          guard: bool = False) -> ResultFingerprint:
+        """
+        Fingerprint the result record by record as it streams in, without materializing the rows.
+        """
+        if not self.driver:
+            raise RuntimeError(f"Not connected to TuGraph at {self.uri}")
+
+        fingerprinter = ResultFingerprinter(mode)
+        async with self.driver.session(database=db_name) as session:
+            if guard:
+                await self._check_cost(session, cypher, db_name)
+            result = await session.run(Query(cypher, timeout=self.query_timeout))
+            async for record in result:
+                fingerprinter.add(record.data())
+        return fingerprinter.result()
+
+    async def close(self):
+        if self.driver:
+            await self.driver.close()
+
+class AsyncDriverBridge(DatabaseDriver):
+    """
+    Exposes an AsyncDatabaseDriver through the blocking DatabaseDriver interface.
+
+    The async driver lives on a private event loop thread, so it can be shared
+    by the evaluation threads; query_many keeps up to max_in_flight queries
+    outstanding instead of paying the network round trips one after another.
+    """
+    def __init__(self, async_driver: AsyncDatabaseDriver, max_in_flight: int = 64):
+        self.async_driver = async_driver
+        self.max_in_flight = max_in_flight
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-db-driver", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def connect(self):
+        self._run(self.async_driver.connect())
+
+    def is_connected(self) -> bool:
+        return self.async_driver.is_connected()
+
+    def query(self, cypher: str, db_name: str = "default"):
+        return self._run(self.async_driver.query(cypher, db_name))
+
+    def execute(self, cypher: str, db_name: str = "default", guard: bool = False):
+        return self._run(self.async_driver.execute(cypher, db_name, guard))
+
+    def query_many(self, queries):
+        return self._run(self.async_driver.query_many(queries, self.max_in_flight))
+
+    def fingerprint(self, cypher: str, db_name: str = "default", mode: str = "both", guard: bool = False):
+        return self._run(self.async_driver.fingerprint(cypher, db_name, mode, guard))
+
+    def fingerprint_many(self, queries, mode: str = "both"):
+        return self._run(self.async_driver.fingerprint_many(queries, self.max_in_flight, mode))
+
+    def close(self):
+        try:
+            self._run(self.async_driver.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
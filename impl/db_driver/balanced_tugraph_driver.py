@@ -0,0 +1,157 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+from driver.evaluation import DatabaseDriver, QueryResult
+from impl.db_driver.tugraph_driver import TuGraphAdapter
+
+# Errors that say something about the endpoint rather than about the query; the neo4j
+# driver reports socket failures as these, while OSError subclasses such as TimeoutError
+# can come from a slow query and must not eject a healthy replica
+CONNECTIVITY_ERRORS = (ServiceUnavailable, SessionExpired)
+
+
+class _Endpoint:
+    def __init__(self, adapter: TuGraphAdapter):
+        self.adapter = adapter
+        self.outstanding = 0
+        self.failures = 0
+        self.healthy = True
+
+
+class LoadBalancedTuGraphAdapter(DatabaseDriver):
+    """
+    Spreads queries over several read-only TuGraph replicas of the same graph.
+
+    Each query goes to the healthy endpoint with the fewest outstanding
+    requests (ties are broken round-robin). An endpoint is ejected after
+    max_failures consecutive connectivity errors, and queries that failed
+    because of it are retried on another endpoint; a background health check
+    puts ejected endpoints back once they answer again. Query errors (syntax,
+    timeouts) are not the endpoint's fault and are raised as usual.
+    """
+    def __init__(self, uris, user, password, max_connection_pool_size=None, query_timeout=None,
+                 max_failures=3, health_check_interval=5.0, max_in_flight=64, max_query_cost=None):
+        self.endpoints = [
+            _Endpoint(TuGraphAdapter(uri, user, password, max_connection_pool_size, query_timeout, max_query_cost))
+            for uri in uris
+        ]
+        self.max_failures = max_failures
+        self.health_check_interval = health_check_interval
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def connect(self):
+        for endpoint in self.endpoints:
+            endpoint.adapter.connect()
+            endpoint.healthy = endpoint.adapter.driver is not None
+        healthy = sum(1 for e in self.endpoints if e.healthy)
+        print(f"Load balancing over {healthy}/{len(self.endpoints)} healthy TuGraph endpoints")
+
+        self._health_thread = threading.Thread(target=self._health_check_loop, name="tugraph-health-check", daemon=True)
+        self._health_thread.start()
+
+    def is_connected(self) -> bool:
+        return any(endpoint.healthy for endpoint in self.endpoints)
+
+    def _health_check_loop(self):
+        while not self._stop.wait(self.health_check_interval):
+            for endpoint in self.endpoints:
+                if endpoint.healthy:
+                    continue
+                if endpoint.adapter.ping():
+                    with self._lock:
+                        endpoint.healthy = True
+                        endpoint.failures = 0
+                    print(f"TuGraph endpoint {endpoint.adapter.uri} is back in rotation")
+
+    def _acquire(self, exclude):
+        """Pick the healthy endpoint with the fewest outstanding requests"""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e not in exclude]
+            if not candidates:
+                return None
+            offset = next(self._round_robin)
+            n = len(candidates)
+            endpoint = min(
+                (candidates[(offset + k) % n] for k in range(n)),
+                key=lambda e: e.outstanding,
+            )
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _release(self, endpoint, connectivity_error):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not connectivity_error:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            if endpoint.healthy and endpoint.failures >= self.max_failures:
+                endpoint.healthy = False
+                print(f"Ejecting TuGraph endpoint {endpoint.adapter.uri} after {endpoint.failures} failures")
+
+    def _dispatch(self, method: str, *args):
+        """Call the named adapter method on the least loaded endpoint, failing over on connectivity errors"""
+        tried = set()
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise last_error or RuntimeError("No healthy TuGraph endpoint available")
+            tried.add(endpoint)
+            try:
+                if not endpoint.adapter.driver:
+                    raise ServiceUnavailable(f"Not connected to TuGraph at {endpoint.adapter.uri}")
+                value = getattr(endpoint.adapter, method)(*args)
+            except CONNECTIVITY_ERRORS as e:
+                self._release(endpoint, connectivity_error=True)
+                last_error = e
+                continue
+            except Exception:
+                self._release(endpoint, connectivity_error=False)
+                raise
+            self._release(endpoint, connectivity_error=False)
+            return value
+
+    def execute(self, cypher: str, db_name: str = "default", guard: bool = False) -> list:
+        return self._dispatch("execute", cypher, db_name, guard)
+
+    def fingerprint(self, cypher: str, db_name: str = "default", mode: str = "both", guard: bool = False):
+        return self._dispatch("fingerprint", cypher, db_name, mode, guard)
+
+    def query(self, cypher: str, db_name: str = "default") -> list:
+        try:
+            return self.execute(cypher, db_name)
+        except Exception:
+            return None
+
+    def _run_many(self, fn, queries):
+        """Run the batch with up to max_in_flight queries spread over the endpoints"""
+        def run_one(query):
+            start = time.perf_counter()
+            try:
+                value, error = fn(*query), None
+            except Exception as e:
+                value, error = None, e
+            return QueryResult(value, error, round((time.perf_counter() - start) * 1000, 3))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_in_flight, len(queries)))) as pool:
+            return list(pool.map(run_one, queries))
+
+    def query_many(self, queries):
+        return self._run_many(self.execute, queries)
+
+    def fingerprint_many(self, queries, mode: str = "both"):
+        return self._run_many(lambda cypher, db_name, *guard: self.fingerprint(cypher, db_name, mode, *guard), queries)
+
+    def close(self):
+        self._stop.set()
+        if self._health_thread:
+            self._health_thread.join()
+        for endpoint in self.endpoints:
+            endpoint.adapter.close()
@@ -0,0 +1,197 @@
+import asyncio
+import math
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+from driver.evaluation import QueryRejected
+
+# Row count source per label: (is_vertex, label, count) rows of TuGraph's dbms.meta.countDetail()
+COUNT_QUERY = "CALL dbms.meta.countDetail()"
+
+# "    Expand(All) [n --> m ]": indentation, operator name, optional details in brackets
+_OPERATOR_LINE = re.compile(r"^(\s*)([A-Za-z][A-Za-z0-9_ ()]*?)\s*(?:\[(.*)\])?\s*$")
+_VAR_LENGTH = re.compile(r"\*\s*(\d*)\s*(\.\.\s*(\d*))?")
+_LABEL = re.compile(r":\s*`?(\w+)`?")
+
+
+class _PlanNode:
+    def __init__(self, name, detail):
+        self.name = name
+        self.detail = detail
+        self.children = []
+
+
+def parse_plan(text: str) -> List[_PlanNode]:
+    """
+    Operator trees of an EXPLAIN plan in TuGraph's text format, where every
+    operator is on its own line, indented below its parent. Lines that are
+    not operators (e.g. "Execution Plan:") are skipped.
+    """
+    roots, stack = [], []
+    for line in text.splitlines():
+        match = _OPERATOR_LINE.match(line)
+        if not match or not line.strip():
+            continue
+        indent, name, detail = len(match.group(1)), match.group(2), match.group(3) or ""
+        node = _PlanNode(name.lower(), detail)
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        (stack[-1][1].children if stack else roots).append(node)
+        stack.append((indent, node))
+    return roots
+
+
+class CostGuard:
+    """
+    Rejects queries whose EXPLAIN plan is estimated to be too expensive.
+
+    The cost is the sum of the estimated rows produced by every operator of
+    the plan. Rows are derived from per-label vertex and edge counts, loaded
+    once per graph and cached: label scans produce the label count, expands
+    multiply by the average degree (raised to the number of hops for
+    variable-length paths, unbounded_hops when there is no upper bound) and
+    Cartesian products multiply their inputs. Queries above max_cost raise
+    QueryRejected instead of being executed.
+    """
+    def __init__(self, max_cost: float, unbounded_hops: int = 10):
+        self.max_cost = max_cost
+        self.unbounded_hops = unbounded_hops
+        self._counts = {}
+        self._count_locks = {}
+        self._async_count_locks = {}
+        self._lock = threading.Lock()
+
+    def needs_counts(self, db_name: str) -> bool:
+        with self._lock:
+            return db_name not in self._counts
+
+    def load_counts(self, db_name: str, rows: List[Dict]):
+        """
+        Cache the label counts of a graph from the rows of COUNT_QUERY. Rows
+        that are not (is_vertex, label, count) are skipped; no counts at all
+        means unknown, and the guard then never rejects.
+        """
+        vertices, edges = {}, {}
+        for row in rows:
+            values = list(row.values()) if isinstance(row, dict) else []
+            if len(values) < 3 or not isinstance(values[1], str) or not isinstance(values[2], (int, float)):
+                continue
+            is_vertex, label, count = values[:3]
+            (vertices if is_vertex else edges)[label] = count
+        with self._lock:
+            self._counts[db_name] = (vertices, edges)
+
+    def _count_lock(self, db_name: str) -> threading.Lock:
+        with self._lock:
+            return self._count_locks.setdefault(db_name, threading.Lock())
+
+    def _ensure_counts(self, db_name: str, run: Callable[[str], List[Dict]]):
+        # one caller loads the counts of a graph, concurrent first callers wait for it
+        if not self.needs_counts(db_name):
+            return
+        with self._count_lock(db_name):
+            if not self.needs_counts(db_name):
+                return
+            try:
+                self.load_counts(db_name, run(COUNT_QUERY))
+            except Exception:
+                self.load_counts(db_name, [])
+
+    def check(self, db_name: str, cypher: str, run: Callable[[str], List[Dict]]):
+        """
+        Estimate the cost of cypher with the run callable (query text -> rows)
+        and raise QueryRejected if it exceeds the budget. The guard steps aside
+        when the counts or the plan cannot be obtained or understood; executing
+        the query then reports the actual error.
+        """
+        self._ensure_counts(db_name, run)
+        try:
+            plan = run(f"EXPLAIN {cypher}")
+        except Exception:
+            return
+        self._check_plan_or_step_aside(db_name, plan)
+
+    async def check_async(self, db_name: str, cypher: str, run):
+        """check for asynchronous drivers: run is a coroutine function (query text -> rows)"""
+        if self.needs_counts(db_name):
+            async with self._async_count_lock(db_name):
+                if self.needs_counts(db_name):
+                    try:
+                        self.load_counts(db_name, await run(COUNT_QUERY))
+                    except Exception:
+                        self.load_counts(db_name, [])
+        try:
+            plan = await run(f"EXPLAIN {cypher}")
+        except Exception:
+            return
+        self._check_plan_or_step_aside(db_name, plan)
+
+    def _async_count_lock(self, db_name: str) -> asyncio.Lock:
+        # async drivers run on a single event loop, so an asyncio lock per graph suffices
+        with self._lock:
+            return self._async_count_locks.setdefault(db_name, asyncio.Lock())
+
+    def _check_plan_or_step_aside(self, db_name: str, plan_rows: List[Dict]):
+        try:
+            self.check_plan(db_name, plan_rows)
+        except QueryRejected:
+            raise
+        except Exception:
+            return
+
+    def check_plan(self, db_name: str, plan_rows: List[Dict]):
+        cost = self.estimate(db_name, "\n".join(
+            str(value) for row in plan_rows for value in row.values() if isinstance(value, str)
+        ))
+        if cost is not None and cost > self.max_cost:
+            raise QueryRejected(f"rejected: too expensive (estimated cost {cost:.3g} > budget {self.max_cost:.3g})")
+
+    def estimate(self, db_name: str, plan_text: str) -> Optional[float]:
+        """Estimated cost of a plan, or None when it cannot be estimated"""
+        with self._lock:
+            vertices, edges = self._counts.get(db_name, ({}, {}))
+        roots = parse_plan(plan_text)
+        if not vertices or not roots:
+            return None
+        total_vertices = sum(vertices.values())
+        stats = (vertices, edges, total_vertices, sum(edges.values()))
+        return sum(self._estimate(root, stats)[1] for root in roots)
+
+    def _estimate(self, node, stats):
+        """(rows, cost) of the subtree rooted at node"""
+        vertices, edges, total_vertices, total_edges = stats
+        children = [self._estimate(child, stats) for child in node.children]
+        child_rows = [rows for rows, _ in children]
+        cost = sum(cost for _, cost in children)
+        name = node.name
+
+        if "all node scan" in name:
+            rows = total_vertices
+        elif "label scan" in name:
+            labels = [label for label in _LABEL.findall(node.detail) if label in vertices]
+            rows = vertices[labels[0]] if labels else total_vertices
+        elif "seek" in name:
+            rows = 1
+        elif "cartesian" in name or "apply" in name:
+            rows = math.prod(child_rows) if child_rows else 1
+        elif "expand" in name:
+            labels = [label for label in _LABEL.findall(node.detail) if label in edges]
+            edge_count = sum(edges[label] for label in labels) if labels else total_edges
+            degree = edge_count / total_vertices if total_vertices else 0
+            hops = 1
+            var_length = _VAR_LENGTH.search(node.detail)
+            if var_length or "variable" in name:
+                low, upper_given, high = var_length.groups() if var_length else ("", None, "")
+                if upper_given is None and low:
+                    hops = int(low)
+                elif high:
+                    hops = int(high)
+                else:
+                    hops = self.unbounded_hops
+            fan_out = sum(degree ** k for k in range(1, hops + 1))
+            rows = max(child_rows, default=1) * fan_out
+        elif "limit" in name and node.detail.strip().isdigit():
+            rows = min(max(child_rows, default=0), int(node.detail.strip()))
+        else:
+            rows = max(child_rows, default=1)
+        return rows, cost + rows
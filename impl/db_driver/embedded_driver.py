@@ -0,0 +1,62 @@
+import threading
+import time
+from driver.evaluation import DatabaseDriver
+from impl.graph_engine.executor import Executor
+from impl.graph_engine.store import GraphStore
+
+class EmbeddedGraphAdapter(DatabaseDriver):
+    """
+    In-process execution backend: loads the CSVs of a TuGraph import config
+    into memory and runs the read-only Cypher subset supported by
+    impl.graph_engine (MATCH / WHERE / WITH / RETURN, aggregations,
+    DISTINCT, ORDER BY, SKIP / LIMIT). Gives EA without a database server.
+
+    graphs maps graph names (db_name / db_id) to import_config.json paths;
+    queries for any other name run against default_graph.
+    """
+    def __init__(self, graphs: dict, default_graph: str = None, data_dirs: dict = None):
+        self.graphs = graphs
+        self.default_graph = default_graph or next(iter(graphs))
+        self.data_dirs = data_dirs or {}
+        self.executors = {}
+        self._lock = threading.Lock()
+
+    def connect(self):
+        for name, config_path in self.graphs.items():
+            try:
+                self._executor(name)
+            except Exception as e:
+                print(f"Failed to load embedded graph '{name}' from {config_path}: {e}")
+
+    def is_connected(self) -> bool:
+        return len(self.executors) == len(self.graphs)
+
+    def _executor(self, db_name) -> Executor:
+        name = db_name if db_name in self.graphs else self.default_graph
+        with self._lock:
+            if name not in self.executors:
+                start = time.perf_counter()
+                store = GraphStore.load(self.graphs[name], self.data_dirs.get(name))
+                self.executors[name] = Executor(store)
+                edges = sum(len(label.sources) for label in store.edge_labels.values())
+                print(f"Loaded embedded graph '{name}': {store.num_vertices} vertices, {edges} edges "
+                      f"({time.perf_counter() - start:.2f}s)")
+            return self.executors[name]
+
+    def query(self, cypher: str, db_name: str = "default") -> list:
+        """
+        Executes a Cypher query against the in-memory graph.
+        """
+        try:
+            return self.execute(cypher, db_name)
+        except Exception:
+            return None
+
+    def execute(self, cypher: str, db_name: str = "default", guard: bool = False) -> list:
+        """
+        Same as query, but raises the engine exception (e.g. CypherError for unsupported syntax).
+        """
+        return self._executor(db_name).run(cypher)
+
+    def close(self):
+        self.executors.clear()
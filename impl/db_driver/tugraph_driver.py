@@ -1,26 +1,52 @@
-import logging
-from neo4j import GraphDatabase
-from driver.evaluation import DatabaseDriver
+from neo4j import GraphDatabase, Query
+from driver.evaluation import DatabaseDriver, ResultFingerprint, ResultFingerprinter
+from impl.db_driver.cost_guard import CostGuard
 
 class TuGraphAdapter(DatabaseDriver):
     """
     TuGraph Database Adapter
     """
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, max_connection_pool_size=None, query_timeout=None, max_query_cost=None):
         self.uri = uri
         self.auth = (user, password)
+        self.max_connection_pool_size = max_connection_pool_size
+        self.query_timeout = query_timeout # Transaction timeout in seconds (None: server default)
+        # EXPLAIN pre-check rejecting queries estimated above this cost (None: disabled)
+        self.cost_guard = CostGuard(max_query_cost) if max_query_cost else None
         self.driver = None
 
+    def _create_driver(self):
+        # The default TuGraph port is usually 7687 (Bolt) as well.
+        # The driver keeps a thread-safe connection pool shared by all callers.
+        kwargs = {}
+        if self.max_connection_pool_size:
+            kwargs["max_connection_pool_size"] = self.max_connection_pool_size
+        return GraphDatabase.driver(self.uri, auth=self.auth, **kwargs)
+
     def connect(self):
         try:
-            # The default TuGraph port is usually 7687 (Bolt) as well.
-            self.driver = GraphDatabase.driver(self.uri, auth=self.auth)
+            self.driver = self._create_driver()
             self.driver.verify_connectivity()
             print(f"Connected to TuGraph at {self.uri}")
         except Exception as e:
             print(f"Failed to connect to TuGraph: {e}")
             self.driver = None
 
+    def is_connected(self) -> bool:
+        return self.driver is not None
+
+    def ping(self) -> bool:
+        """
+        Silently check that the server is reachable, (re)creating the driver if needed.
+        """
+        try:
+            if not self.driver:
+                self.driver = self._create_driver()
+            self.driver.verify_connectivity()
+            return True
+        except Exception:
+            return False
+
     def query(self, cypher: str, db_name: str = "default") -> list:
         """
         Executes a Cypher query against the specified graph in TuGraph.
@@ -29,12 +55,44 @@ class TuGraphAdapter(DatabaseDriver):
             return None
         
         try:
-            with self.driver.session(database=db_name) as session:
-                result = session.run(cypher).data()
-                return result
-        except Exception as e:
+            return self.execute(cypher, db_name)
+        except Exception:
             return None
 
+    def _check_cost(self, session, cypher, db_name):
+        if self.cost_guard:
+            self.cost_guard.check(db_name, cypher, lambda text: session.run(Query(text, timeout=self.query_timeout)).data())
+
+    def execute(self, cypher: str, db_name: str = "default", guard: bool = False) -> list:
+        """
+        Same as query, but raises the driver exception (e.g. syntax errors, timeouts).
+        With guard, the query is first checked by the cost guard (if configured),
+        which raises QueryRejected when it refuses the query.
+        """
+        if not self.driver:
+            raise RuntimeError(f"Not connected to TuGraph at {self.uri}")
+
+        with self.driver.session(database=db_name) as session:
+            if guard:
+                self._check_cost(session, cypher, db_name)
+            return session.run(Query(cypher, timeout=self.query_timeout)).data()
+
+    def fingerprint(self, cypher: str, db_name: str = "default", mode: str = "both", guard: bool = False) -> ResultFingerprint:
+        """
+        Fingerprint the result while it streams in from the server, one
+        record at a time, without materializing the rows.
+        """
+        if not self.driver:
+            raise RuntimeError(f"Not connected to TuGraph at {self.uri}")
+
+        fingerprinter = ResultFingerprinter(mode)
+        with self.driver.session(database=db_name) as session:
+            if guard:
+                self._check_cost(session, cypher, db_name)
+            for record in session.run(Query(cypher, timeout=self.query_timeout)):
+                fingerprinter.add(record.data())
+        return fingerprinter.result()
+
     def close(self):
         if self.driver:
             self.driver.close()
\ No newline at end of file
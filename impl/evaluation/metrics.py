@@ -2,61 +2,162 @@ import os
 import sys
 import shutil
 import subprocess
+import tempfile
+import threading
 import json
 import re
-import evaluate
-from driver.evaluation import BaseMetric, DatabaseDriver
+from collections import Counter
+from concurrent.futures import Future
+from sacrebleu.tokenizers.tokenizer_13a import Tokenizer13a
+from driver.evaluation import BaseMetric, DatabaseDriver, QueryRejected, QueryResult, ResultFingerprint, compare_rows
 
 class ExecutionAccuracy(BaseMetric):
-    def __init__(self, driver: DatabaseDriver):
+    # Per-instance outcomes reported by evaluate_instance
+    CORRECT = "correct"
+    INCORRECT = "incorrect"
+    EMPTY = "empty"
+    GOLD_ERROR = "gold_error"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    REJECTED = "rejected" # refused by the driver's cost guard before execution
+    SKIPPED = "skipped" # EA disabled for the run
+
+    def __init__(self, driver: DatabaseDriver, use_fingerprints: bool = False):
         self.driver = driver
+        # Compare streamed result fingerprints instead of materialized rows;
+        # fingerprints compare rows as multisets, and no rows are kept for the report.
+        self.use_fingerprints = use_fingerprints
+        # Gold results are identical across difficulty levels, so they are
+        # cached per (db_id, gold) and shared by concurrently evaluated levels.
+        self._gold_cache = {}
+        self._gold_lock = threading.Lock()
+
+    def _claim_golds(self, keys):
+        """
+        Look up (db_id, gold) keys in the shared gold cache.
+
+        Returns (futures, owned): one Future per key, and the keys this caller
+        must execute itself; the others are done or in flight elsewhere.
+        """
+        futures, owned = [], {}
+        with self._gold_lock:
+            for key in keys:
+                future = self._gold_cache.get(key)
+                if future is None:
+                    future = Future()
+                    self._gold_cache[key] = future
+                    owned[key] = future
+                futures.append(future)
+        return futures, owned
+
+    def _release_golds(self, owned):
+        """Drop the owned futures from the gold cache (e.g. after the batch executing them failed)"""
+        with self._gold_lock:
+            for key, future in owned.items():
+                if self._gold_cache.get(key) is future:
+                    del self._gold_cache[key]
 
-    def _normalize(self, value):
-        if isinstance(value, float):
-            return round(value, 9)
-        elif isinstance(value, (int, str, bool)) or value is None:
-            return value
-        elif hasattr(value, "isoformat"):
-            return value.isoformat()
-        elif hasattr(value, "total_seconds"):
-            return str(value)
-        elif isinstance(value, (list, tuple)):
-            return tuple(self._normalize(v) for v in value)
-        elif isinstance(value, dict):
-            return tuple(sorted((k, self._normalize(v)) for k, v in value.items()))
-        else:
-            return str(value)
+    @staticmethod
+    def _is_timeout(error):
+        text = f"{type(error).__name__} {getattr(error, 'code', '')} {error}".lower()
+        return "timeout" in text or "timedout" in text or "timed out" in text
 
     def _compare_results(self, res_gold, res_predict):
-        def normalize_row(row):
-            return tuple(self._normalize(v) for v in row.values())
-        gold_set = {normalize_row(r) for r in res_gold}
-        pred_set = {normalize_row(r) for r in res_predict}
-        return gold_set == pred_set
+        if isinstance(res_gold, ResultFingerprint):
+            return (res_gold.row_count, res_gold.unordered) == (res_predict.row_count, res_predict.unordered)
+        return compare_rows(res_gold, res_predict)
 
-    def compute(self, predictions: list, golds: list, **kwargs) -> float:
-        db_ids = kwargs.get("db_ids", ["geography"] * len(predictions))
-        correct = 0
-        total = 0
+    @classmethod
+    def skipped_outcome(cls):
+        """Outcome reported for every instance when EA is not computed"""
+        return {**cls._empty_outcome(), "status": cls.SKIPPED}
+
+    @classmethod
+    def _empty_outcome(cls):
+        return {
+            "status": cls.EMPTY,
+            "correct": False,
+            "gold_result": None,
+            "pred_result": None,
+            "gold_latency_ms": None,
+            "pred_latency_ms": None,
+            "error": None,
+        }
 
-        for pred, gold, db_id in zip(predictions, golds, db_ids):
-            if not pred:
-                total += 1
-                continue 
+    def evaluate_instance(self, pred, gold, db_id) -> dict:
+        """
+        Execute one gold/pred pair and describe the outcome.
+
+        The returned dict has the keys status (one of the class-level outcome
+        constants), correct, gold_result, pred_result, gold_latency_ms,
+        pred_latency_ms and error.
+        """
+        return self.evaluate_many([pred], [gold], [db_id])[0]
 
-            res_gold = self.driver.query(gold, db_name=db_id)
-            if res_gold is None:
-                total += 1
+    def evaluate_many(self, predictions: list, golds: list, db_ids: list) -> list:
+        """
+        Batch version of evaluate_instance.
+
+        All uncached gold queries and all predictions are handed to the
+        driver's query_many at once, so drivers that pipeline queries can
+        overlap their round trips. Only the predictions go through the
+        driver's pre-execution guard; gold queries are trusted.
+        """
+        outcomes = [self._empty_outcome() for _ in predictions]
+        active = [i for i, pred in enumerate(predictions) if pred]
+        if not active:
+            return outcomes
+
+        gold_futures, owned = self._claim_golds([(db_ids[i], golds[i]) for i in active])
+        owned_keys = list(owned)
+        batch = [(gold, db_id) for db_id, gold in owned_keys]
+        batch += [(predictions[i], db_ids[i], True) for i in active]
+        try:
+            if self.use_fingerprints:
+                results = self.driver.fingerprint_many(batch, mode="unordered")
+            else:
+                results = self.driver.query_many(batch)
+        except Exception as e:
+            # Waiting levels see the failure, but the golds are not cached:
+            # the next batch that needs them runs them again
+            self._release_golds(owned)
+            for future in owned.values():
+                future.set_exception(e)
+            raise
+        for key, result in zip(owned_keys, results):
+            owned[key].set_result(result)
+
+        for i, gold_future, pred_result in zip(active, gold_futures, results[len(owned_keys):]):
+            outcome = outcomes[i]
+            try:
+                gold_result = gold_future.result()
+            except Exception as e:
+                gold_result = QueryResult(None, e, None)
+
+            outcome["gold_result"], outcome["gold_latency_ms"] = gold_result.rows, gold_result.latency_ms
+            if gold_result.error is not None:
+                outcome["status"] = self.GOLD_ERROR
+                outcome["error"] = str(gold_result.error)
                 continue
 
-            res_pred = self.driver.query(pred, db_name=db_id)
-            if res_pred is None:
-                total += 1
+            outcome["pred_result"], outcome["pred_latency_ms"] = pred_result.rows, pred_result.latency_ms
+            if pred_result.error is not None:
+                if isinstance(pred_result.error, QueryRejected):
+                    outcome["status"] = self.REJECTED
+                else:
+                    outcome["status"] = self.TIMEOUT if self._is_timeout(pred_result.error) else self.ERROR
+                outcome["error"] = str(pred_result.error)
                 continue
 
-            if self._compare_results(res_gold, res_pred):
-                correct += 1
-            total += 1
+            outcome["correct"] = self._compare_results(gold_result.rows, pred_result.rows)
+            outcome["status"] = self.CORRECT if outcome["correct"] else self.INCORRECT
+        return outcomes
+
+    def compute(self, predictions: list, golds: list, **kwargs) -> float:
+        db_ids = kwargs.get("db_ids", ["geography"] * len(predictions))
+        outcomes = self.evaluate_many(predictions, golds, db_ids)
+        correct = sum(1 for outcome in outcomes if outcome["correct"])
+        total = len(outcomes)
 
         return correct / total if total > 0 else 0.0
     
@@ -64,37 +165,70 @@ class ExecutionAccuracy(BaseMetric):
         """
         执行单条查询并返回 evaluation-friendly 结构
         """
-        # Handling Empty Predictions
-        if not pred:
+        outcome = self.evaluate_instance(pred, gold, db_id)
+        if outcome["status"] == self.EMPTY:
             return False, None, None
 
-        # Execute Gold Standard Query
-        try:
-            res_gold = self.driver.query(gold, db_name=db_id)
-        except Exception as e:
-            res_gold = f"[GOLD ERROR] {str(e)}"
+        res_gold, res_pred = outcome["gold_result"], outcome["pred_result"]
+        if outcome["status"] == self.GOLD_ERROR:
+            res_gold = f"[GOLD ERROR] {outcome['error']}"
+        elif outcome["status"] in (self.ERROR, self.TIMEOUT, self.REJECTED):
+            res_pred = f"[PRED ERROR] {outcome['error']}"
 
-        # Execute Model Prediction Query
-        try:
-            res_pred = self.driver.query(pred, db_name=db_id)
-        except Exception as e:
-            res_pred = f"[PRED ERROR] {str(e)}"
+        return outcome["correct"], res_gold, res_pred
 
-        # Determine Consistency
-        try:
-            is_correct = self._compare_results(res_gold, res_pred)
-        except:
-            is_correct = False
+class GoogleBleu(BaseMetric):
+    def __init__(self, min_len: int = 1, max_len: int = 4):
+        self._google_bleu = None
+        # evaluate modules are not safe to load or compute from several threads
+        self._lock = threading.Lock()
+        self.min_len = min_len
+        self.max_len = max_len
+        self._tokenizer = Tokenizer13a()
 
-        return is_correct, res_gold, res_pred
+    def _ngrams(self, text):
+        tokens = self._tokenizer(text.strip() if text else "").split()
+        return Counter(
+            tuple(tokens[i:i + n])
+            for n in range(self.min_len, self.max_len + 1)
+            for i in range(len(tokens) - n + 1)
+        )
+
+    def sentence_stats(self, prediction: str, gold: str):
+        """
+        GLEU sufficient statistics (matching n-grams, max(pred n-grams, gold n-grams))
+        for one pair, using the same tokenizer and n-gram range as evaluate's google_bleu.
+        Summing them over a corpus reproduces the corpus-level score.
+        """
+        pred_ngrams = self._ngrams(prediction)
+        gold_ngrams = self._ngrams(gold)
+        n_match = sum((pred_ngrams & gold_ngrams).values())
+        n_all = max(sum(pred_ngrams.values()), sum(gold_ngrams.values()))
+        return n_match, n_all
+
+    def sentence_score(self, prediction: str, gold: str) -> float:
+        """Sentence-level GLEU of a single prediction"""
+        n_match, n_all = self.sentence_stats(prediction, gold)
+        return n_match / n_all if n_all > 0 else 0.0
+
+    @staticmethod
+    def corpus_score(stats) -> float:
+        """Corpus-level GLEU from the per-sentence statistics of sentence_stats"""
+        n_match = sum(m for m, _ in stats)
+        n_all = sum(a for _, a in stats)
+        return n_match / n_all if n_all > 0 else 0.0
 
-class GoogleBleu(BaseMetric):
     def compute(self, predictions: list, golds: list, **kwargs):
         try:
-            google_bleu = evaluate.load('google_bleu')
             safe_preds = [p.strip() if p else "" for p in predictions]
             safe_golds = [g.strip() if g else "" for g in golds]
-            res = google_bleu.compute(predictions=safe_preds, references=safe_golds)
+            with self._lock:
+                if self._google_bleu is None:
+                    # Imported on first use: evaluate is slow to import and the
+                    # pipeline itself only needs sentence_stats / corpus_score
+                    import evaluate
+                    self._google_bleu = evaluate.load('google_bleu')
+                res = self._google_bleu.compute(predictions=safe_preds, references=safe_golds)
             return res['google_bleu']
         except Exception as e:
             print(f"Warning: BLEU failed: {e}")
@@ -102,9 +236,13 @@ class GoogleBleu(BaseMetric):
 
 class ExternalMetric(BaseMetric):
 
-    def __init__(self, dbgpt_root: str):
-        self.dbgpt_root = dbgpt_root
-        self.temp_dir = os.path.abspath("temp_eval_results_oop")
+    def __init__(self, dbgpt_root: str, max_workers: int = None, etypes=("grammar", "similarity")):
+        self.dbgpt_root = os.path.abspath(dbgpt_root)
+        self.etypes = list(etypes) # Evaluation types to run; the others are reported as None
+        self.temp_root = os.path.abspath("temp_eval_results_oop")
+        # Shared grammar worker pool: bounds the number of evaluation.py
+        # subprocesses running at once across all levels.
+        self._workers = threading.BoundedSemaphore(max_workers or os.cpu_count() or 1)
 
     def _parse_log_score(self, log_content, etype):
 
@@ -133,18 +271,41 @@ class ExternalMetric(BaseMetric):
             pass
         return 0.0
 
+    def _parse_log_items(self, log_content):
+        """Per-query scores from the JSON log written by evaluation.py, or None"""
+        try:
+            data = json.loads(log_content)
+        except ValueError:
+            return None
+        if not isinstance(data, list):
+            return None
+        return [x.get('score') for x in data]
+
     def compute(self, predictions: list, golds: list, **kwargs) -> dict:
+        results, _ = self.compute_with_details(predictions, golds, **kwargs)
+        return results
+
+    def compute_with_details(self, predictions: list, golds: list, **kwargs):
+        """
+        Same as compute, but also returns the per-query scores as
+        {'Grammar': [...], 'Similarity': [...]} (None where unavailable).
+        """
         dataset_type = kwargs.get('dataset_type', 'text2cypher')
+        per_instance = {
+            'Grammar': [None] * len(predictions),
+            'Similarity': [None] * len(predictions),
+        }
         
         if not os.path.exists(self.dbgpt_root):
             print(f"ERROR: DBGPT root not found: {self.dbgpt_root}")
-            return {'Grammar': 0.0, 'Similarity': 0.0}
+            return {'Grammar': 0.0, 'Similarity': 0.0}, per_instance
 
-        # 1. Prepare Directory
-        os.makedirs(self.temp_dir, exist_ok=True)
-        
-        pred_file = os.path.join(self.temp_dir, 'predictions.txt')
-        gold_file = os.path.join(self.temp_dir, 'gold.txt')
+        # 1. Prepare Directory (one per call, so concurrent levels never collide)
+        os.makedirs(self.temp_root, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self.temp_root)
+
+        pred_file = os.path.join(temp_dir, 'predictions.txt')
+        gold_file = os.path.join(temp_dir, 'gold.txt')
 
         # Ensure newline characters are removed, guaranteeing one item per line
         clean_preds = [p.replace('\n', ' ').strip() if p else "" for p in predictions]
@@ -156,21 +317,13 @@ class ExternalMetric(BaseMetric):
             f.write('\n'.join(clean_golds))
 
         results = {}
-        original_cwd = os.getcwd()
 
         try:
-            # 2. Automatically Create Log Directory 
-            log_dir = os.path.join(self.dbgpt_root, "eval_similarity_grammar", "output", "logs")
-            if not os.path.exists(log_dir):
-                # print(f"DEBUG: Creating log directory at {log_dir}")
-                os.makedirs(log_dir, exist_ok=True)
-
-            # 3. Change Directory 
-            os.chdir(self.dbgpt_root)
             impl = 'tugraph-db' if dataset_type == 'text2cypher' else 'iso-gql'
 
-            for etype in ['grammar', 'similarity']:
+            for etype in self.etypes:
                 score = 0.0
+                log_path = os.path.join(temp_dir, f'{etype}.log')
                 try:
                     cmd = [
                         sys.executable, 
@@ -178,18 +331,23 @@ class ExternalMetric(BaseMetric):
                         '--input', pred_file,
                         '--gold', gold_file,
                         '--etype', etype,
-                        '--impl', impl
+                        '--impl', impl,
+                        '--log', log_path
                     ]
                     
-                    # 4. Execute External Script           
-                    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                    # 2. Execute External Script (cwd is per-process, so no os.chdir)
+                    with self._workers:
+                        subprocess.run(cmd, check=True, cwd=self.dbgpt_root,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
-                    # 5. Read Log 
-                    log_path = os.path.join('eval_similarity_grammar', 'output', 'logs', 'eval.log')
+                    # 3. Read Log 
                     if os.path.exists(log_path):
                         with open(log_path, 'r', encoding='utf-8') as f:
                             content = f.read().strip()
                             score = self._parse_log_score(content, etype)
+                            items = self._parse_log_items(content)
+                            if items is not None and len(items) == len(predictions):
+                                per_instance[etype.capitalize()] = items
                     else:
                         print(f"WARNING: Log file missing for {etype}")
 
@@ -202,8 +360,6 @@ class ExternalMetric(BaseMetric):
                 results[etype.capitalize()] = score
 
         finally:
-            os.chdir(original_cwd)
-            if os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
+            shutil.rmtree(temp_dir, ignore_errors=True)
         
-        return results
\ No newline at end of file
+        return results, per_instance
\ No newline at end of file
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# Bump whenever the way per-instance metrics are computed changes, so that
+# results stored by an older version are recomputed instead of reused.
+METRIC_VERSION = "1"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class RunRegistry:
+    """
+    Local SQLite store of per-instance evaluation results.
+
+    Results are keyed by (instance_id, level, pred hash, gold hash, metric
+    version), so a rerun only needs to evaluate the instances whose
+    prediction or gold query changed; everything else, including the
+    level aggregates, is rebuilt from the stored values.
+    """
+    def __init__(self, path: str, metric_version: str = METRIC_VERSION):
+        self.path = path
+        self.metric_version = metric_version
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Levels are evaluated from several threads; one connection guarded by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS instance_results (
+                    instance_id TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    pred_hash TEXT NOT NULL,
+                    gold_hash TEXT NOT NULL,
+                    metric_version TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    gleu_match INTEGER NOT NULL,
+                    gleu_total INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (instance_id, level, pred_hash, gold_hash, metric_version)
+                )
+                """
+            )
+
+    @staticmethod
+    def instance_key(instance_id, pred: str, gold: str, db_id: str) -> Tuple[str, str, str]:
+        """(instance_id, pred hash, gold hash); the gold hash covers the target graph too"""
+        return str(instance_id), content_hash(pred), content_hash(f"{db_id}\n{gold}")
+
+    def lookup(self, level: str, keys: List[Tuple[str, str, str]]) -> Dict[int, Tuple[dict, Tuple[int, int]]]:
+        """
+        Stored results for the given instance keys, as
+        {position in keys: (detail record, (gleu_match, gleu_total))}.
+        """
+        found = {}
+        with self._lock:
+            for index, (instance_id, pred_hash, gold_hash) in enumerate(keys):
+                row = self._conn.execute(
+                    "SELECT record, gleu_match, gleu_total FROM instance_results "
+                    "WHERE instance_id = ? AND level = ? AND pred_hash = ? "
+                    "AND gold_hash = ? AND metric_version = ?",
+                    (instance_id, level, pred_hash, gold_hash, self.metric_version),
+                ).fetchone()
+                if row is not None:
+                    found[index] = (json.loads(row[0]), (row[1], row[2]))
+        return found
+
+    def store(self, level: str, key: Tuple[str, str, str], record: dict, gleu_stats: Tuple[int, int]):
+        instance_id, pred_hash, gold_hash = key
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO instance_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    instance_id, level, pred_hash, gold_hash, self.metric_version,
+                    json.dumps(record, ensure_ascii=False, default=str),
+                    gleu_stats[0], gleu_stats[1], time.time(),
+                ),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
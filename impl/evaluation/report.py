@@ -0,0 +1,138 @@
+import json
+import os
+from driver.evaluation import ResultFingerprint
+
+
+def row_count(rows):
+    """Number of rows of a query result, or of the result a fingerprint was taken from"""
+    if rows is None:
+        return None
+    if isinstance(rows, ResultFingerprint):
+        return rows.row_count
+    return len(rows)
+
+
+def preview_result(rows, max_rows=5, max_chars=1000):
+    """
+    Truncated, JSON-safe preview of a query result for the detailed report.
+    Fingerprinted results keep no rows, so they are shown by their hash.
+    """
+    if rows is None:
+        return None
+    if isinstance(rows, ResultFingerprint):
+        return f"<{rows.row_count} rows, fingerprint {rows.unordered or rows.ordered}>"
+    text = json.dumps(rows[:max_rows], ensure_ascii=False, default=str)
+    if len(rows) > max_rows or len(text) > max_chars:
+        text = text[:max_chars] + f" ... ({len(rows)} rows)"
+    return text
+
+
+class JsonlRecordWriter:
+    """
+    Streams evaluation records to a JSON Lines file, one record per line.
+
+    Every record is flushed as soon as it is written, so a partially
+    finished (or crashed) evaluation still leaves a usable file behind.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def detail_schema():
+    """Arrow schema of the flattened per-instance records (see flatten_detail_record)"""
+    import pyarrow as pa
+
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("instance_id", pa.string()),
+        ("gold_query", text),
+        ("pred_query", text),
+        ("cleaned_pred", text),
+        ("accuracy", pa.int8()),
+        ("ea_status", text),
+        ("grammar", pa.int8()),
+        ("similarity", pa.float64()),
+        ("google_bleu", pa.float64()),
+        ("gold_latency_ms", pa.float64()),
+        ("pred_latency_ms", pa.float64()),
+        ("error", pa.string()),
+        ("gold_rows", pa.int64()),
+        ("pred_rows", pa.int64()),
+        ("gold_result", pa.string()),
+        ("pred_result", pa.string()),
+    ])
+
+
+def flatten_detail_record(record: dict) -> dict:
+    """Flatten the nested metrics/latency fields of a detail record into columns"""
+    metrics = record["metrics"]
+    latency = record["latency_ms"]
+    return {
+        "instance_id": str(record["instance_id"]),
+        "gold_query": record["gold_query"],
+        "pred_query": record["pred_query"],
+        "cleaned_pred": record["cleaned_pred"],
+        "accuracy": metrics["accuracy"],
+        "ea_status": metrics["ea_status"],
+        "grammar": metrics["grammar"],
+        "similarity": metrics["similarity"],
+        "google_bleu": metrics["google_bleu"],
+        "gold_latency_ms": latency["gold"],
+        "pred_latency_ms": latency["pred"],
+        "error": record["error"],
+        "gold_rows": record["gold_rows"],
+        "pred_rows": record["pred_rows"],
+        "gold_result": record["gold_result"],
+        "pred_result": record["pred_result"],
+    }
+
+
+class ColumnarDetailWriter:
+    """Detail record writer producing a Parquet or Arrow file with flattened columns"""
+    def __init__(self, path, fmt="parquet", compression="zstd"):
+        from impl.storage.columnar import ColumnarRecordWriter
+
+        self.path = path
+        self._writer = ColumnarRecordWriter(path, detail_schema(), fmt=fmt, compression=compression)
+
+    def write(self, record: dict):
+        self._writer.write(flatten_detail_record(record))
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_detail_writer(output_dir, query_key, fmt="json", compression="zstd"):
+    """
+    Writer for the detailed results of one level: JSON Lines by default,
+    or a columnar file when fmt is "parquet" or "arrow".
+    """
+    if fmt == "json":
+        return JsonlRecordWriter(os.path.join(output_dir, f"{query_key}_results.jsonl"))
+
+    from impl.storage.columnar import columnar_path
+
+    path = columnar_path(os.path.join(output_dir, f"{query_key}_results"), fmt)
+    return ColumnarDetailWriter(path, fmt=fmt, compression=compression)
@@ -0,0 +1,455 @@
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class CypherError(Exception):
+    """Syntax the embedded engine cannot parse or does not support"""
+
+
+# Expressions are tagged tuples:
+#   ("lit", value)                 ("var", name)              ("prop", expr, key)
+#   ("list", [expr])               ("map", [key], [expr])     ("call", name, distinct, [expr] | "*")
+#   ("and" | "or" | "xor", l, r)   ("not", expr)              ("neg", expr)
+#   ("cmp", op, l, r)              ("arith", op, l, r)        ("isnull", expr, negated)
+#   ("in", l, r)                   ("str", op, l, r)          ("index", expr, expr)
+
+
+class NodePattern(NamedTuple):
+    var: Optional[str]
+    labels: List[str]
+    props: list # [(key, expr)]
+
+
+class RelPattern(NamedTuple):
+    var: Optional[str]
+    types: List[str]
+    props: list
+    direction: str # "out", "in" or "both"
+
+
+class Pattern(NamedTuple):
+    nodes: List[NodePattern]
+    rels: List[RelPattern] # rels[i] connects nodes[i] and nodes[i + 1]
+
+
+class ReturnItem(NamedTuple):
+    expr: tuple
+    name: str
+
+
+class Projection(NamedTuple):
+    distinct: bool
+    items: Optional[List[ReturnItem]] # None for "*"
+    order_by: List[Tuple[tuple, bool]] # (expr, descending)
+    skip: Optional[tuple]
+    limit: Optional[tuple]
+
+
+class Match(NamedTuple):
+    patterns: List[Pattern]
+    where: Optional[tuple]
+
+
+class With(NamedTuple):
+    projection: Projection
+    where: Optional[tuple]
+
+
+class Query(NamedTuple):
+    clauses: list # Match / With, in order
+    projection: Projection # The final RETURN
+
+
+AGGREGATES = {"count", "sum", "avg", "min", "max", "collect"}
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+|//[^\n]*)
+  | (?P<number>\d+\.\d+(?:[eE][-+]?\d+)?|\d+[eE][-+]?\d+|\d+)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*|`[^`]+`)
+  | (?P<param>\$[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<symbol><>|<=|>=|=~|->|<-|\.\.|[()\[\]{},.:;|*+\-/%=<>^])
+""", re.VERBOSE)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", "'": "'", '"': '"'}
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    value: object
+    start: int
+    end: int
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens, pos = [], 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise CypherError(f"Unexpected character {text[pos]!r} at position {pos}")
+        kind = match.lastgroup
+        raw = match.group()
+        if kind == "number":
+            tokens.append(Token(kind, raw, float(raw) if any(c in raw for c in ".eE") else int(raw), pos, match.end()))
+        elif kind == "string":
+            value = re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), raw[1:-1])
+            tokens.append(Token(kind, raw, value, pos, match.end()))
+        elif kind == "name":
+            tokens.append(Token(kind, raw, raw.strip("`"), pos, match.end()))
+        elif kind == "param":
+            raise CypherError("Query parameters are not supported by the embedded engine")
+        elif kind == "symbol":
+            tokens.append(Token(kind, raw, raw, pos, match.end()))
+        pos = match.end()
+    tokens.append(Token("eof", "", None, len(text), len(text)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    # -- token helpers --
+    @property
+    def tok(self) -> Token:
+        return self.tokens[self.pos]
+
+    def _advance(self) -> Token:
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def _is_kw(self, *words) -> bool:
+        tok = self.tok
+        return tok.kind == "name" and not tok.text.startswith("`") and tok.text.upper() in words
+
+    def _accept_kw(self, *words) -> bool:
+        if self._is_kw(*words):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect_kw(self, word):
+        if not self._accept_kw(word):
+            self._fail(f"expected {word}")
+
+    def _is_sym(self, *symbols) -> bool:
+        return self.tok.kind == "symbol" and self.tok.text in symbols
+
+    def _accept_sym(self, symbol) -> bool:
+        if self._is_sym(symbol):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect_sym(self, symbol):
+        if not self._accept_sym(symbol):
+            self._fail(f"expected '{symbol}'")
+
+    def _name(self) -> str:
+        if self.tok.kind != "name":
+            self._fail("expected a name")
+        return self._advance().value
+
+    def _fail(self, message):
+        tok = self.tok
+        found = tok.text or "end of query"
+        raise CypherError(f"Invalid input '{found}' at position {tok.start}: {message}")
+
+    # -- clauses --
+    def parse(self) -> Query:
+        clauses = []
+        while True:
+            if self._is_kw("OPTIONAL"):
+                raise CypherError("OPTIONAL MATCH is not supported by the embedded engine")
+            if self._accept_kw("MATCH"):
+                patterns = [self._pattern()]
+                while self._accept_sym(","):
+                    patterns.append(self._pattern())
+                where = self._expression() if self._accept_kw("WHERE") else None
+                clauses.append(Match(patterns, where))
+            elif self._accept_kw("WITH"):
+                projection = self._projection()
+                where = self._expression() if self._accept_kw("WHERE") else None
+                clauses.append(With(projection, where))
+            elif self._accept_kw("RETURN"):
+                projection = self._projection()
+                self._accept_sym(";")
+                if self.tok.kind != "eof":
+                    self._fail("expected end of query")
+                if not clauses:
+                    raise CypherError("RETURN without MATCH is not supported by the embedded engine")
+                return Query(clauses, projection)
+            elif self._is_kw("CREATE", "MERGE", "DELETE", "DETACH", "SET", "REMOVE", "CALL", "UNWIND", "UNION"):
+                raise CypherError(f"{self.tok.text.upper()} is not supported by the embedded engine")
+            else:
+                self._fail("expected MATCH, WITH or RETURN")
+
+    def _projection(self) -> Projection:
+        distinct = self._accept_kw("DISTINCT")
+        if self._accept_sym("*"):
+            items = None
+        else:
+            items = [self._return_item()]
+            while self._accept_sym(","):
+                items.append(self._return_item())
+        order_by = []
+        if self._accept_kw("ORDER"):
+            self._expect_kw("BY")
+            while True:
+                expr = self._expression()
+                descending = False
+                if self._accept_kw("DESC", "DESCENDING"):
+                    descending = True
+                else:
+                    self._accept_kw("ASC", "ASCENDING")
+                order_by.append((expr, descending))
+                if not self._accept_sym(","):
+                    break
+        skip = self._expression() if self._accept_kw("SKIP") else None
+        limit = self._expression() if self._accept_kw("LIMIT") else None
+        return Projection(distinct, items, order_by, skip, limit)
+
+    def _return_item(self) -> ReturnItem:
+        start = self.tok.start
+        expr = self._expression()
+        end = self.tokens[self.pos - 1].end
+        if self._accept_kw("AS"):
+            return ReturnItem(expr, self._name())
+        # Unaliased columns are named after their source text, as in Neo4j/TuGraph
+        return ReturnItem(expr, self.text[start:end])
+
+    # -- patterns --
+    def _pattern(self) -> Pattern:
+        if self.tok.kind == "name" and self.tokens[self.pos + 1].text == "=":
+            raise CypherError("Named paths are not supported by the embedded engine")
+        nodes, rels = [self._node()], []
+        while self._is_sym("-", "<-"):
+            rels.append(self._relationship())
+            nodes.append(self._node())
+        return Pattern(nodes, rels)
+
+    def _node(self) -> NodePattern:
+        self._expect_sym("(")
+        var = self._name() if self.tok.kind == "name" else None
+        labels = []
+        while self._accept_sym(":"):
+            labels.append(self._name())
+        props = self._map_literal() if self._is_sym("{") else []
+        self._expect_sym(")")
+        return NodePattern(var, labels, props)
+
+    def _relationship(self) -> RelPattern:
+        incoming = self._advance().text == "<-"
+        var, types, props = None, [], []
+        if self._accept_sym("["):
+            var = self._name() if self.tok.kind == "name" else None
+            if self._accept_sym(":"):
+                types.append(self._name())
+                while self._accept_sym("|"):
+                    self._accept_sym(":")
+                    types.append(self._name())
+            if self._is_sym("*"):
+                raise CypherError("Variable-length relationships are not supported by the embedded engine")
+            props = self._map_literal() if self._is_sym("{") else []
+            self._expect_sym("]")
+        if self._accept_sym("->"):
+            outgoing = True
+        else:
+            self._expect_sym("-")
+            outgoing = False
+        if incoming and outgoing:
+            self._fail("a relationship cannot point both ways")
+        direction = "in" if incoming else "out" if outgoing else "both"
+        return RelPattern(var, types, props, direction)
+
+    def _map_literal(self) -> list:
+        self._expect_sym("{")
+        entries = []
+        if not self._is_sym("}"):
+            while True:
+                key = self._name()
+                self._expect_sym(":")
+                entries.append((key, self._expression()))
+                if not self._accept_sym(","):
+                    break
+        self._expect_sym("}")
+        return entries
+
+    # -- expressions, lowest precedence first --
+    def _expression(self) -> tuple:
+        left = self._xor()
+        while self._accept_kw("OR"):
+            left = ("or", left, self._xor())
+        return left
+
+    def _xor(self) -> tuple:
+        left = self._and()
+        while self._accept_kw("XOR"):
+            left = ("xor", left, self._and())
+        return left
+
+    def _and(self) -> tuple:
+        left = self._not()
+        while self._accept_kw("AND"):
+            left = ("and", left, self._not())
+        return left
+
+    def _not(self) -> tuple:
+        if self._accept_kw("NOT"):
+            return ("not", self._not())
+        return self._comparison()
+
+    def _comparison(self) -> tuple:
+        left = self._additive()
+        while True:
+            if self._is_sym("=", "<>", "<", "<=", ">", ">="):
+                op = self._advance().text
+                left = ("cmp", op, left, self._additive())
+            elif self._is_sym("<-"):
+                # "a<-1" tokenizes as an incoming arrow
+                self._advance()
+                left = ("cmp", "<", left, ("neg", self._additive()))
+            elif self._is_sym("=~"):
+                self._advance()
+                left = ("str", "=~", left, self._additive())
+            elif self._is_kw("IS"):
+                self._advance()
+                negated = self._accept_kw("NOT")
+                self._expect_kw("NULL")
+                left = ("isnull", left, negated)
+            elif self._accept_kw("IN"):
+                left = ("in", left, self._additive())
+            elif self._is_kw("STARTS", "ENDS"):
+                op = self._advance().text.upper()
+                self._expect_kw("WITH")
+                left = ("str", op, left, self._additive())
+            elif self._accept_kw("CONTAINS"):
+                left = ("str", "CONTAINS", left, self._additive())
+            else:
+                return left
+
+    def _additive(self) -> tuple:
+        left = self._multiplicative()
+        while self._is_sym("+", "-"):
+            op = self._advance().text
+            left = ("arith", op, left, self._multiplicative())
+        return left
+
+    def _multiplicative(self) -> tuple:
+        left = self._power()
+        while self._is_sym("*", "/", "%"):
+            op = self._advance().text
+            left = ("arith", op, left, self._power())
+        return left
+
+    def _power(self) -> tuple:
+        left = self._unary()
+        while self._accept_sym("^"):
+            left = ("arith", "^", left, self._unary())
+        return left
+
+    def _unary(self) -> tuple:
+        if self._accept_sym("-"):
+            return ("neg", self._unary())
+        if self._accept_sym("+"):
+            return self._unary()
+        return self._postfix()
+
+    def _postfix(self) -> tuple:
+        expr = self._atom()
+        while True:
+            if self._accept_sym("."):
+                expr = ("prop", expr, self._name())
+            elif self._accept_sym("["):
+                index = self._expression()
+                if self._is_sym(".."):
+                    raise CypherError("List slices are not supported by the embedded engine")
+                self._expect_sym("]")
+                expr = ("index", expr, index)
+            else:
+                return expr
+
+    def _atom(self) -> tuple:
+        tok = self.tok
+        if tok.kind in ("number", "string"):
+            self._advance()
+            return ("lit", tok.value)
+        if self._accept_sym("("):
+            expr = self._expression()
+            self._expect_sym(")")
+            return expr
+        if self._accept_sym("["):
+            items = []
+            if not self._is_sym("]"):
+                items.append(self._expression())
+                while self._accept_sym(","):
+                    items.append(self._expression())
+            self._expect_sym("]")
+            return ("list", items)
+        if self._is_sym("{"):
+            entries = self._map_literal()
+            return ("map", [key for key, _ in entries], [value for _, value in entries])
+        if tok.kind == "name":
+            if self._is_kw("TRUE", "FALSE", "NULL"):
+                self._advance()
+                return ("lit", {"TRUE": True, "FALSE": False, "NULL": None}[tok.text.upper()])
+            if self._is_kw("CASE", "EXISTS"):
+                raise CypherError(f"{tok.text.upper()} expressions are not supported by the embedded engine")
+            self._advance()
+            if self._accept_sym("("):
+                return self._call(tok.value)
+            return ("var", tok.value)
+        self._fail("expected an expression")
+
+    def _call(self, name) -> tuple:
+        name = name.lower()
+        if self._accept_sym("*"):
+            self._expect_sym(")")
+            if name != "count":
+                self._fail("only count accepts *")
+            return ("call", name, False, "*")
+        distinct = self._accept_kw("DISTINCT")
+        args = []
+        if not self._is_sym(")"):
+            args.append(self._expression())
+            while self._accept_sym(","):
+                args.append(self._expression())
+        self._expect_sym(")")
+        return ("call", name, distinct, args)
+
+
+@lru_cache(maxsize=4096)
+def parse(text: str) -> Query:
+    """Parse a read-only Cypher query into clauses; raises CypherError"""
+    return _Parser(text.strip()).parse()
+
+
+def _children(expr):
+    for part in expr[1:]:
+        if isinstance(part, tuple):
+            yield part
+        elif isinstance(part, list):
+            yield from (item for item in part if isinstance(item, tuple))
+
+
+def contains_aggregate(expr) -> bool:
+    if expr[0] == "call" and expr[1] in AGGREGATES:
+        return True
+    return expr[0] != "lit" and any(contains_aggregate(child) for child in _children(expr))
+
+
+def variables(expr) -> set:
+    """Variables an expression refers to"""
+    if expr[0] == "var":
+        return {expr[1]}
+    if expr[0] == "lit":
+        return set()
+    found = set()
+    for child in _children(expr):
+        found |= variables(child)
+    return found
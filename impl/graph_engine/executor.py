@@ -0,0 +1,666 @@
+import math
+import re
+from typing import Dict, List, NamedTuple
+import numpy as np
+from impl.graph_engine.cypher import (
+    AGGREGATES, CypherError, Match, Projection, Query, ReturnItem,
+    contains_aggregate, parse, variables,
+)
+from impl.graph_engine.store import GraphStore
+
+
+class NodeRef(NamedTuple):
+    id: int
+
+
+class EdgeRef(NamedTuple):
+    label: str
+    id: int
+
+
+# Cross-type ordering used by ORDER BY, min and max (null sorts last ascending)
+def _type_rank(value):
+    if isinstance(value, dict):
+        return 0
+    if isinstance(value, NodeRef):
+        return 1
+    if isinstance(value, EdgeRef):
+        return 2
+    if isinstance(value, list):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bool):
+        return 5
+    if isinstance(value, (int, float)):
+        return 6
+    return 7
+
+
+def _sort_key(value):
+    rank = _type_rank(value)
+    if rank == 3:
+        return rank, [_sort_key(v) for v in value]
+    if rank == 0:
+        return rank, sorted((k, _sort_key(v)) for k, v in value.items())
+    if rank == 6 and isinstance(value, float) and math.isnan(value):
+        return rank, math.inf
+    if rank == 7:
+        return rank, 0
+    return rank, value
+
+
+def _hashable(value):
+    """Grouping / DISTINCT key of a value"""
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _freeze(expr):
+    """Hashable form of an expression, for matching ORDER BY items to projected ones"""
+    if isinstance(expr, (tuple, list)):
+        return tuple(_freeze(part) for part in expr)
+    return expr
+
+
+def _split_and(expr) -> list:
+    if expr is None:
+        return []
+    if expr[0] == "and":
+        return _split_and(expr[1]) + _split_and(expr[2])
+    return [expr]
+
+
+class _Step(NamedTuple):
+    kind: str # "scan", "check" or "expand"
+    node: object # NodePattern being bound
+    node_var: str
+    rel: object = None # RelPattern for "expand"
+    from_var: str = None
+    direction: str = None
+    filters: tuple = () # WHERE conjuncts that can be checked after this step
+
+
+class Executor:
+    """
+    Evaluates parsed queries against a GraphStore.
+
+    MATCH clauses run as a pipeline of scan / expand steps over the CSR
+    adjacency, checking each WHERE conjunct as soon as the variables it
+    needs are bound. Nodes and relationships stay as ids until the final
+    RETURN, which converts them the way the neo4j driver's Record.data()
+    does (property dicts, and (start, type, end) tuples for relationships).
+    """
+    def __init__(self, store: GraphStore):
+        self.store = store
+
+    def run(self, text: str) -> List[Dict]:
+        query: Query = parse(text)
+        rows, scope = [{}], set()
+        for clause in query.clauses:
+            if isinstance(clause, Match):
+                rows, scope = self._match_clause(rows, clause, scope)
+            else:
+                rows, scope = self._project(rows, clause.projection, scope)
+                if clause.where is not None:
+                    self._check_scope(clause.where, scope)
+                    rows = [row for row in rows if self._eval(clause.where, row) is True]
+        rows, _ = self._project(rows, query.projection, scope)
+        return [{name: self._to_output(value) for name, value in row.items()} for row in rows]
+
+    # -- MATCH --
+    def _match_clause(self, rows, clause: Match, scope: set):
+        """
+        Match the comma-separated patterns one after another. A pattern that
+        shares no variable with what is already bound is matched once and
+        hash-joined on a cross-pattern equality from WHERE (if there is one)
+        instead of being re-expanded for every incoming row.
+        """
+        pending = _split_and(clause.where)
+        bound = set(scope)
+        pairs = [(row, frozenset()) for row in rows] # (bindings, relationships used so far)
+        for index, pattern in enumerate(clause.patterns):
+            names = [node.var or f" node{index}_{i}" for i, node in enumerate(pattern.nodes)]
+            pattern_vars = set(names) | {rel.var for rel in pattern.rels if rel.var}
+            if len(pairs) > 1 and not pattern_vars & bound:
+                steps, pending = self._plan(pattern, names, set(), pending)
+                right = list(self._match({}, steps, 0, frozenset()))
+                ready = [c for c in pending if variables(c) <= bound | pattern_vars]
+                pending = [c for c in pending if not variables(c) <= bound | pattern_vars]
+                pairs = self._join(pairs, right, bound, pattern_vars, ready)
+            else:
+                steps, pending = self._plan(pattern, names, bound, pending)
+                pairs = [out for row, used in pairs for out in self._match(row, steps, 0, used)]
+            bound |= pattern_vars
+        if pending:
+            self._check_scope(pending[0], bound)
+        return [row for row, _ in pairs], bound
+
+    def _plan(self, pattern, names, bound: set, pending: list):
+        """
+        Scan / expand steps for one pattern, starting from an already bound
+        node or else the smallest label, with each WHERE conjunct attached to
+        the first step that binds all its variables. Returns (steps, the
+        conjuncts that are still pending).
+        """
+        bound = set(bound)
+        start = next((i for i, name in enumerate(names) if name in bound), None)
+        if start is None:
+            sizes = [
+                self._label_size(node.labels) if node.labels else self.store.num_vertices
+                for node in pattern.nodes
+            ]
+            start = sizes.index(min(sizes))
+        steps = [_Step("check" if names[start] in bound else "scan", pattern.nodes[start], names[start])]
+
+        order = [(i, i + 1, "out") for i in range(start, len(pattern.nodes) - 1)]
+        order += [(i, i - 1, "in") for i in range(start, 0, -1)]
+        for src, dst, way in order:
+            rel = pattern.rels[min(src, dst)]
+            direction = rel.direction
+            if way == "in" and direction != "both":
+                direction = "in" if direction == "out" else "out"
+            steps.append(_Step("expand", pattern.nodes[dst], names[dst], rel, names[src], direction))
+
+        for index, step in enumerate(steps):
+            bound.add(step.node_var)
+            if step.rel is not None and step.rel.var:
+                bound.add(step.rel.var)
+            ready = [c for c in pending if variables(c) <= bound]
+            pending = [c for c in pending if not variables(c) <= bound]
+            steps[index] = step._replace(filters=tuple(ready))
+        return steps, pending
+
+    def _join(self, left, right, left_vars, right_vars, conditions):
+        key = next((
+            (l, r) for op, a, b in (c[1:] for c in conditions if c[0] == "cmp" and c[1] == "=")
+            for l, r in ((a, b), (b, a))
+            if variables(l) and variables(r) and variables(l) <= left_vars and variables(r) <= right_vars
+        ), None)
+        if key is not None:
+            index = {}
+            for row, used in right:
+                value = self._eval(key[1], row)
+                if value is not None:
+                    index.setdefault(_hashable(value), []).append((row, used))
+
+        joined = []
+        for row, used in left:
+            if key is not None:
+                value = self._eval(key[0], row)
+                candidates = index.get(_hashable(value), []) if value is not None else []
+            else:
+                candidates = right
+            for other, other_used in candidates:
+                if used & other_used:
+                    continue # A relationship binds at most once per MATCH
+                merged = {**row, **other}
+                if all(self._eval(c, merged) is True for c in conditions):
+                    joined.append((merged, used | other_used))
+        return joined
+
+    def _label_size(self, labels):
+        start, end = self.store.vertex_range(labels[0])
+        return end - start
+
+    def _node_matches(self, vertex, node, row) -> bool:
+        if node.labels and any(self.store.label_of(vertex).name != label for label in node.labels):
+            return False
+        return all(
+            self._equals(self.store.vertex_property(vertex, key), self._eval(expr, row)) is True
+            for key, expr in node.props
+        )
+
+    def _scan(self, node, row):
+        if not node.labels:
+            candidates = range(self.store.num_vertices)
+        elif len(set(node.labels)) > 1:
+            return [] # TuGraph vertices carry exactly one label
+        else:
+            vertex_label = self.store.vertex_labels.get(node.labels[0])
+            if vertex_label is None:
+                return []
+            for key, expr in node.props:
+                if key == vertex_label.primary:
+                    # Primary key lookup instead of a label scan
+                    vertex = vertex_label.index.get(self._eval(expr, row))
+                    candidates = [] if vertex is None else [vertex]
+                    break
+            else:
+                candidates = range(vertex_label.offset, vertex_label.offset + vertex_label.size)
+        if not node.props:
+            return candidates
+        return [v for v in candidates if self._node_matches(v, node, row)]
+
+    def _expand(self, step: _Step, row, used_edges):
+        source = row[step.from_var]
+        if not isinstance(source, NodeRef):
+            return
+        rel, node = step.rel, step.node
+        labels = rel.types or list(self.store.edge_labels)
+        target = row.get(step.node_var)
+        if node.labels:
+            low, high = self.store.vertex_range(node.labels[0])
+        for label in labels:
+            edge_label = self.store.edge_labels.get(label)
+            if edge_label is None:
+                continue
+            csrs = {"out": [edge_label.out], "in": [edge_label.inc], "both": [edge_label.out, edge_label.inc]}[step.direction]
+            for csr in csrs:
+                neighbors, edges = csr.neighbors(source.id)
+                if target is not None:
+                    keep = neighbors == target.id
+                elif node.labels:
+                    keep = (neighbors >= low) & (neighbors < high)
+                else:
+                    keep = None
+                if keep is not None:
+                    neighbors, edges = neighbors[keep], edges[keep]
+                for vertex, edge in zip(neighbors.tolist(), edges.tolist()):
+                    if (label, edge) in used_edges:
+                        continue
+                    if rel.props and not all(
+                        self._equals(self.store.edge_property(label, edge, key), self._eval(expr, row)) is True
+                        for key, expr in rel.props
+                    ):
+                        continue
+                    if node.props and not self._node_matches(vertex, node, row):
+                        continue
+                    yield vertex, (label, edge)
+
+    def _match(self, row, steps, index, used_edges):
+        if index == len(steps):
+            yield row, used_edges
+            return
+        step = steps[index]
+        if step.kind == "check":
+            value = row[step.node_var]
+            if isinstance(value, NodeRef) and self._node_matches(value.id, step.node, row) \
+                    and all(self._eval(f, row) is True for f in step.filters):
+                yield from self._match(row, steps, index + 1, used_edges)
+            return
+
+        if step.kind == "scan":
+            bindings = ((vertex, None) for vertex in self._scan(step.node, row))
+        else:
+            bindings = self._expand(step, row, used_edges)
+        for vertex, edge in bindings:
+            extended = dict(row)
+            extended[step.node_var] = NodeRef(vertex)
+            if edge is not None and step.rel.var:
+                if step.rel.var in row and row[step.rel.var] != EdgeRef(*edge):
+                    continue
+                extended[step.rel.var] = EdgeRef(*edge)
+            if all(self._eval(f, extended) is True for f in step.filters):
+                yield from self._match(
+                    extended, steps, index + 1, used_edges | {edge} if edge is not None else used_edges
+                )
+
+    # -- WITH / RETURN --
+    def _project(self, rows, projection: Projection, scope: set):
+        items = projection.items
+        if items is None:
+            items = [ReturnItem(("var", name), name) for name in sorted(scope) if not name.startswith(" ")]
+        for item in items:
+            self._check_scope(item.expr, scope)
+
+        aggregate_items = [i for i, item in enumerate(items) if contains_aggregate(item.expr)]
+        if aggregate_items:
+            pairs = self._aggregate(rows, items, aggregate_items)
+        else:
+            pairs = [(row, {item.name: self._eval(item.expr, row) for item in items}) for row in rows]
+
+        if projection.distinct:
+            seen, unique = set(), []
+            for row, out in pairs:
+                key = _hashable(list(out.values()))
+                if key not in seen:
+                    seen.add(key)
+                    unique.append((row, out))
+            pairs = unique
+
+        if projection.order_by:
+            by_expr = {_freeze(item.expr): item.name for item in items}
+            for expr, descending in reversed(projection.order_by):
+                if _freeze(expr) in by_expr:
+                    name = by_expr[_freeze(expr)]
+                    key = lambda pair, name=name: _sort_key(pair[1][name])
+                else:
+                    key = lambda pair, expr=expr: _sort_key(self._eval(expr, {**pair[0], **pair[1]}))
+                pairs.sort(key=key, reverse=descending)
+
+        skip = self._eval(projection.skip, {}) if projection.skip is not None else 0
+        limit = self._eval(projection.limit, {}) if projection.limit is not None else None
+        for value, clause in ((skip, "SKIP"), (limit, "LIMIT")):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                raise CypherError(f"{clause} expects a non-negative integer")
+        pairs = pairs[skip:skip + limit] if limit is not None else pairs[skip:]
+        return [out for _, out in pairs], {item.name for item in items}
+
+    def _aggregate(self, rows, items, aggregate_items):
+        keys = [i for i in range(len(items)) if i not in aggregate_items]
+        groups = {}
+        for row in rows:
+            values = [self._eval(items[i].expr, row) for i in keys]
+            groups.setdefault(_hashable(values), (row, values, []))[2].append(row)
+        if not groups and not keys:
+            groups[()] = ({}, [], []) # Aggregating an empty input still yields one row
+
+        pairs = []
+        for first_row, values, group_rows in groups.values():
+            out = {}
+            for i, item in enumerate(items):
+                if i in keys:
+                    out[item.name] = values[keys.index(i)]
+                else:
+                    out[item.name] = self._eval(self._fold_aggregates(item.expr, group_rows), first_row)
+            pairs.append(({} if not keys else first_row, out))
+        return pairs
+
+    def _fold_aggregates(self, expr, group_rows):
+        """Replace the aggregate calls of expr by literals computed over group_rows"""
+        if expr[0] == "call" and expr[1] in AGGREGATES:
+            return ("lit", self._aggregate_call(expr, group_rows))
+        if expr[0] == "lit" or not contains_aggregate(expr):
+            return expr
+        return tuple(
+            self._fold_aggregates(part, group_rows) if isinstance(part, tuple) else
+            [self._fold_aggregates(p, group_rows) if isinstance(p, tuple) else p for p in part] if isinstance(part, list) else
+            part
+            for part in expr
+        )
+
+    def _aggregate_call(self, expr, group_rows):
+        _, name, distinct, args = expr
+        if args == "*":
+            return len(group_rows)
+        if len(args) != 1:
+            raise CypherError(f"{name}() takes exactly one argument")
+        values = [self._eval(args[0], row) for row in group_rows]
+        values = [v for v in values if v is not None]
+        if distinct:
+            seen, unique = set(), []
+            for value in values:
+                key = _hashable(value)
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(value)
+            values = unique
+
+        if name == "count":
+            return len(values)
+        if name == "collect":
+            return values
+        if name in ("min", "max"):
+            if not values:
+                return None
+            return (min if name == "min" else max)(values, key=_sort_key)
+        if any(not _is_number(v) for v in values):
+            raise CypherError(f"{name}() expects numeric values")
+        if name == "sum":
+            return sum(values) if values else 0
+        return sum(values) / len(values) if values else None # avg
+
+    # -- expressions --
+    def _check_scope(self, expr, scope):
+        missing = variables(expr) - scope
+        if missing:
+            raise CypherError(f"Variable `{sorted(missing)[0]}` not defined")
+
+    def _eval(self, expr, row):
+        tag = expr[0]
+        if tag == "lit":
+            return expr[1]
+        if tag == "var":
+            if expr[1] not in row:
+                raise CypherError(f"Variable `{expr[1]}` not defined")
+            return row[expr[1]]
+        if tag == "prop":
+            return self._property(self._eval(expr[1], row), expr[2])
+        if tag == "cmp":
+            return self._compare(expr[1], self._eval(expr[2], row), self._eval(expr[3], row))
+        if tag == "and":
+            left = self._eval(expr[1], row)
+            if left is False:
+                return False
+            right = self._eval(expr[2], row)
+            if right is False:
+                return False
+            return None if left is None or right is None else True
+        if tag == "or":
+            left = self._eval(expr[1], row)
+            if left is True:
+                return True
+            right = self._eval(expr[2], row)
+            if right is True:
+                return True
+            return None if left is None or right is None else False
+        if tag == "xor":
+            left, right = self._eval(expr[1], row), self._eval(expr[2], row)
+            return None if left is None or right is None else left != right
+        if tag == "not":
+            value = self._eval(expr[1], row)
+            return None if value is None else not value
+        if tag == "isnull":
+            is_null = self._eval(expr[1], row) is None
+            return not is_null if expr[2] else is_null
+        if tag == "neg":
+            value = self._eval(expr[1], row)
+            return None if value is None else -value
+        if tag == "arith":
+            return self._arith(expr[1], self._eval(expr[2], row), self._eval(expr[3], row))
+        if tag == "in":
+            value, container = self._eval(expr[1], row), self._eval(expr[2], row)
+            if container is None:
+                return None
+            if not isinstance(container, list):
+                raise CypherError("IN expects a list")
+            results = [self._equals(value, item) for item in container]
+            if True in results:
+                return True
+            return None if None in results else False
+        if tag == "str":
+            return self._string_op(expr[1], self._eval(expr[2], row), self._eval(expr[3], row))
+        if tag == "list":
+            return [self._eval(item, row) for item in expr[1]]
+        if tag == "map":
+            return {key: self._eval(value, row) for key, value in zip(expr[1], expr[2])}
+        if tag == "index":
+            container, index = self._eval(expr[1], row), self._eval(expr[2], row)
+            if container is None or index is None:
+                return None
+            if isinstance(container, list) and isinstance(index, int):
+                return container[index] if -len(container) <= index < len(container) else None
+            return self._property(container, index) if isinstance(index, str) else None
+        if tag == "call":
+            if expr[1] in AGGREGATES:
+                raise CypherError(f"Aggregation {expr[1]}() is only allowed in WITH / RETURN")
+            return self._function(expr[1], [self._eval(arg, row) for arg in expr[3]])
+        raise CypherError(f"Unsupported expression {tag}")
+
+    def _property(self, value, key):
+        if value is None:
+            return None
+        if isinstance(value, NodeRef):
+            return self.store.vertex_property(value.id, key)
+        if isinstance(value, EdgeRef):
+            return self.store.edge_property(value.label, value.id, key)
+        if isinstance(value, dict):
+            return value.get(key)
+        raise CypherError(f"Type mismatch: expected a node, relationship or map but was {type(value).__name__}")
+
+    def _equals(self, left, right):
+        if left is None or right is None:
+            return None
+        if _is_number(left) and _is_number(right):
+            return left == right
+        if type(left) != type(right) and not (isinstance(left, (list, tuple)) and isinstance(right, (list, tuple))):
+            return False
+        if isinstance(left, list):
+            if len(left) != len(right):
+                return False
+            results = [self._equals(a, b) for a, b in zip(left, right)]
+            return False if False in results else None if None in results else True
+        return left == right
+
+    def _compare(self, op, left, right):
+        if op == "=":
+            return self._equals(left, right)
+        if op == "<>":
+            equal = self._equals(left, right)
+            return None if equal is None else not equal
+        if left is None or right is None:
+            return None
+        comparable = (_is_number(left) and _is_number(right)) or \
+            (type(left) == type(right) and isinstance(left, (str, bool)))
+        if not comparable:
+            return None
+        return {"<": left < right, "<=": left <= right, ">": left > right, ">=": left >= right}[op]
+
+    def _arith(self, op, left, right):
+        if left is None or right is None:
+            return None
+        if op == "+" and isinstance(left, list):
+            return left + (right if isinstance(right, list) else [right])
+        if op == "+" and isinstance(right, list):
+            return [left] + right
+        if op == "+" and (isinstance(left, str) or isinstance(right, str)):
+            if isinstance(left, (list, dict)) or isinstance(right, (list, dict)):
+                raise CypherError("Type mismatch in +")
+            return f"{left}{right}"
+        if not (_is_number(left) and _is_number(right)):
+            raise CypherError(f"Type mismatch: cannot apply {op} to {type(left).__name__} and {type(right).__name__}")
+        if op == "+":
+            return left + right
+        if op == "-":
+            return left - right
+        if op == "*":
+            return left * right
+        if op == "^":
+            return float(left) ** right
+        both_int = isinstance(left, int) and isinstance(right, int)
+        if right == 0 and both_int:
+            raise CypherError("/ by zero")
+        if op == "/":
+            if both_int:
+                return int(left / right) # Integer division truncates toward zero
+            return left / right if right != 0 else (math.copysign(math.inf, left) if left else math.nan)
+        if both_int:
+            return int(math.fmod(left, right))
+        return math.fmod(left, right) if right != 0 else math.nan
+
+    def _string_op(self, op, left, right):
+        if not isinstance(left, str) or not isinstance(right, str):
+            return None
+        if op == "STARTS":
+            return left.startswith(right)
+        if op == "ENDS":
+            return left.endswith(right)
+        if op == "CONTAINS":
+            return right in left
+        try:
+            return re.fullmatch(right, left) is not None
+        except re.error as e:
+            raise CypherError(f"Invalid regular expression: {e}")
+
+    def _function(self, name, args):
+        if not args:
+            raise CypherError(f"Unknown function or wrong number of arguments: {name}()")
+        if name == "coalesce":
+            return next((a for a in args if a is not None), None)
+        if name == "id":
+            value = args[0]
+            return value.id if isinstance(value, (NodeRef, EdgeRef)) else None
+        if name == "labels":
+            return [self.store.label_of(args[0].id).name] if isinstance(args[0], NodeRef) else None
+        if name == "type":
+            return args[0].label if isinstance(args[0], EdgeRef) else None
+        if name == "properties":
+            return self._to_output(args[0]) if isinstance(args[0], (NodeRef, dict)) else \
+                self.store.edge_properties(args[0].label, args[0].id) if isinstance(args[0], EdgeRef) else None
+        if name == "keys":
+            props = self._function("properties", args)
+            return None if props is None else list(props)
+        if len(args) != 1 and name not in ("round", "substring", "replace", "split", "left", "right"):
+            raise CypherError(f"Unknown function or wrong number of arguments: {name}()")
+        value = args[0]
+        if value is None:
+            return None
+        scalar = {
+            "tolower": lambda v: v.lower(),
+            "toupper": lambda v: v.upper(),
+            "trim": lambda v: v.strip(),
+            "ltrim": lambda v: v.lstrip(),
+            "rtrim": lambda v: v.rstrip(),
+            "reverse": lambda v: v[::-1],
+            "size": len,
+            "length": len,
+            "abs": abs,
+            "ceil": lambda v: float(math.ceil(v)),
+            "floor": lambda v: float(math.floor(v)),
+            "sqrt": lambda v: math.sqrt(v) if v >= 0 else math.nan,
+            "sign": lambda v: (v > 0) - (v < 0),
+            "tostring": lambda v: str(v).lower() if isinstance(v, bool) else str(v),
+            "tointeger": self._to_integer,
+            "tofloat": self._to_float,
+            "head": lambda v: v[0] if v else None,
+            "last": lambda v: v[-1] if v else None,
+        }
+        if name in scalar:
+            try:
+                return scalar[name](value)
+            except (TypeError, AttributeError):
+                raise CypherError(f"Type mismatch in {name}()")
+        if name == "round":
+            digits = args[1] if len(args) > 1 else 0
+            rounded = float(np.round(value, digits)) if digits else float(math.floor(value + 0.5))
+            return rounded
+        if name == "substring":
+            start = args[1]
+            return value[start:start + args[2]] if len(args) > 2 else value[start:]
+        if name == "replace":
+            return value.replace(args[1], args[2])
+        if name == "split":
+            return value.split(args[1])
+        if name == "left":
+            return value[:args[1]]
+        if name == "right":
+            return value[-args[1]:] if args[1] else ""
+        raise CypherError(f"Unknown function {name}()")
+
+    @staticmethod
+    def _to_integer(value):
+        try:
+            return int(float(value)) if isinstance(value, str) else int(value)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def _to_output(self, value):
+        if isinstance(value, NodeRef):
+            return self.store.vertex_properties(value.id)
+        if isinstance(value, EdgeRef):
+            edge_label = self.store.edge_labels[value.label]
+            return (
+                self.store.vertex_properties(int(edge_label.sources[value.id])),
+                value.label,
+                self.store.vertex_properties(int(edge_label.targets[value.id])),
+            )
+        if isinstance(value, list):
+            return [self._to_output(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self._to_output(v) for k, v in value.items()}
+        return value
@@ -0,0 +1,188 @@
+import bisect
+import csv
+import json
+import os
+from typing import Dict, List, Optional
+import numpy as np
+
+# TuGraph field types and the array dtype used to hold them
+_NUMERIC_DTYPES = {
+    "INT8": np.int64, "INT16": np.int64, "INT32": np.int64, "INT64": np.int64,
+    "FLOAT": np.float64, "DOUBLE": np.float64,
+}
+
+
+class Column:
+    """
+    One property of a vertex or edge label, stored as an array plus a
+    presence mask (optional fields may be missing). Numeric types use numpy
+    arrays; strings and other types an object array.
+    """
+    def __init__(self, name: str, field_type: str, raw_values: List[str]):
+        self.name = name
+        self.type = field_type.upper()
+        self.present = np.array([v != "" for v in raw_values], dtype=bool)
+        dtype = _NUMERIC_DTYPES.get(self.type)
+        if dtype is not None:
+            self.values = np.array([v if v != "" else 0 for v in raw_values]).astype(dtype)
+        elif self.type == "BOOL":
+            self.values = np.array([v.lower() == "true" for v in raw_values], dtype=bool)
+        else:
+            self.values = np.array(raw_values, dtype=object)
+        self._numpy_scalars = self.values.dtype != object
+
+    def get(self, index: int):
+        if not self.present[index]:
+            return None
+        value = self.values[index]
+        return value.item() if self._numpy_scalars else value
+
+
+class CSR:
+    """
+    Compressed sparse row adjacency of one edge label in one direction:
+    the neighbours of vertex v are indices[indptr[v]:indptr[v + 1]], and
+    edge_ids holds the matching edge (row of the label's property columns).
+    """
+    def __init__(self, num_vertices: int, sources: np.ndarray, targets: np.ndarray):
+        order = np.argsort(sources, kind="stable")
+        self.indices = targets[order]
+        self.edge_ids = order.astype(np.int64)
+        counts = np.bincount(sources, minlength=num_vertices)
+        self.indptr = np.zeros(num_vertices + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+
+    def neighbors(self, vertex: int):
+        start, end = self.indptr[vertex], self.indptr[vertex + 1]
+        return self.indices[start:end], self.edge_ids[start:end]
+
+
+class VertexLabel:
+    def __init__(self, name: str, primary: str, offset: int, columns: Dict[str, Column]):
+        self.name = name
+        self.primary = primary
+        self.offset = offset # Global id of the first vertex of this label
+        self.columns = columns
+        keys = columns[primary].values if primary in columns else []
+        self.size = len(keys)
+        self.index = {key: offset + i for i, key in enumerate(keys)}
+
+
+class EdgeLabel:
+    def __init__(self, name: str, num_vertices: int, sources, targets, columns: Dict[str, Column]):
+        self.name = name
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.columns = columns
+        self.out = CSR(num_vertices, self.sources, self.targets)
+        self.inc = CSR(num_vertices, self.targets, self.sources)
+
+
+class GraphStore:
+    """
+    Read-only in-memory property graph loaded from a TuGraph import config.
+
+    Vertices get dense global ids, contiguous per label, and their
+    properties live in one Column per (label, property). Each edge label
+    keeps its endpoints plus an outgoing and an incoming CSR, so expanding a
+    vertex is a slice of two arrays.
+    """
+    def __init__(self):
+        self.vertex_labels: Dict[str, VertexLabel] = {}
+        self.edge_labels: Dict[str, EdgeLabel] = {}
+        self.num_vertices = 0
+        self._label_starts: List[int] = []
+        self._label_order: List[VertexLabel] = []
+
+    @classmethod
+    def load(cls, config_path: str, data_dir: Optional[str] = None) -> "GraphStore":
+        """
+        Load the CSV files listed in an import_config.json. File paths are
+        resolved by name against data_dir (default: the config's directory),
+        since the config refers to the server's import directory.
+        """
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        data_dir = data_dir or os.path.dirname(os.path.abspath(config_path))
+        schema = {entry["label"]: entry for entry in config["schema"]}
+
+        vertex_rows, edge_rows = {}, {}
+        for spec in config["files"]:
+            path = os.path.join(data_dir, os.path.basename(spec["path"]))
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                rows = list(reader)[spec.get("header", 0):]
+            records = [dict(zip(spec["columns"], row)) for row in rows]
+            if "SRC_ID" in spec:
+                edge_rows.setdefault(spec["label"], []).append((spec["SRC_ID"], spec["DST_ID"], records))
+            else:
+                vertex_rows.setdefault(spec["label"], []).extend(records)
+
+        store = cls()
+        for label, records in vertex_rows.items():
+            entry = schema[label]
+            columns = {
+                prop["name"]: Column(prop["name"], prop["type"], [r.get(prop["name"], "") for r in records])
+                for prop in entry["properties"]
+            }
+            store.vertex_labels[label] = VertexLabel(label, entry["primary"], store.num_vertices, columns)
+            store.num_vertices += len(records)
+        store._label_order = sorted(store.vertex_labels.values(), key=lambda v: v.offset)
+        store._label_starts = [v.offset for v in store._label_order]
+
+        for label, parts in edge_rows.items():
+            entry = schema.get(label, {"properties": []})
+            sources, targets, records = [], [], []
+            for src_label, dst_label, part in parts:
+                src_index = store.vertex_labels[src_label].index
+                dst_index = store.vertex_labels[dst_label].index
+                for record in part:
+                    src, dst = src_index.get(record["SRC_ID"]), dst_index.get(record["DST_ID"])
+                    if src is None or dst is None:
+                        continue # Dangling edge: TuGraph's importer skips these as well
+                    sources.append(src)
+                    targets.append(dst)
+                    records.append(record)
+            columns = {
+                prop["name"]: Column(prop["name"], prop["type"], [r.get(prop["name"], "") for r in records])
+                for prop in entry["properties"]
+            }
+            store.edge_labels[label] = EdgeLabel(label, store.num_vertices, sources, targets, columns)
+        return store
+
+    def label_of(self, vertex: int) -> VertexLabel:
+        return self._label_order[bisect.bisect_right(self._label_starts, vertex) - 1]
+
+    def vertex_range(self, label: str):
+        """(first, end) global ids of a label; an empty range for unknown labels"""
+        vertex_label = self.vertex_labels.get(label)
+        if vertex_label is None:
+            return 0, 0
+        return vertex_label.offset, vertex_label.offset + vertex_label.size
+
+    def vertex_property(self, vertex: int, name: str):
+        vertex_label = self.label_of(vertex)
+        column = vertex_label.columns.get(name)
+        return column.get(vertex - vertex_label.offset) if column is not None else None
+
+    def vertex_properties(self, vertex: int) -> dict:
+        vertex_label = self.label_of(vertex)
+        local = vertex - vertex_label.offset
+        props = {}
+        for name, column in vertex_label.columns.items():
+            value = column.get(local)
+            if value is not None:
+                props[name] = value
+        return props
+
+    def edge_property(self, label: str, edge: int, name: str):
+        column = self.edge_labels[label].columns.get(name)
+        return column.get(edge) if column is not None else None
+
+    def edge_properties(self, label: str, edge: int) -> dict:
+        props = {}
+        for name, column in self.edge_labels[label].columns.items():
+            value = column.get(edge)
+            if value is not None:
+                props[name] = value
+        return props
@@ -0,0 +1,179 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+# Metadata key listing the columns whose nested values were stored as JSON text
+JSON_COLUMNS_KEY = b"text2graph.json_columns"
+
+FORMAT_EXTENSIONS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Columnar output requires pyarrow. To fix: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def columnar_path(path: str, fmt: str) -> str:
+    """Replace the extension of path with the one of the columnar format"""
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+    return os.path.splitext(path)[0] + FORMAT_EXTENSIONS[fmt]
+
+
+def _is_query_column(name: str) -> bool:
+    return name.endswith("_query") or name in ("cleaned_pred", "gql_query")
+
+
+def records_to_table(records: List[Dict], dictionary_columns: Optional[List[str]] = None):
+    """
+    Convert a list of flat-ish records to an Arrow table.
+
+    Nested values (dicts and lists) are stored as JSON text so that records
+    with heterogeneous or empty nested fields still share one schema. The
+    query text columns are dictionary-encoded, since the same gold query is
+    repeated across runs and levels.
+    """
+    pa = _require_pyarrow()
+
+    columns = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+
+    json_columns = [
+        name for name in columns
+        if any(isinstance(r.get(name), (dict, list)) for r in records)
+    ]
+    data = {}
+    for name in columns:
+        values = [r.get(name) for r in records]
+        if name in json_columns:
+            values = [
+                json.dumps(v, ensure_ascii=False, default=str) if v is not None else None
+                for v in values
+            ]
+        data[name] = values
+
+    table = pa.table(data)
+    if dictionary_columns is None:
+        dictionary_columns = [name for name in columns if _is_query_column(name)]
+    for name in dictionary_columns:
+        if name in table.column_names and pa.types.is_string(table.schema.field(name).type):
+            index = table.column_names.index(name)
+            table = table.set_column(index, name, table.column(name).dictionary_encode())
+
+    return table.replace_schema_metadata({JSON_COLUMNS_KEY: json.dumps(json_columns)})
+
+
+def table_to_records(table) -> List[Dict]:
+    """Inverse of records_to_table"""
+    metadata = table.schema.metadata or {}
+    json_columns = json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]"))
+    records = table.to_pylist()
+    for record in records:
+        for name in json_columns:
+            if record.get(name) is not None:
+                record[name] = json.loads(record[name])
+    return records
+
+
+def write_records(records: List[Dict], path: str, fmt: str = "parquet", compression: str = "zstd"):
+    """Write records as a compressed Parquet or Arrow IPC (Feather v2) file"""
+    pa = _require_pyarrow()
+    table = records_to_table(records)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "parquet":
+        pa.parquet.write_table(table, path, compression=compression)
+    elif fmt == "arrow":
+        pa.feather.write_feather(table, path, compression=compression)
+    else:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+
+
+def read_records(path: str) -> List[Dict]:
+    """Load records written by write_records; the format is taken from the extension"""
+    pa = _require_pyarrow()
+    if path.endswith(FORMAT_EXTENSIONS["parquet"]):
+        table = pa.parquet.read_table(path)
+    else:
+        table = pa.feather.read_table(path)
+    return table_to_records(table)
+
+
+def _decode_dictionary_fields(pa, schema):
+    """Replace dictionary-typed fields of schema by their value type"""
+    fields = [
+        field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+        for field in schema
+    ]
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class ColumnarRecordWriter:
+    """
+    Streams records with a fixed schema to a Parquet or Arrow IPC file.
+
+    Records are buffered and flushed as one row group / record batch every
+    batch_size records, so memory stays bounded for large evaluations.
+
+    The Arrow IPC file format does not allow a dictionary to change between
+    record batches, so dictionary-encoded fields are written as their plain
+    value type in Arrow mode; Parquet keeps the dictionary encoding.
+    """
+    def __init__(self, path: str, schema, fmt: str = "parquet", compression: str = "zstd", batch_size: int = 256):
+        pa = _require_pyarrow()
+        self._pa = pa
+        self.path = path
+        self.schema = schema
+        self.batch_size = batch_size
+        self._buffer = []
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if fmt == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, schema, compression=compression)
+        elif fmt == "arrow":
+            schema = _decode_dictionary_fields(pa, schema)
+            self.schema = schema
+            self._sink = pa.OSFile(path, "wb")
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+        else:
+            raise ValueError(f"Unsupported columnar format: {fmt}")
+        self._fmt = fmt
+
+    def write(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        self._writer.write_table(table)
+        self._buffer = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        if self._fmt == "arrow":
+            self._sink.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,5 +1,6 @@
 import json
 import re
+from functools import lru_cache
 
 def schema_to_text(schema_json):
     lines, vertices, edges = [], [], []
@@ -34,20 +35,36 @@ def schema_to_text(schema_json):
 
     return "\n".join(lines)
 
+_EMPTY_THINK = '<think>\n\n</think>\n\n'
+_THINK_PATTERN = re.compile(r'<think>.*?</think>', re.DOTALL)
+_CYPHER_PATTERN = re.compile(r'```cypher(.*?)```', re.DOTALL)
+_GQL_PATTERN = re.compile(r'```gql(.*?)```', re.DOTALL)
+
+
+@lru_cache(maxsize=65536)
+def _clean_query_text(pred: str) -> str:
+    # Each pass only runs when its marker is present, so plain (or already
+    # cleaned) queries are handled by a single replace-and-strip.
+    if '<think>' in pred:
+        pred = pred.replace(_EMPTY_THINK, '')
+        if '<think>' in pred:
+            pred = _THINK_PATTERN.sub('', pred)
+
+    if '```' in pred:
+        match = _CYPHER_PATTERN.search(pred) or _GQL_PATTERN.search(pred)
+        if match:
+            return match.group(1).replace('\n', ' ').strip()
+
+    return pred.replace('\n', ' ').strip()
+
+
 def clean_query(pred: str) -> str:
     """原样保留 cleaners.py 的逻辑"""
     if not isinstance(pred, str):
         return ""
-    
-    pred = pred.replace('<think>\n\n</think>\n\n', '')
-    pred = re.sub(r'<think>.*?</think>', '', pred, flags=re.DOTALL)
-    
-    match_cypher = re.search(r'```cypher(.*?)```', pred, re.DOTALL)
-    if match_cypher:
-        return match_cypher.group(1).replace('\n', ' ').strip()
-        
-    match_gql = re.search(r'```gql(.*?)```', pred, re.DOTALL)
-    if match_gql:
-        return match_gql.group(1).replace('\n', ' ').strip()
-        
-    return pred.replace('\n', ' ').strip()
\ No newline at end of file
+    return _clean_query_text(pred)
+
+
+def clean_queries(preds: list) -> list:
+    """Batch version of clean_query; repeated strings are cleaned only once."""
+    return [clean_query(p) for p in preds]
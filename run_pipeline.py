@@ -2,10 +2,19 @@ import json
 import argparse
 import os
 import sys
-from impl.text2graph_system.qwen_zeroshot_system import QwenZeroshotSystem
-from impl.db_driver.tugraph_driver import TuGraphAdapter
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from impl.evaluation.metrics import ExecutionAccuracy, GoogleBleu, ExternalMetric
-from impl.text2graph_system.utils import clean_query
+from impl.evaluation.registry import METRIC_VERSION, RunRegistry, content_hash
+from impl.evaluation.report import open_detail_writer, preview_result, row_count
+from impl.storage.columnar import columnar_path, read_records, write_records
+from impl.text2graph_system.utils import clean_queries
+
+ALL_METRICS = ("ea", "grammar", "similarity", "bleu")
+# EA outcomes that depend on the server state rather than on the queries; never stored in the run registry
+TRANSIENT_EA_STATUSES = (
+    ExecutionAccuracy.ERROR, ExecutionAccuracy.TIMEOUT, ExecutionAccuracy.REJECTED, ExecutionAccuracy.GOLD_ERROR
+)
 
 class PipelineRunner:
     """
@@ -15,40 +24,171 @@ class PipelineRunner:
         self.config_path = config_path
         self.cfg = self._load_config(config_path)
         self.db_driver = None
+        # Expensive resources (DB, LLM system, grammar workers, BLEU), created
+        # on first use and only for the enabled phases / metrics
+        self._resources = {}
+        self._resource_locks = {name: threading.Lock() for name in ("system", "db", "external", "bleu")}
         self.results = [] # Used for sharing data between prediction and evaluation phases
+        self._print_lock = threading.Lock() # Keeps output of concurrently evaluated levels readable
+        self._golds = [] # Cleaned gold queries, shared by all levels
+        self._db_ids = []
 
     def _load_config(self, path):
         print(f"Loading configuration from {path}...")
         with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
 
+    def _enabled_metrics(self):
+        metrics = self.cfg["evaluation"].get("metrics", ALL_METRICS)
+        unknown = set(metrics) - set(ALL_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown evaluation metrics {sorted(unknown)} (expected a subset of {list(ALL_METRICS)})")
+        return set(metrics)
+
+    def _required_resources(self):
+        """Resources needed by the enabled phases and metrics"""
+        needed = []
+        if self.cfg["pipeline"]["run_prediction"]:
+            needed.append("system")
+        if self.cfg["pipeline"]["run_evaluation"]:
+            metrics = self._enabled_metrics()
+            if "ea" in metrics:
+                needed.append("db")
+            if metrics & {"grammar", "similarity"}:
+                needed.append("external")
+            if "bleu" in metrics:
+                needed.append("bleu")
+        return needed
+
+    def _init_resources(self):
+        """
+        Create the resources of the enabled phases concurrently, and stop
+        before any work is done if one of them cannot be set up.
+        """
+        needed = self._required_resources()
+        if not needed:
+            return
+        with ThreadPoolExecutor(max_workers=len(needed)) as pool:
+            futures = {name: pool.submit(self._resource, name) for name in needed}
+        errors = []
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+        if errors:
+            raise RuntimeError("Failed to initialize pipeline resources:\n  " + "\n  ".join(errors))
+
+    def _resource(self, name):
+        """The named resource, created on first use"""
+        with self._resource_locks[name]:
+            if name not in self._resources:
+                self._resources[name] = getattr(self, f"_create_{name}")()
+            return self._resources[name]
+
+    def _create_system(self):
+        from impl.text2graph_system.qwen_zeroshot_system import QwenZeroshotSystem
+
+        print("Initializing Text2Graph System...")
+        return QwenZeroshotSystem(self.cfg["prediction"])
+
+    def _create_db(self):
+        if self.db_driver is None:
+            self._init_db_driver()
+        return self.db_driver
+
+    def _create_external(self):
+        eval_cfg = self.cfg["evaluation"]
+        if not os.path.isdir(eval_cfg["dbgpt_root"]):
+            raise FileNotFoundError(f"DBGPT root not found: {os.path.abspath(eval_cfg['dbgpt_root'])}")
+        etypes = [etype for etype in ("grammar", "similarity") if etype in self._enabled_metrics()]
+        return ExternalMetric(eval_cfg["dbgpt_root"], max_workers=eval_cfg.get("grammar_workers"), etypes=etypes)
+
+    def _create_bleu(self):
+        return GoogleBleu()
+
     def _init_db_driver(self):
-        """Initialize database connection"""
-        # EA (Execution Accuracy) is now enabled
+        """Initialize database connection; raises if it cannot be established"""
+        # Only the selected backend (and its client library) is imported
         eval_cfg = self.cfg["evaluation"]
-        print(f"Connecting to TuGraph ({eval_cfg['db_uri']})...")
-        self.db_driver = TuGraphAdapter(eval_cfg["db_uri"], eval_cfg["db_user"], eval_cfg["db_pass"])
+        if eval_cfg.get("db_backend", "tugraph") == "embedded":
+            # In-process graph loaded from the import config CSVs; no database service needed
+            graphs = eval_cfg.get("embedded_graphs") or {"geography": self.cfg["prediction"]["schema_path"]}
+            print(f"Loading embedded graph engine ({', '.join(graphs)})...")
+            from impl.db_driver.embedded_driver import EmbeddedGraphAdapter
+
+            self.db_driver = EmbeddedGraphAdapter(graphs)
+        elif eval_cfg.get("db_uris"):
+            # Read-only replicas of the same graph, balanced by outstanding requests
+            print(f"Connecting to TuGraph ({', '.join(eval_cfg['db_uris'])})...")
+            from impl.db_driver.balanced_tugraph_driver import LoadBalancedTuGraphAdapter
+
+            self.db_driver = LoadBalancedTuGraphAdapter(
+                eval_cfg["db_uris"], eval_cfg["db_user"], eval_cfg["db_pass"],
+                max_connection_pool_size=eval_cfg.get("db_pool_size"),
+                query_timeout=eval_cfg.get("query_timeout"),
+                max_failures=eval_cfg.get("max_failures", 3),
+                health_check_interval=eval_cfg.get("health_check_interval", 5),
+                max_in_flight=eval_cfg.get("max_in_flight", 64),
+                max_query_cost=eval_cfg.get("max_query_cost")
+            )
+        elif eval_cfg.get("async_driver", False):
+            # Pipelines up to max_in_flight queries over the async Bolt driver
+            print(f"Connecting to TuGraph ({eval_cfg['db_uri']})...")
+            from impl.db_driver.async_tugraph_driver import AsyncTuGraphAdapter, AsyncDriverBridge
+
+            max_in_flight = eval_cfg.get("max_in_flight", 64)
+            self.db_driver = AsyncDriverBridge(
+                AsyncTuGraphAdapter(
+                    eval_cfg["db_uri"], eval_cfg["db_user"], eval_cfg["db_pass"],
+                    max_connection_pool_size=eval_cfg.get("db_pool_size", max_in_flight),
+                    query_timeout=eval_cfg.get("query_timeout"),
+                    max_query_cost=eval_cfg.get("max_query_cost")
+                ),
+                max_in_flight=max_in_flight
+            )
+        else:
+            print(f"Connecting to TuGraph ({eval_cfg['db_uri']})...")
+            from impl.db_driver.tugraph_driver import TuGraphAdapter
+
+            self.db_driver = TuGraphAdapter(
+                eval_cfg["db_uri"], eval_cfg["db_user"], eval_cfg["db_pass"],
+                max_connection_pool_size=eval_cfg.get("db_pool_size"),
+                query_timeout=eval_cfg.get("query_timeout"),
+                max_query_cost=eval_cfg.get("max_query_cost")
+            )
         self.db_driver.connect()
+        if not self.db_driver.is_connected():
+            # Carrying on would report 0% EA for every level
+            self.db_driver.close()
+            self.db_driver = None
+            raise RuntimeError("Database connection failed (disable EA with evaluation.metrics to run without it)")
 
     def run_prediction_phase(self):
         """Execute prediction phase logic"""
         data_path = self.cfg["data"]["input_path"]
         output_path = self.cfg["data"]["output_path"]
+        output_format = self.cfg["data"].get("output_format", "json")
+        if output_format != "json":
+            output_path = columnar_path(output_path, output_format)
 
         if self.cfg["pipeline"]["run_prediction"]:
             print(f"Loading raw data from {data_path}...")
             with open(data_path, "r", encoding="utf-8") as f:
                 raw_data = json.load(f)
             
-            print("Initializing Text2Graph System...")
-            system = QwenZeroshotSystem(self.cfg["prediction"])
+            system = self._resource("system")
             
             print("Running Prediction Batch...")
             self.results = system.predict_batch(raw_data)
             
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(self.results, f, indent=2, ensure_ascii=False)
+            if output_format == "json":
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                with open(output_path, "w", encoding="utf-8") as f:
+                    json.dump(self.results, f, indent=2, ensure_ascii=False)
+            else:
+                write_records(self.results, output_path, fmt=output_format,
+                              compression=self.cfg["data"].get("compression", "zstd"))
             print(f"Predictions saved to {output_path}")
         else:
             print(f"Skipping prediction. Loading existing results from {output_path}...")
@@ -56,8 +196,11 @@ class PipelineRunner:
                 print(f"Error: Output file {output_path} not found. Cannot evaluate.")
                 sys.exit(1)
                 
-            with open(output_path, "r", encoding="utf-8") as f:
-                self.results = json.load(f)
+            if output_format == "json":
+                with open(output_path, "r", encoding="utf-8") as f:
+                    self.results = json.load(f)
+            else:
+                self.results = read_records(output_path)
 
     def run_evaluation_phase(self):
         """Execute evaluation phase logic"""
@@ -67,89 +210,213 @@ class PipelineRunner:
         print("\nStarting Evaluation...")
         eval_cfg = self.cfg["evaluation"]
 
-        # 1. Initialize metrics
-        # EA is enabled, so we initialize ExecutionAccuracy using self.db_driver
-        ea_metric = ExecutionAccuracy(self.db_driver)
+        # 1. Initialize metrics (None when disabled in evaluation.metrics)
+        # All levels share one DB driver (and its connection pool), one EA
+        # metric (and its gold-result cache) and one grammar worker pool.
+        metrics = self._enabled_metrics()
+        ea_metric = None
+        if "ea" in metrics:
+            ea_metric = ExecutionAccuracy(self._resource("db"), use_fingerprints=eval_cfg.get("ea_fingerprint", False))
+        bleu_metric = self._resource("bleu") if "bleu" in metrics else None
+        ext_metric = self._resource("external") if metrics & {"grammar", "similarity"} else None
         
-        bleu_metric = GoogleBleu()
-        ext_metric = ExternalMetric(eval_cfg["dbgpt_root"])
+        # Gold queries are the same for every level
+        self._golds = clean_queries([item.get("gql_query", "") for item in self.results])
+        self._db_ids = [item.get("database") or "geography" for item in self.results]
+
+        # Optional run registry: reuse stored per-instance results of unchanged instances
+        # (results computed with different metrics or EA settings are not reused)
+        registry = None
+        if eval_cfg.get("registry_path"):
+            registry = RunRegistry(eval_cfg["registry_path"], self._registry_version(metrics))
         
         levels = self.cfg["prediction"]["level_fields"]
+        level_workers = eval_cfg.get("level_workers", len(levels))
 
-        # 2. Iterate through different difficulty levels for evaluation
-        for _, query_key in levels:
-            # We now pass ea_metric to the evaluation function
-            self._evaluate_single_level(query_key, ea_metric, bleu_metric, ext_metric)
+        # 2. Evaluate the independent difficulty levels concurrently
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, level_workers)) as pool:
+                futures = [
+                    pool.submit(self._evaluate_single_level, query_key, ea_metric, bleu_metric, ext_metric, registry)
+                    for _, query_key in levels
+                ]
+                # Summaries are reported in level order regardless of completion order
+                for future in futures:
+                    self._log_block(future.result())
+        finally:
+            if registry:
+                registry.close()
 
-    def _evaluate_single_level(self, query_key, ea_metric, bleu_metric, ext_metric):
-        """Evaluate a single difficulty level and save detailed results"""
-        print(f"\n{'='*40}")
-        print(f"Evaluating Level: {query_key}")
-        print(f"{'='*40}")
-        
-        preds = []
-        golds = []
-        
-        # Data cleaning and preparation
-        for item in self.results:
-            raw_p = item.get(query_key, "")
-            raw_g = item.get("gql_query", "")
-            p = clean_query(raw_p)
-            g = clean_query(raw_g)
-            preds.append(p)
-            golds.append(g)
-        
-        # --- Metric Calculation ---
-        print("Calculating Execution Accuracy...")
-        # Computing EA
-        ea = ea_metric.compute(preds, golds, db_ids=[])
-        
-        print("Calculating Google BLEU...")
-        bleu = bleu_metric.compute(preds, golds)
+    def _registry_version(self, metrics):
+        """Metric version of the run registry: the metric selection and every setting that changes EA outcomes"""
+        version = f"{METRIC_VERSION}:{','.join(sorted(metrics))}"
+        if "ea" not in metrics:
+            return version
+        eval_cfg = self.cfg["evaluation"]
+        backend = eval_cfg.get("db_backend", "tugraph")
+        if backend == "embedded":
+            graphs = eval_cfg.get("embedded_graphs") or {"geography": self.cfg["prediction"]["schema_path"]}
+        else:
+            graphs = eval_cfg.get("db_uris") or eval_cfg.get("db_uri")
+        ea_settings = {
+            "backend": backend,
+            "graphs": graphs,
+            "query_timeout": eval_cfg.get("query_timeout"),
+            "max_query_cost": eval_cfg.get("max_query_cost"),
+            "ea_fingerprint": eval_cfg.get("ea_fingerprint", False),
+        }
+        return f"{version}:{content_hash(json.dumps(ea_settings, sort_keys=True))[:16]}"
+
+    def _log(self, query_key, message):
+        """Print a progress line tagged with its level"""
+        with self._print_lock:
+            print(f"[{query_key}] {message}")
+
+    def _log_block(self, lines):
+        """Print several lines without interleaving output from other levels"""
+        with self._print_lock:
+            print("\n".join(lines))
+
+    def _evaluate_single_level(self, query_key, ea_metric, bleu_metric, ext_metric, registry=None):
+        """Evaluate a single difficulty level, stream per-instance results and return its summary"""
+        self._log(query_key, "Evaluating Level")
         
-        print("Calculating Grammar & Similarity...")
-        ext_res = ext_metric.compute(preds, golds)
+        # Data cleaning and preparation (golds are shared by all levels and cleaned once)
+        preds = clean_queries([item.get(query_key, "") for item in self.results])
+        golds, db_ids = self._golds, self._db_ids
+
+        # Only instances without a stored result for the same pred/gold are evaluated
+        keys, cached = [], {}
+        if registry:
+            keys = [
+                registry.instance_key(self._instance_id(i, item), preds[i], golds[i], db_ids[i])
+                for i, item in enumerate(self.results)
+            ]
+            cached = registry.lookup(query_key, keys)
+        pending = [i for i in range(len(preds)) if i not in cached]
+        if registry:
+            self._log(query_key, f"Reusing {len(cached)} stored results, evaluating {len(pending)}")
         
-        # --- Print Summary ---
-        print(f"\nResults for {query_key}:")
-        print(f"  - Samples    : {len(preds)}")
-        print(f"  - EA (Acc)   : {ea:.2%}")
-        print(f"  - Grammar    : {ext_res['Grammar']:.2%}")
-        print(f"  - Similarity : {ext_res['Similarity']:.4f}")
-        print(f"  - BLEU       : {bleu if isinstance(bleu, str) else f'{bleu:.4f}'}")
-
-        # --- Save Detailed Results ---
-        # Pass 'ea' to be saved
-        self._save_detailed_results(query_key, preds, golds, ea, bleu, ext_res)
-
-    def _save_detailed_results(self, query_key, preds, golds, ea, bleu, ext_res):
-        """Save evaluation details to file"""
-        # Fixed path separator for cross-platform compatibility
+        # --- Grammar & Similarity (one external run over all pending instances) ---
+        ext_per_instance = {'Grammar': {}, 'Similarity': {}}
+        if pending and ext_metric:
+            self._log(query_key, "Calculating Grammar & Similarity...")
+            _, ext_scores = ext_metric.compute_with_details(
+                [preds[i] for i in pending], [golds[i] for i in pending]
+            )
+            for name, scores in ext_scores.items():
+                ext_per_instance[name] = dict(zip(pending, scores))
+
+        # --- Execution Accuracy & BLEU, streamed per instance to the detailed report ---
+        self._log(query_key, "Calculating Execution Accuracy & Google BLEU...")
         output_dir = os.path.join("evaluation_detail", "execution_results")
-        os.makedirs(output_dir, exist_ok=True)
-
-        detailed_records = []
-        for i, item in enumerate(self.results):
-            record = {
-                "instance_id": item.get("id", i),
-                "gold_query": golds[i],
-                "pred_query": item.get(query_key, ""),
-                "cleaned_pred": preds[i],
-                "metrics": {
-                    "accuracy": ea,  # EA is now included
-                    "grammar": ext_res["Grammar"],
-                    "similarity": ext_res["Similarity"],
-                    "google_bleu": float(bleu) if not isinstance(bleu, str) else bleu
-                },
-                "gold_result": None,
-                "pred_result": None
-            }
-            detailed_records.append(record)
-
-        save_path = os.path.join(output_dir, f"{query_key}_results.json")
-        with open(save_path, "w", encoding="utf-8") as f:
-            json.dump(detailed_records, f, indent=2, ensure_ascii=False)
-        print(f"Detailed results saved → {save_path}")
+        records, gleu_stats = [], []
+        # EA runs in batches, so drivers that pipeline queries can overlap them
+        batch_size = self.cfg["evaluation"].get("ea_batch_size", 256)
+        outcomes, next_pending = {}, 0
+        writer = open_detail_writer(
+            output_dir, query_key,
+            fmt=self.cfg["data"].get("output_format", "json"),
+            compression=self.cfg["data"].get("compression", "zstd")
+        )
+        with writer:
+            for i, item in enumerate(self.results):
+                if i in cached:
+                    record, stats = cached[i]
+                    record["pred_query"] = item.get(query_key, "")
+                else:
+                    if ea_metric is None:
+                        outcome = ExecutionAccuracy.skipped_outcome()
+                    else:
+                        if i not in outcomes:
+                            batch = pending[next_pending:next_pending + batch_size]
+                            next_pending += len(batch)
+                            outcomes = dict(zip(batch, ea_metric.evaluate_many(
+                                [preds[j] for j in batch], [golds[j] for j in batch], [db_ids[j] for j in batch]
+                            )))
+                        outcome = outcomes.pop(i)
+                    if bleu_metric:
+                        stats = bleu_metric.sentence_stats(preds[i], golds[i])
+                        gleu = stats[0] / stats[1] if stats[1] > 0 else 0.0
+                    else:
+                        stats, gleu = (0, 0), None
+                    record = self._build_detail_record(
+                        i, item, query_key, preds[i], golds[i], outcome,
+                        ext_per_instance["Grammar"].get(i),
+                        ext_per_instance["Similarity"].get(i),
+                        gleu,
+                    )
+                    # Results with a failed external metric run or a transient EA
+                    # outcome (timeout, connection error, ...) are recomputed next time
+                    if registry and outcome["status"] not in TRANSIENT_EA_STATUSES and all(
+                        record["metrics"][name] is not None
+                        for name in ("grammar", "similarity") if name in self._enabled_metrics()
+                    ):
+                        registry.store(query_key, keys[i], record, stats)
+                writer.write(record)
+                records.append(record)
+                gleu_stats.append(stats)
+
+        # --- Aggregates, rebuilt from the per-instance values ---
+        metrics = self._enabled_metrics()
+        ea = self._mean([r["metrics"]["accuracy"] for r in records]) if "ea" in metrics else 0.0
+        grammar = self._mean([r["metrics"]["grammar"] for r in records], valid_only=True)
+        similarity = self._mean([r["metrics"]["similarity"] for r in records], valid_only=True)
+        bleu = GoogleBleu.corpus_score(gleu_stats)
+
+        def show(name, text):
+            return text if name in metrics else "disabled"
+
+        # --- Summary ---
+        return [
+            f"\n{'='*40}",
+            f"Results for {query_key}:",
+            f"{'='*40}",
+            f"  - Samples    : {len(preds)}",
+            f"  - EA (Acc)   : {show('ea', f'{ea:.2%}')}",
+            f"  - Grammar    : {show('grammar', f'{grammar:.2%}')}",
+            f"  - Similarity : {show('similarity', f'{similarity:.4f}')}",
+            f"  - BLEU       : {show('bleu', f'{bleu:.4f}')}",
+            f"Detailed results saved → {writer.path}",
+        ]
+
+    @staticmethod
+    def _mean(values, valid_only=False):
+        """Mean of per-instance scores; with valid_only, missing and negative (-1: not scorable) ones are skipped"""
+        if valid_only:
+            values = [v for v in values if v is not None and v >= 0]
+        return sum(values) / len(values) if values else 0.0
+
+    @staticmethod
+    def _instance_id(index, item):
+        return item.get("id", item.get("instance_id", index))
+
+    def _build_detail_record(self, index, item, query_key, pred, gold, outcome, grammar, similarity, gleu):
+        """Per-instance evaluation record written to the detailed report"""
+        preview_rows = self.cfg["evaluation"].get("preview_rows", 5)
+        gold_rows, pred_rows = outcome["gold_result"], outcome["pred_result"]
+        return {
+            "instance_id": self._instance_id(index, item),
+            "gold_query": gold,
+            "pred_query": item.get(query_key, ""),
+            "cleaned_pred": pred,
+            "metrics": {
+                "accuracy": None if outcome["status"] == ExecutionAccuracy.SKIPPED else int(outcome["correct"]),
+                "ea_status": outcome["status"],
+                "grammar": grammar,
+                "similarity": similarity,
+                "google_bleu": gleu,
+            },
+            "latency_ms": {
+                "gold": outcome["gold_latency_ms"],
+                "pred": outcome["pred_latency_ms"],
+            },
+            "error": outcome["error"],
+            "gold_rows": row_count(gold_rows),
+            "pred_rows": row_count(pred_rows),
+            "gold_result": preview_result(gold_rows, preview_rows),
+            "pred_result": preview_result(pred_rows, preview_rows),
+        }
 
     def cleanup(self):
         """Resource cleanup"""
@@ -163,8 +430,8 @@ class PipelineRunner:
     def run(self):
         """Main entry point method"""
         try:
-            # 1. Initialize resources (including DB)
-            self._init_db_driver()
+            # 1. Initialize the resources of the enabled phases (fails fast)
+            self._init_resources()
 
             # 2. Run phases
             self.run_prediction_phase()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from impl.evaluation.report import detail_schema
+from impl.storage.columnar import ColumnarRecordWriter, read_records
+
+
+def _record(i):
+    return {
+        "instance_id": str(i),
+        "gold_query": f"MATCH (n) RETURN n LIMIT {i % 7}",
+        "pred_query": f"MATCH (n) RETURN n LIMIT {i % 5}",
+        "cleaned_pred": f"MATCH (n) RETURN n LIMIT {i % 5}",
+        "accuracy": i % 2,
+        "ea_status": "ok",
+    }
+
+
+class ColumnarRecordWriterTest(unittest.TestCase):
+    def _roundtrip(self, fmt):
+        records = [_record(i) for i in range(600)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "detail." + fmt)
+            with ColumnarRecordWriter(path, detail_schema(), fmt=fmt, batch_size=256) as writer:
+                for record in records:
+                    writer.write(record)
+            loaded = read_records(path)
+        self.assertEqual(len(loaded), len(records))
+        self.assertEqual(loaded[300]["gold_query"], records[300]["gold_query"])
+        self.assertEqual(loaded[599]["pred_query"], records[599]["pred_query"])
+
+    def test_arrow_multiple_batches(self):
+        self._roundtrip("arrow")
+
+    def test_parquet_multiple_batches(self):
+        self._roundtrip("parquet")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import threading
+import time
+import unittest
+
+from driver.evaluation import QueryRejected
+from impl.db_driver.cost_guard import COUNT_QUERY, CostGuard
+
+COUNTS = [
+    {"is_vertex": True, "label": "City", "count": 1000},
+    {"is_vertex": False, "label": "road", "count": 5000},
+]
+SCAN_PLAN = [{"plan": "Produce Results\n    All Node Scan [n]"}]
+
+
+class CostGuardTest(unittest.TestCase):
+    def test_rejects_plans_above_budget(self):
+        guard = CostGuard(10)
+        run = lambda text: COUNTS if text == COUNT_QUERY else SCAN_PLAN
+        with self.assertRaises(QueryRejected):
+            guard.check("g", "MATCH (n) RETURN n", run)
+        CostGuard(1e6).check("g", "MATCH (n) RETURN n", run)
+
+    def test_steps_aside_on_malformed_counts(self):
+        guard = CostGuard(10)
+        rows = [{"only": "two", "columns": 1}, {"a": None, "b": 3, "c": "x"}]
+        guard.check("g", "MATCH (n) RETURN n", lambda text: rows if text == COUNT_QUERY else SCAN_PLAN)
+
+    def test_steps_aside_on_malformed_plan(self):
+        guard = CostGuard(10)
+        guard.check("g", "MATCH (n) RETURN n", lambda text: COUNTS if text == COUNT_QUERY else [5, None])
+
+    def test_counts_loaded_once_by_concurrent_callers(self):
+        guard = CostGuard(1e6)
+        calls = []
+
+        def run(text):
+            calls.append(text)
+            time.sleep(0.02)
+            return COUNTS if text == COUNT_QUERY else SCAN_PLAN
+
+        threads = [threading.Thread(target=guard.check, args=("g", "MATCH (n) RETURN n", run)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls.count(COUNT_QUERY), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import ast
+import builtins
+import importlib.util
+import os
+import unittest
+
+EVALUATOR_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tools", "eval_similarity_grammar", "eval_similarity_grammar",
+    "eval", "evaluator", "impl", "tugraph-db", "execution_evaluator.py",
+)
+
+
+def _bound_names(tree):
+    """Every name the module binds anywhere (imports, definitions, arguments, assignment targets)"""
+    names = set(dir(builtins)) | {"__file__", "__name__"}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+    return names
+
+
+class ExecutionEvaluatorModuleTest(unittest.TestCase):
+    def setUp(self):
+        with open(EVALUATOR_PATH, encoding="utf-8") as f:
+            self.tree = ast.parse(f.read())
+
+    def test_every_used_name_is_defined(self):
+        bound = _bound_names(self.tree)
+        used = {
+            node.id for node in ast.walk(self.tree)
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+        }
+        self.assertEqual(sorted(used - bound), [])
+
+    def test_every_import_is_used(self):
+        used = {node.id for node in ast.walk(self.tree) if isinstance(node, ast.Name)}
+        for node in ast.walk(self.tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    name = (alias.asname or alias.name).split(".")[0]
+                    self.assertIn(name, used, f"unused import {name}")
+
+    def test_module_resolves_helpers(self):
+        for dependency in ("neo4j",):
+            if importlib.util.find_spec(dependency) is None:
+                self.skipTest(f"{dependency} is not installed")
+        spec = importlib.util.spec_from_file_location("execution_evaluator", EVALUATOR_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for name in ("wait_for_bolt", "_predict_worker", "PredictExecutorPool", "clone_tree", "ExecutionEvaluator"):
+            self.assertTrue(callable(getattr(module, name, None)), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
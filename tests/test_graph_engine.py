@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import unittest
+
+from impl.db_driver.embedded_driver import EmbeddedGraphAdapter
+from impl.graph_engine.cypher import CypherError
+
+PERSONS = [("alice", "30", "paris"), ("bob", "25", "paris"), ("carol", "", "rome"), ("dave", "41", "rome")]
+KNOWS = [("alice", "bob", "2010"), ("bob", "carol", "2015"), ("carol", "alice", "2012"), ("alice", "dave", "2020")]
+
+
+def _write_graph(root):
+    with open(os.path.join(root, "person.csv"), "w", encoding="utf-8") as f:
+        f.writelines(",".join(row) + "\n" for row in PERSONS)
+    with open(os.path.join(root, "knows.csv"), "w", encoding="utf-8") as f:
+        f.writelines(",".join(row) + "\n" for row in KNOWS)
+    config = {
+        "schema": [
+            {"label": "Person", "type": "VERTEX", "primary": "name", "properties": [
+                {"name": "name", "type": "STRING"},
+                {"name": "age", "type": "INT64", "optional": True},
+                {"name": "city", "type": "STRING"},
+            ]},
+            {"label": "KNOWS", "type": "EDGE", "properties": [{"name": "since", "type": "INT64"}]},
+        ],
+        "files": [
+            {"path": "person.csv", "format": "CSV", "label": "Person", "columns": ["name", "age", "city"]},
+            {"path": "knows.csv", "format": "CSV", "label": "KNOWS", "SRC_ID": "Person", "DST_ID": "Person",
+             "columns": ["SRC_ID", "DST_ID", "since"]},
+        ],
+    }
+    path = os.path.join(root, "import_config.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return path
+
+
+class EmbeddedGraphEngineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.driver = EmbeddedGraphAdapter({"social": _write_graph(cls._tmp.name)})
+        cls.driver.connect()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.driver.close()
+        cls._tmp.cleanup()
+
+    def run_query(self, cypher):
+        return self.driver.execute(cypher, "social")
+
+    def test_pattern_matching(self):
+        rows = self.run_query("MATCH (a:Person {name: 'alice'})-[:KNOWS]->(b:Person) RETURN b.name AS name")
+        self.assertEqual(sorted(r["name"] for r in rows), ["bob", "dave"])
+        rows = self.run_query("MATCH (a:Person)<-[k:KNOWS]-(b:Person {name: 'bob'}) RETURN a.name, k.since")
+        self.assertEqual(rows, [{"a.name": "carol", "k.since": 2015}])
+
+    def test_relationship_uniqueness(self):
+        # a->b<-a would need the same KNOWS edge twice
+        rows = self.run_query("MATCH (a:Person)-[r1:KNOWS]->(b:Person)<-[r2:KNOWS]-(a) RETURN a.name")
+        self.assertEqual(rows, [])
+        # the 3-cycle uses three distinct edges and is found once per starting vertex
+        rows = self.run_query(
+            "MATCH (a:Person)-[:KNOWS]->(b:Person)-[:KNOWS]->(c:Person)-[:KNOWS]->(a) RETURN a.name AS name"
+        )
+        self.assertEqual(sorted(r["name"] for r in rows), ["alice", "bob", "carol"])
+
+    def test_aggregation_and_grouping(self):
+        rows = self.run_query(
+            "MATCH (p:Person) RETURN p.city AS city, count(p) AS n, sum(p.age) AS total, collect(p.name) AS names"
+        )
+        by_city = {r["city"]: r for r in rows}
+        self.assertEqual(by_city["paris"]["n"], 2)
+        self.assertEqual(by_city["paris"]["total"], 55)
+        self.assertEqual(by_city["rome"]["total"], 41)  # carol has no age
+        self.assertEqual(sorted(by_city["rome"]["names"]), ["carol", "dave"])
+        self.assertEqual(self.run_query("MATCH (p:Person) RETURN count(*) AS n"), [{"n": 4}])
+
+    def test_with_where(self):
+        rows = self.run_query(
+            "MATCH (a:Person)-[:KNOWS]->(b:Person) WITH a, count(b) AS friends WHERE friends > 1 "
+            "RETURN a.name AS name, friends"
+        )
+        self.assertEqual(rows, [{"name": "alice", "friends": 2}])
+
+    def test_order_skip_limit(self):
+        rows = self.run_query("MATCH (p:Person) RETURN p.name AS name ORDER BY name SKIP 1 LIMIT 2")
+        self.assertEqual([r["name"] for r in rows], ["bob", "carol"])
+        rows = self.run_query("MATCH (p:Person) RETURN p.name AS name ORDER BY name DESC LIMIT 1")
+        self.assertEqual(rows, [{"name": "dave"}])
+
+    def test_is_null(self):
+        rows = self.run_query("MATCH (p:Person) WHERE p.age IS NULL RETURN p.name AS name")
+        self.assertEqual(rows, [{"name": "carol"}])
+        rows = self.run_query("MATCH (p:Person) WHERE p.age IS NOT NULL RETURN count(p) AS n")
+        self.assertEqual(rows, [{"n": 3}])
+
+    def test_integer_division(self):
+        rows = self.run_query("MATCH (p:Person {name: 'alice'}) RETURN p.age / 7 AS q, p.age / 7.5 AS f, -7 / 2 AS neg")
+        self.assertEqual(rows, [{"q": 4, "f": 4.0, "neg": -3}])
+        self.assertIsInstance(rows[0]["q"], int)
+
+    def test_parse_error_message(self):
+        with self.assertRaises(CypherError) as ctx:
+            self.run_query("MATCH (p:Person RETURN p")
+        self.assertRegex(str(ctx.exception), r"^Invalid input 'RETURN' at position 16: ")
+        self.assertIsNone(self.driver.query("MATCH (p:Person RETURN p", "social"))
+
+    def test_unsupported_syntax(self):
+        with self.assertRaisesRegex(CypherError, "OPTIONAL MATCH is not supported"):
+            self.run_query("OPTIONAL MATCH (p:Person) RETURN p")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+
+from driver.evaluation import MAX_TOLERANT_ROWS, DatabaseDriver, ResultFingerprinter, compare_rows
+
+
+class CompareRowsTest(unittest.TestCase):
+    def test_reordered_rows_are_equal(self):
+        gold = [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 3, "b": "z"}]
+        self.assertTrue(compare_rows(gold, list(reversed(gold))))
+
+    def test_column_names_are_ignored(self):
+        self.assertTrue(compare_rows([{"a": 1}], [{"count(n)": 1}]))
+
+    def test_duplicates_count(self):
+        self.assertTrue(compare_rows([{"a": 1}, {"a": 1}, {"a": 2}], [{"a": 2}, {"a": 1}, {"a": 1}]))
+        self.assertFalse(compare_rows([{"a": 1}, {"a": 1}, {"a": 2}], [{"a": 1}, {"a": 2}, {"a": 2}]))
+        self.assertFalse(compare_rows([{"a": 1}, {"a": 1}], [{"a": 1}]))
+
+    def test_int_and_float_are_equal(self):
+        self.assertTrue(compare_rows([{"a": 1}], [{"a": 1.0}]))
+
+    def test_float_tolerance_boundary(self):
+        self.assertTrue(compare_rows([{"avg": 0.1 + 0.2}], [{"avg": 0.3}]))
+        self.assertTrue(compare_rows([{"avg": 1000.0}], [{"avg": 1000.0009}]))  # relative 9e-7
+        self.assertFalse(compare_rows([{"avg": 1000.0}], [{"avg": 1000.0011}]))  # relative 1.1e-6
+        self.assertTrue(compare_rows([{"x": 0.0}], [{"x": 5e-10}]))  # absolute tolerance near zero
+        self.assertFalse(compare_rows([{"x": 0.0}], [{"x": 5e-9}]))
+
+    def test_nested_values(self):
+        self.assertTrue(compare_rows([{"l": [1, 2.0], "m": {"k": 0.3}}], [{"l": [1.0, 2], "m": {"k": 0.1 + 0.2}}]))
+        self.assertFalse(compare_rows([{"l": [1, 2]}], [{"l": [2, 1]}]))
+
+    def test_tolerant_matching_cutoff(self):
+        n = MAX_TOLERANT_ROWS
+        gold = [{"v": i + 0.5} for i in range(n + 1)]
+        close = [{"v": i + 0.5 + 1e-8} for i in range(n + 1)]
+        # within the cutoff the rows are matched pairwise with tolerance
+        self.assertTrue(compare_rows(gold[:n], close[:n]))
+        # beyond it, rows unmatched by hash make the results differ
+        self.assertFalse(compare_rows(gold, close))
+        # exact matches are not limited
+        self.assertTrue(compare_rows(gold, list(reversed(gold))))
+
+
+def _fingerprint(rows, mode="both"):
+    fingerprinter = ResultFingerprinter(mode)
+    for row in rows:
+        fingerprinter.add(row)
+    return fingerprinter.result()
+
+
+class _ListDriver(DatabaseDriver):
+    def __init__(self, results):
+        self.results = results
+
+    def connect(self):
+        pass
+
+    def query(self, cypher, db_name):
+        return self.results[cypher]
+
+    def close(self):
+        pass
+
+
+class ResultFingerprintTest(unittest.TestCase):
+    # (gold, pred) pairs and whether compare_rows considers them equal
+    CASES = [
+        ([{"a": 1}], [{"a": 1.0}], True),
+        ([{"a": True}], [{"a": 1}], True),
+        ([{"avg": 0.1 + 0.2}], [{"avg": 0.3}], True),
+        ([{"avg": 2 / 3}], [{"avg": 0.6666667}], True),
+        ([{"x": 0.0}], [{"x": 5e-10}], True),
+        ([{"x": -0.0}], [{"x": 0}], True),
+        ([{"l": [1, 2.0], "m": {"k": 0.3}}], [{"l": [1.0, 2], "m": {"k": 0.1 + 0.2}}], True),
+        ([{"a": 1}, {"a": 2}], [{"a": 2}, {"a": 1}], True),
+        ([{"a": 1}, {"a": 1}], [{"a": 1}], False),
+        ([{"a": 1}, {"a": 1}, {"a": 2}], [{"a": 1}, {"a": 2}, {"a": 2}], False),
+        ([{"avg": 1.5}], [{"avg": 1.6}], False),
+        ([{"avg": 1000.0}], [{"avg": 1000.01}], False),
+        ([{"s": "1"}], [{"s": 1}], False),
+    ]
+
+    def test_agrees_with_compare_rows(self):
+        for gold, pred, equal in self.CASES:
+            with self.subTest(gold=gold, pred=pred):
+                self.assertEqual(compare_rows(gold, pred), equal)
+                a, b = _fingerprint(gold, "unordered"), _fingerprint(pred, "unordered")
+                self.assertEqual((a.row_count, a.unordered) == (b.row_count, b.unordered), equal)
+
+    def test_ordered_fingerprint_depends_on_order(self):
+        rows = [{"a": 1}, {"a": 2}]
+        forward, backward = _fingerprint(rows), _fingerprint(list(reversed(rows)))
+        self.assertEqual(forward.unordered, backward.unordered)
+        self.assertNotEqual(forward.ordered, backward.ordered)
+
+    def test_driver_fingerprint_matches_rows(self):
+        driver = _ListDriver({"gold": [{"a": 1}, {"a": 0.1 + 0.2}], "pred": [{"a": 0.3}, {"a": 1.0}]})
+        gold, pred = driver.fingerprint_many([("gold", "g"), ("pred", "g", True)], mode="unordered")
+        self.assertIsNone(gold.error)
+        self.assertEqual(gold.rows, pred.rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+from impl.evaluation.registry import RunRegistry
+
+HAS_PIPELINE_DEPS = importlib.util.find_spec("sacrebleu") is not None
+
+
+class RunRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "registry.sqlite")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_reuses_results_of_unchanged_instances(self):
+        registry = RunRegistry(self.path, "v1")
+        key = registry.instance_key("q1", "MATCH (n) RETURN n", "MATCH (m) RETURN m", "geo")
+        registry.store("level_1_query", key, {"instance_id": "q1", "metrics": {"accuracy": 1}}, (3, 4))
+        registry.close()
+
+        registry = RunRegistry(self.path, "v1")
+        found = registry.lookup("level_1_query", [key])
+        registry.close()
+        self.assertEqual(found, {0: ({"instance_id": "q1", "metrics": {"accuracy": 1}}, (3, 4))})
+
+    def test_changed_inputs_are_not_reused(self):
+        registry = RunRegistry(self.path, "v1")
+        key = registry.instance_key("q1", "pred", "gold", "geo")
+        registry.store("level_1_query", key, {"instance_id": "q1"}, (0, 0))
+        self.assertEqual(registry.lookup("level_1_query", [registry.instance_key("q1", "pred2", "gold", "geo")]), {})
+        self.assertEqual(registry.lookup("level_1_query", [registry.instance_key("q1", "pred", "gold", "geo2")]), {})
+        self.assertEqual(registry.lookup("level_2_query", [key]), {})
+        registry.close()
+
+    def test_other_metric_version_is_not_reused(self):
+        registry = RunRegistry(self.path, "v1")
+        key = registry.instance_key("q1", "pred", "gold", "geo")
+        registry.store("level_1_query", key, {"instance_id": "q1"}, (0, 0))
+        registry.close()
+
+        registry = RunRegistry(self.path, "v2")
+        self.assertEqual(registry.lookup("level_1_query", [key]), {})
+        registry.close()
+
+
+@unittest.skipUnless(HAS_PIPELINE_DEPS, "run_pipeline dependencies (sacrebleu) are not installed")
+class PipelineRegistryTest(unittest.TestCase):
+    STATUSES = ["correct", "incorrect", "timeout", "error", "rejected", "gold_error"]
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+        self.config = {
+            "pipeline": {"run_prediction": False, "run_evaluation": True},
+            "data": {"output_format": "json"},
+            "prediction": {"level_fields": [["level_1", "level_1_query"]], "schema_path": "schema.json"},
+            "evaluation": {
+                "metrics": ["ea"],
+                "db_uri": "bolt://localhost:7687",
+                "query_timeout": 10,
+                "registry_path": os.path.join(self._tmp.name, "registry.sqlite"),
+            },
+        }
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def _runner(self, config):
+        from run_pipeline import PipelineRunner
+
+        path = os.path.join(self._tmp.name, "config.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        return PipelineRunner(path)
+
+    def test_ea_settings_change_the_registry_version(self):
+        base = self._runner(self.config)._registry_version({"ea"})
+        for key, value in [("query_timeout", 30), ("max_query_cost", 1e6), ("ea_fingerprint", True),
+                           ("db_backend", "embedded"), ("db_uri", "bolt://other:7687")]:
+            with self.subTest(setting=key):
+                config = json.loads(json.dumps(self.config))
+                config["evaluation"][key] = value
+                self.assertNotEqual(self._runner(config)._registry_version({"ea"}), base)
+        self.assertEqual(self._runner(self.config)._registry_version({"ea"}), base)
+
+    def test_transient_ea_statuses_are_not_stored(self):
+        from impl.evaluation.metrics import ExecutionAccuracy
+        from run_pipeline import TRANSIENT_EA_STATUSES
+
+        statuses = self.STATUSES
+
+        class FakeEA:
+            def evaluate_many(self, predictions, golds, db_ids):
+                outcomes = []
+                for pred in predictions:
+                    status = statuses[int(pred.split()[-1])]
+                    outcomes.append({**ExecutionAccuracy._empty_outcome(), "status": status,
+                                     "correct": status == "correct"})
+                return outcomes
+
+        runner = self._runner(self.config)
+        runner.results = [
+            {"id": f"q{i}", "database": "geo", "gql_query": f"RETURN {i}", "level_1_query": f"RETURN {i}"}
+            for i in range(len(statuses))
+        ]
+        runner._golds = [item["gql_query"] for item in runner.results]
+        runner._db_ids = ["geo"] * len(statuses)
+        registry = RunRegistry(self.config["evaluation"]["registry_path"], runner._registry_version({"ea"}))
+        runner._evaluate_single_level("level_1_query", FakeEA(), None, None, registry)
+
+        keys = [registry.instance_key(f"q{i}", f"RETURN {i}", f"RETURN {i}", "geo") for i in range(len(statuses))]
+        stored = {statuses[i] for i in registry.lookup("level_1_query", keys)}
+        registry.close()
+        self.assertEqual(stored, {"correct", "incorrect"})
+        self.assertFalse(stored & set(TRANSIENT_EA_STATUSES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -171,6 +171,38 @@ class DataArguments:
         default="pred_gql.txt",
         metadata={"help": "Filename to save predicted outcomes"},
     )
+    predicted_batch_size: Optional[int] = field(
+        default=8,
+        metadata={
+            "help": "Maximum number of prompts generated together; prompts of similar length are batched together."
+        },
+    )
+    predicted_batch_tokens: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Token budget of a prediction batch: rows x (longest prompt + max_new_tokens). Unlimited if not set."
+        },
+    )
+    predict_workers: Optional[int] = field(
+        default=1,
+        metadata={
+            "help": "Number of prediction processes on CPU, each with its own model replica pinned to a NUMA node or core set."
+        },
+    )
+    server_host: Optional[str] = field(
+        default="0.0.0.0",
+        metadata={"help": "Host the OpenAI-compatible server (predict/api_server.py) binds to."},
+    )
+    server_port: Optional[int] = field(
+        default=8000,
+        metadata={"help": "Port of the OpenAI-compatible server."},
+    )
+    server_max_batch_size: Optional[int] = field(
+        default=16,
+        metadata={
+            "help": "Maximum number of requests decoded together by the server, others wait for a free row."
+        },
+    )
 
     def init_for_training(self):  # support mixing multiple datasets
         dataset_names = [ds.strip() for ds in self.dataset.split(",")]
@@ -103,6 +103,64 @@ class ModelArguments:
             "help": "Whether or not the special tokens should be split during the tokenization process."
         },
     )
+    memory_cleanup: Optional[Literal["never", "every_n", "pressure"]] = field(
+        default="pressure",
+        metadata={
+            "help": "When to run gc and empty the CUDA cache during inference: never, every `memory_cleanup_interval` generations, or when memory usage reaches `memory_pressure_threshold`."
+        },
+    )
+    memory_cleanup_interval: Optional[int] = field(
+        default=100,
+        metadata={"help": "Generations between cleanups with `memory_cleanup` every_n."},
+    )
+    memory_pressure_threshold: Optional[float] = field(
+        default=0.9,
+        metadata={
+            "help": "Fraction of (GPU, else host) memory in use that triggers a cleanup with `memory_cleanup` pressure."
+        },
+    )
+    prefix_cache: Optional[bool] = field(
+        default=True,
+        metadata={
+            "help": "Whether to compute the key/value states of the prompt prefix shared by all queries only once during inference."
+        },
+    )
+    prefix_cache_min_length: Optional[int] = field(
+        default=32,
+        metadata={"help": "Shortest shared prefix (in tokens) worth caching."},
+    )
+    draft_model_name_or_path: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "Small model sharing the tokenizer that drafts tokens for speculative decoding in chat and stream_chat."
+        },
+    )
+    merged_model_cache: Optional[bool] = field(
+        default=False,
+        metadata={
+            "help": "Whether to cache the base model with the LoRA checkpoints merged (under MERGED_MODELS) and load it on later runs instead of merging again."
+        },
+    )
+    cpu_quantization: Optional[Literal["int8"]] = field(
+        default=None,
+        metadata={
+            "help": "Dynamic quantization of the linear layers for inference without CUDA (bitsandbytes `quantization_bit` needs a GPU)."
+        },
+    )
+    cpu_threads: Optional[int] = field(
+        default=None,
+        metadata={"help": "Intra-op threads for inference without CUDA (default: torch's choice)."},
+    )
+    cpu_interop_threads: Optional[int] = field(
+        default=None,
+        metadata={"help": "Inter-op threads for inference without CUDA (default: torch's choice)."},
+    )
+    torch_compile: Optional[bool] = field(
+        default=False,
+        metadata={
+            "help": "Whether to compile the model forward with torch.compile for inference without CUDA (falls back to eager mode if it fails)."
+        },
+    )
 
     def __post_init__(self):
         if self.compute_dtype is not None or self.model_max_length is not None:
@@ -179,9 +237,22 @@ class GeneratingArguments:
             "help": "Exponential penalty to the length that is used with beam-based generation."
         },
     )
+    prompt_lookup_num_tokens: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Speculative decoding by prompt lookup: number of tokens copied from a matching n-gram of the prompt (e.g. schema identifiers) as a draft."
+        },
+    )
+    grammar: Optional[Literal["lcypher", "gql"]] = field(
+        default=None,
+        metadata={
+            "help": "Constrain decoding to statements of this query grammar (needs antlr4-python3-runtime)."
+        },
+    )
 
     def to_dict(self) -> Dict[str, Any]:
         args = asdict(self)
+        args.pop("grammar", None)  # not a generation config option
         if args.get("max_new_tokens", None):
             args.pop("max_length", None)
         return args
@@ -12,8 +12,10 @@ from tqdm import tqdm
 # sys.path.append(f"{os.path.dirname(os.path.abspath(__file__))}/evaluator/impl/tugraph-db")
 
 
-def evaluate(gold, predict, etype, impl):
-    log_file = open(f"{os.path.dirname(__file__)}/../output/logs/eval.log", "w")
+def evaluate(gold, predict, etype, impl, log_path=None, in_flight=None, max_query_cost=None):
+    if log_path is None:
+        log_path = f"{os.path.dirname(__file__)}/../output/logs/eval.log"
+    log_file = open(log_path, "w")
     log_lines = []
 
     # with open(gold) as f:
@@ -65,12 +67,17 @@ def evaluate(gold, predict, etype, impl):
         model_path = f"evaluator.impl.{impl}.execution_evaluator"
         m = importlib.import_module(model_path)
         ExecutionEvaluator = getattr(m, "ExecutionEvaluator")
-        evaluator = ExecutionEvaluator()
+        evaluator = ExecutionEvaluator(max_query_cost=max_query_cost)
+
+    if hasattr(evaluator, "evaluate_many"):
+        # pipelined: several instances in flight, scores still arrive in input order
+        scores = evaluator.evaluate_many(zip(pseq_one, gseq_one, db_id_list), in_flight)
+    else:
+        scores = (evaluator.evaluate(pseq_one[i], gseq_one[i], db_id_list[i]) for i in range(len(gseq_one)))
 
     total = 0
     pbar = tqdm(range(len(gseq_one)), desc="Evaluating")
-    for i in pbar:
-        score = evaluator.evaluate(pseq_one[i], gseq_one[i], db_id_list[i])
+    for i, score in zip(pbar, scores):
         # if score != -1:
         #     score_total += score
         #     total += 1
@@ -124,10 +131,31 @@ if __name__ == "__main__":
         default="tugraph-analytics",
         help="implementation folder for grammar evaluator",
     )
+    parser.add_argument(
+        "--log",
+        dest="log",
+        type=str,
+        default=None,
+        help="the path to write per-query scores to, defaults to output/logs/eval.log",
+    )
+    parser.add_argument(
+        "--in_flight",
+        dest="in_flight",
+        type=int,
+        default=None,
+        help="instances evaluated concurrently by evaluators that support pipelining (execution)",
+    )
+    parser.add_argument(
+        "--max_query_cost",
+        dest="max_query_cost",
+        type=float,
+        default=None,
+        help="EXPLAIN cost budget above which predicted queries are not executed (execution)",
+    )
     args = parser.parse_args()
 
     # Print args
     print(f"params as fllows \n {args}")
 
     # Second, evaluate the predicted GQL queries
-    evaluate(args.gold, args.input, args.etype, args.impl)
\ No newline at end of file
+    evaluate(args.gold, args.input, args.etype, args.impl, args.log, args.in_flight, args.max_query_cost)
\ No newline at end of file
@@ -1,44 +1,210 @@
 import sys
 import logging
-import os.path
 import os
-import ctypes
+import hashlib
+import shutil
 import subprocess
 import time
 import json
-import signal
-import jaro
-from neo4j import GraphDatabase
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import GraphDatabase, Query
+from neo4j.exceptions import Neo4jError
 
 current_dir = os.path.dirname(__file__)
 
-def handle_timeout(sig, frame):
-        raise TimeoutError('took too long')
+# result comparison is shared with ExecutionAccuracy of the driver at the repository root
+sys.path.append(os.path.abspath(f"{current_dir}/../../../../../../.."))
+from driver.evaluation import QueryRejected, compare_rows
+from impl.db_driver.cost_guard import CostGuard
 
-signal.signal(signal.SIGALRM, handle_timeout)
+SERVER_AUTH = ("admin", "73@TuGraph")
+SERVER_READY_TIMEOUT = 120 # seconds to wait for a started server to accept Bolt connections
+QUERY_TIMEOUT = 10 # transaction timeout in seconds for gold and predicted queries
+PREDICT_WORKERS = 4 # processes executing predicted queries, also the instances kept in flight by evaluate_many
+
+def datasets_hash(datasets_dir, dataset_list):
+    """Content hash of the dataset folders (file names, import scripts and data)"""
+    digest = hashlib.sha256()
+    for dataset in sorted(dataset_list):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(datasets_dir, dataset)):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(path, datasets_dir).encode("utf-8") + b"\0")
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(chunk)
+                digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def _is_lock_file(name):
+    # LMDB lock files are rewritten by every server that opens the database
+    return name.endswith(".lock") or name == "lock.mdb"
+
+def tree_manifest(root):
+    """{relative path: [size, mtime_ns]} of the data files under root"""
+    manifest = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if _is_lock_file(name):
+                continue
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            manifest[os.path.relpath(path, root)] = [stat.st_size, stat.st_mtime_ns]
+    return manifest
+
+def clone_tree(src, dst):
+    """
+    Clone a snapshot into a server's data directory with copy-on-write
+    reflinks, or a plain copy when the filesystem does not support them.
+    Files are never hardlinked: both servers write to their data directory,
+    which would change the snapshot through the shared inodes.
+    """
+    shutil.rmtree(dst, ignore_errors=True)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    reflink = subprocess.run(["cp", "-a", "--reflink=always", src, dst],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if reflink.returncode == 0:
+        return "reflink"
+    shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst)
+    return "copy"
+
+def wait_for_bolt(url, timeout=SERVER_READY_TIMEOUT):
+    """Poll a starting server until it accepts Bolt connections and return a verified driver"""
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while True:
+        driver = GraphDatabase.driver(url, auth=SERVER_AUTH)
+        try:
+            driver.verify_connectivity()
+            return driver
+        except Exception as e:
+            driver.close()
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"TuGraph server at {url} not ready after {timeout}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+def _predict_worker(conn, url, timeout):
+    """
+    Worker process loop: runs (db_id, query) requests against the predict
+    server with its own driver and sends back ("ok", rows) or ("error", message).
+    """
+    driver = None
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        db_id, query = request
+        try:
+            if driver is None:
+                driver = GraphDatabase.driver(url, auth=SERVER_AUTH)
+            with driver.session(database=db_id) as session:
+                rows = session.run(Query(query, timeout=timeout)).data()
+            conn.send(("ok", rows))
+        except Exception as e:
+            if not isinstance(e, Neo4jError) and driver is not None:
+                # connection-level failure: reconnect on the next request
+                driver.close()
+                driver = None
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    if driver is not None:
+        driver.close()
+
+class PredictExecutorPool:
+    """
+    Pool of worker processes that execute predicted queries.
+
+    Queries carry a transaction timeout; if a worker still has not answered
+    timeout + grace seconds later (the server ignored the timeout, or the
+    client is stuck), only that worker is killed and replaced. The pool can
+    be used from several threads, each request taking an idle worker.
+    """
+    def __init__(self, url, size=PREDICT_WORKERS, timeout=QUERY_TIMEOUT, grace=5):
+        self.url = url
+        self.timeout = timeout
+        self.grace = grace
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_predict_worker, args=(child_conn, self.url, self.timeout), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = (process, parent_conn)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _recycle(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        with self._lock:
+            self._workers.remove(worker)
+        return self._spawn()
+
+    def run(self, db_id, query):
+        """(status, payload): ("ok", rows), ("error", message) or ("timeout", message)"""
+        worker = self._idle.get()
+        try:
+            process, conn = worker
+            conn.send((db_id, query))
+            if conn.poll(self.timeout + self.grace):
+                return conn.recv()
+            worker = self._recycle(worker)
+            return "timeout", f"query did not finish within {self.timeout + self.grace}s, worker recycled"
+        except (EOFError, OSError) as e:
+            worker = self._recycle(worker)
+            return "error", f"predict worker died: {e}"
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+        for process, conn in workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+            conn.close()
 
 class ExecutionEvaluator:
-    def __init__(self):
+    def __init__(self, query_timeout=QUERY_TIMEOUT, predict_workers=PREDICT_WORKERS, max_query_cost=None):
+        self.query_timeout = query_timeout
+        # predicted queries estimated above this cost are not executed (None: disabled)
+        self.cost_guard = CostGuard(max_query_cost) if max_query_cost else None
+        self._restart_lock = threading.Lock()
         self.log = open('./exc_eval.log', 'w+')
-        # import datasets to 2 different data folder
-        dataset_list = os.listdir(f"{current_dir}/datasets")
+        self.datasets_dir = f"{current_dir}/datasets"
+        self.snapshot_root = f"{current_dir}/server/snapshots"
+        dataset_list = os.listdir(self.datasets_dir)
         self.dataset_list = dataset_list
         try:
-            # iterate through all dataset folder under ./datasets
-            for dataset in dataset_list:
-                # import data to data folder for ground truth with cli command
-                self.process = subprocess.run([
-                    'sh',
-                    f'{current_dir}/datasets/{dataset}/import.sh',
-                    f'{current_dir}/server/server_gold/lgraph_db', f'{dataset}'
-                ], stdout=self.log, stderr=self.log, close_fds=True)
-
-                # import data to data folder for predicted result with cli command
-                self.process = subprocess.run([
-                    'sh',
-                    f'{current_dir}/datasets/{dataset}/import.sh',
-                    f'{current_dir}/server/server_predict/lgraph_db', f'{dataset}'
-                ], stdout=self.log, stderr=self.log, close_fds=True)
+            # import the datasets once into a content-addressed snapshot, then
+            # clone it into the data folders of both servers
+            snapshot = self.provision_snapshot()
+            clone_tree(snapshot, f'{current_dir}/server/server_gold/lgraph_db')
+            clone_tree(snapshot, f'{current_dir}/server/server_predict/lgraph_db')
         except Exception as e:
             logging.debug(e)
 
@@ -49,34 +215,75 @@ class ExecutionEvaluator:
                 'sh',
                 f'{current_dir}/server/server_gold/start.sh'
             ], stdout=self.log, stderr=self.log, close_fds=True)
-            time.sleep(10)
 
             # start server for predcited result with cli command
             self.process = subprocess.run([
                 'sh',
                 f'{current_dir}/server/server_predict/start.sh'
             ], stdout=self.log, stderr=self.log, close_fds=True)
-            time.sleep(10)
         except Exception as e:
             logging.debug(e)
 
-        # setup driver for ground truth
+        # setup driver for ground truth, as soon as the server accepts connections
         self.url_gold = f"bolt://localhost:9092"
-        self.driver_gold = GraphDatabase.driver(self.url_gold, auth=("admin", "73@TuGraph"))
-        self.driver_gold.verify_connectivity()
+        self.driver_gold = wait_for_bolt(self.url_gold)
 
-        # setup driver for predicted result
+        # wait for the predict server, then start the worker processes executing predicted queries
         self.url_predict = f"bolt://localhost:9094"
-        self.driver_predict = GraphDatabase.driver(self.url_predict, auth=("admin", "73@TuGraph"))
-        self.driver_predict.verify_connectivity()
+        wait_for_bolt(self.url_predict).close()
+        self.predict_pool = PredictExecutorPool(self.url_predict, predict_workers, query_timeout)
+
+        # gold queries run on these threads while the calling thread waits for the predict worker
+        self.in_flight = predict_workers
+        self.gold_executor = ThreadPoolExecutor(max_workers=predict_workers)
+
+    def provision_snapshot(self):
+        """
+        Imported database for the current dataset contents, running import.sh
+        only when no intact snapshot with the same content hash exists.
+        Snapshots of other dataset contents are deleted.
+        """
+        snapshot_dir = os.path.join(self.snapshot_root, datasets_hash(self.datasets_dir, self.dataset_list))
+        db_dir = os.path.join(snapshot_dir, "lgraph_db")
+        manifest_path = os.path.join(snapshot_dir, "manifest.json")
+        self.remove_stale_snapshots(snapshot_dir)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f) == tree_manifest(db_dir):
+                    return db_dir
+            logging.warning(f"snapshot {snapshot_dir} was modified, importing again")
 
-        self.session_pool = {}
+        # import into a temporary folder first, so an interrupted import is never reused
+        tmp_dir = snapshot_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
         for dataset in self.dataset_list:
-            self.session_pool[dataset] = []
-            self.session_pool[dataset].append(self.driver_gold.session(database=dataset))
-            self.session_pool[dataset].append(self.driver_predict.session(database=dataset))
+            subprocess.run([
+                'sh',
+                f'{self.datasets_dir}/{dataset}/import.sh',
+                os.path.join(tmp_dir, "lgraph_db"), f'{dataset}'
+            ], stdout=self.log, stderr=self.log, close_fds=True, check=True)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump(tree_manifest(os.path.join(tmp_dir, "lgraph_db")), f)
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.rename(tmp_dir, snapshot_dir)
+        return db_dir
+
+    def remove_stale_snapshots(self, keep_dir):
+        """Delete the snapshots (and interrupted imports) under snapshot_root other than keep_dir"""
+        if not os.path.isdir(self.snapshot_root):
+            return
+        for name in os.listdir(self.snapshot_root):
+            path = os.path.join(self.snapshot_root, name)
+            if path != keep_dir and os.path.isdir(path):
+                logging.info(f"removing superseded snapshot {path}")
+                shutil.rmtree(path, ignore_errors=True)
 
     def __del__(self):
+        if getattr(self, "gold_executor", None) is not None:
+            self.gold_executor.shutdown(wait=False, cancel_futures=True)
+        if getattr(self, "predict_pool", None) is not None:
+            self.predict_pool.close()
         # stop 2 seperate tugraph-db server
         try:
             # stop server for ground truth with cli command
@@ -94,71 +301,80 @@ class ExecutionEvaluator:
             logging.debug(e)
     
     def restart_predict_server(self):
-        try:
-            # restart server for predicted result with cli command
-            self.process = subprocess.run([
-                'sh',
-                f'{current_dir}/server/server_predict/start.sh'
-            ], stdout=self.log, stderr=self.log, close_fds=True)
-            time.sleep(10)
+        # only needed when the server itself went down; workers reconnect on their next query
+        with self._restart_lock:
+            try:
+                wait_for_bolt(self.url_predict, timeout=1).close()
+                return # already restarted by another thread
+            except TimeoutError:
+                pass
+            try:
+                # restart server for predicted result with cli command
+                self.process = subprocess.run([
+                    'sh',
+                    f'{current_dir}/server/server_predict/start.sh'
+                ], stdout=self.log, stderr=self.log, close_fds=True)
+                wait_for_bolt(self.url_predict).close()
+            except Exception as e:
+                logging.debug(e)
 
-            # setup driver for predicted result
-            self.driver_predict = GraphDatabase.driver(self.url_predict, auth=("admin", "73@TuGraph"))
-            self.driver_predict.verify_connectivity()
-            for dataset in self.dataset_list:
-                self.session_pool[dataset][1] = self.driver_predict.session(database=dataset)
+    def run_gold(self, query_gold, db_id):
+        # the driver is thread-safe, sessions are not
+        try:
+            with self.driver_gold.session(database=db_id) as session:
+                return True, session.run(Query(query_gold, timeout=self.query_timeout)).data()
         except Exception as e:
-            logging.debug(e)
+            return False, e
+
+    def check_cost(self, query_predict, db_id):
+        # EXPLAIN on the gold server: it holds the same snapshot and is never written to
+        with self.driver_gold.session(database=db_id) as session:
+            self.cost_guard.check(db_id, query_predict,
+                                  lambda text: session.run(Query(text, timeout=self.query_timeout)).data())
+
+    def run_predict(self, query_predict, db_id):
+        if self.cost_guard:
+            try:
+                self.check_cost(query_predict, db_id)
+            except QueryRejected as e:
+                logging.debug(f"{e}: {query_predict}")
+                return False, e
+        # executed in an isolated worker process
+        status, res_predict = self.predict_pool.run(db_id, query_predict)
+        if status == "error" and "Couldn't connect" in res_predict:
+            self.restart_predict_server()
+        return status == "ok", res_predict
 
     def evaluate(self, query_predict, query_gold, db_id):
-        if db_id not in self.session_pool.keys():
+        if db_id not in self.dataset_list:
             return -1
 
-        # run cypher on the server for ground truth
-        ret_gold = True
-        try:
-            res_gold = self.session_pool[db_id][0].run(query_gold).data()
-        except Exception as e:
-            ret_gold = False
-            res_gold = e
+        # run the gold and the predicted cypher on their servers at the same time
+        gold_future = self.gold_executor.submit(self.run_gold, query_gold, db_id)
+        ret_predict, res_predict = self.run_predict(query_predict, db_id)
+        ret_gold, res_gold = gold_future.result()
+        return self.compare(query_gold, ret_gold, res_gold, ret_predict, res_predict)
 
-        # run cypher on the server for predict result
-        ret_predict = True
-        try:
-            signal.alarm(10)
-            res_predict = self.session_pool[db_id][1].run(query_predict).data()
-            signal.alarm(0)
-        except TimeoutError as e:
-            ret_predict = False
-            res_predict = e
-            self.restart_predict_server()
-        except Exception as e:
-            ret_predict = False
-            res_predict = e
-            if "Couldn't connect to localhost:9094 (resolved to ()):" in str(e):
-                self.restart_predict_server()
-        
+    def evaluate_many(self, items, in_flight=None):
+        """
+        Pipelined evaluate over (query_predict, query_gold, db_id) tuples, keeping
+        in_flight instances (default: one per predict worker) running on each
+        server. Scores are yielded in input order.
+        """
+        in_flight = min(in_flight or self.in_flight, self.in_flight)
+        with ThreadPoolExecutor(max_workers=in_flight) as executor:
+            yield from executor.map(lambda item: self.evaluate(*item), items)
+
+    def compare(self, query_gold, ret_gold, res_gold, ret_predict, res_predict):
         if ret_gold == False:
             return -1
         else:
             if ret_predict == True:
-                if "SKIP" in query_gold or "LIMIT" in query_gold:
-                    # if SKIP or LIMIT in cypher, only compare the size of query result
-                    if len(res_gold) == len(res_predict):
-                        return 1
-                    else:
-                        return 0
+                # typed multiset comparison of the rows, with float tolerance; both servers
+                # hold the same snapshot, so SKIP / LIMIT queries are compared by content too
+                if compare_rows(res_gold, res_predict):
+                    return 1
                 else:
-                    # else, sort all query results then compare if two results are same
-                    for i in range(len(res_gold)):
-                        res_gold[i] = str(res_gold[i])
-                    res_gold.sort()
-                    for i in range(len(res_predict)):
-                        res_predict[i] = str(res_predict[i])
-                    res_predict.sort()
-                    if res_predict == res_gold:
-                        return 1
-                    else:
-                        return 0
+                    return 0
             else:
                 return 0
@@ -1,10 +1,14 @@
+import glob
+import hashlib
 import os
-from typing import TYPE_CHECKING
+import shutil
+from typing import TYPE_CHECKING, Optional
 
 import torch
 from peft import LoraConfig, PeftModel, TaskType, get_peft_model
 from peft.utils import CONFIG_NAME, SAFETENSORS_WEIGHTS_NAME
 
+from ..configs.config import MERGED_MODELS
 from .config_parser import load_trainable_params
 from .loggings import get_logger
 
@@ -14,6 +18,58 @@ if TYPE_CHECKING:
 logger = get_logger(__name__)
 
 
+def merged_model_path(model_args: "ModelArguments", base_model: str) -> Optional[str]:
+    r"""
+    Directory of the merged-weights cache for a base model and the LoRA
+    checkpoints merged into it, None if the cache is disabled.
+
+    The key hashes the adapter weights and configs, and identifies the base
+    model by name and revision (plus the size and mtime of its weight files
+    when it is a local directory), so retrained adapters or replaced base
+    weights get a new entry without rehashing the base model on every start.
+    """
+    if not model_args.merged_model_cache or model_args.checkpoint_dir is None:
+        return None
+
+    digest = hashlib.sha256()
+    digest.update("{}@{}".format(base_model, model_args.model_revision).encode())
+    weights = glob.glob(os.path.join(base_model, "*.safetensors")) + glob.glob(
+        os.path.join(base_model, "*.bin")
+    )
+    for path in sorted(weights):
+        stat = os.stat(path)
+        digest.update("{}:{}:{}".format(os.path.basename(path), stat.st_size, stat.st_mtime_ns).encode())
+    for checkpoint in model_args.checkpoint_dir:
+        for name in (CONFIG_NAME, SAFETENSORS_WEIGHTS_NAME):
+            with open(os.path.join(checkpoint, name), "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+
+    name = os.path.basename(base_model.rstrip("/"))
+    return os.path.join(MERGED_MODELS, "{}-{}".format(name, digest.hexdigest()[:16]))
+
+
+def save_merged_model(model: "PreTrainedModel", path: str) -> None:
+    r"""
+    Saves merged weights as safetensors in the dtype of the base checkpoint,
+    so later loads memory-map them instead of merging again.
+    """
+    dtype = getattr(model.config, "torch_dtype", None)
+    state_dict = {
+        name: (
+            tensor.to(dtype)
+            if isinstance(dtype, torch.dtype) and tensor.is_floating_point()
+            else tensor
+        )
+        for name, tensor in model.state_dict().items()
+    }
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(tmp_path, state_dict=state_dict, safe_serialization=True)
+    os.replace(tmp_path, path)  # concurrent jobs never see a partial cache
+    logger.info("Cached merged model to {}".format(path))
+
+
 def init_adapter(
     model: "PreTrainedModel",
     model_args: "ModelArguments",
@@ -85,6 +141,17 @@ def init_adapter(
                 logger.info(
                     "Merged {} model checkpoint(s).".format(len(checkpoints_to_merge))
                 )
+                merged_path = merged_model_path(model_args, model.config._name_or_path)
+                if (
+                    merged_path is not None
+                    and not is_trainable
+                    and latest_checkpoint is None
+                    and not os.path.isdir(merged_path)
+                ):
+                    try:
+                        save_merged_model(model, merged_path)
+                    except OSError as e:
+                        logger.warning("Cannot cache the merged model: {}".format(e))
 
             if (
                 latest_checkpoint is not None
@@ -0,0 +1,266 @@
+import queue
+import threading
+from typing import Any, List, Optional, Tuple
+
+import torch
+from transformers import (
+    DynamicCache,
+    GenerationConfig,
+    LogitsProcessorList,
+    RepetitionPenaltyLogitsProcessor,
+    TemperatureLogitsWarper,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+)
+
+from .chat_model import ChatModel
+from .loggings import get_logger
+
+logger = get_logger(__name__)
+
+LegacyCache = Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+
+
+class Sequence:
+    r"""
+    A request of the scheduler: its prompt, decoding parameters and the
+    tokens generated so far. `done` is set once it has finished.
+    """
+
+    def __init__(
+        self,
+        prompt: List[int],
+        generation_config: GenerationConfig,
+        logits_processor: LogitsProcessorList,
+    ) -> None:
+        self.prompt = prompt
+        self.generation_config = generation_config
+        self.logits_processor = logits_processor
+        self.eos_token_ids = set(generation_config.eos_token_id)
+        self.max_new_tokens = generation_config.max_new_tokens or (
+            generation_config.max_length - len(prompt)
+        )
+        self.tokens: List[int] = []
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+    def next_token(self, logits: torch.Tensor) -> int:
+        input_ids = torch.tensor([self.prompt + self.tokens], device=logits.device)
+        scores = self.logits_processor(input_ids, logits.unsqueeze(0).float())
+        if self.generation_config.do_sample:
+            return torch.multinomial(torch.softmax(scores, dim=-1), 1).item()
+        return scores.argmax(dim=-1).item()
+
+    def append(self, token: int) -> bool:
+        r"""
+        Adds a generated token, returns whether the sequence has finished.
+        """
+        self.tokens.append(token)
+        if token in self.eos_token_ids:
+            self.finish_reason = "stop"
+        elif len(self.tokens) >= self.max_new_tokens:
+            self.finish_reason = "length"
+        return self.finish_reason is not None
+
+
+def _pad_left(
+    cache: LegacyCache, attention_mask: torch.Tensor, length: int
+) -> Tuple[LegacyCache, torch.Tensor]:
+    pad = length - attention_mask.shape[1]
+    if pad == 0:
+        return cache, attention_mask
+    cache = tuple(
+        (
+            torch.nn.functional.pad(key, (0, 0, pad, 0)),
+            torch.nn.functional.pad(value, (0, 0, pad, 0)),
+        )
+        for key, value in cache
+    )
+    return cache, torch.nn.functional.pad(attention_mask, (pad, 0))
+
+
+def _to_legacy(past_key_values: Any) -> LegacyCache:
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+
+class ContinuousBatchScheduler:
+    r"""
+    Generates the requests of several clients in one running batch that
+    requests join and leave at every decode step, instead of waiting for a
+    whole batch to finish (continuous batching).
+
+    The key/value states of the running batch are kept left-padded to a
+    common length. New requests are prefilled together, then padded and
+    concatenated to the batch; finished ones are dropped from it, along with
+    the padding columns no row needs anymore. Every step feeds the last
+    token of each row with its own position, so rows of different lengths
+    decode together. A single thread owns the model.
+    """
+
+    def __init__(self, chat_model: ChatModel, max_batch_size: int = 16) -> None:
+        self.chat_model = chat_model
+        self.model = chat_model.model
+        self.pad_token_id = chat_model.tokenizer.pad_token_id
+        self.max_batch_size = max_batch_size
+        self.waiting: "queue.Queue[Sequence]" = queue.Queue()
+        self.running: List[Sequence] = []
+        self.cache: Optional[LegacyCache] = None
+        self.attention_mask: Optional[torch.Tensor] = None
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, prompt: List[int], **input_kwargs) -> Sequence:
+        generation_config = self.chat_model.generation_config(**input_kwargs)
+        logits_processor = self.chat_model.logits_processor(generation_config)
+        if generation_config.repetition_penalty not in (None, 1.0):
+            logits_processor.append(
+                RepetitionPenaltyLogitsProcessor(generation_config.repetition_penalty)
+            )
+        if generation_config.do_sample:
+            if generation_config.temperature not in (None, 1.0):
+                logits_processor.append(
+                    TemperatureLogitsWarper(generation_config.temperature)
+                )
+            if generation_config.top_k:
+                logits_processor.append(TopKLogitsWarper(generation_config.top_k))
+            if generation_config.top_p not in (None, 1.0):
+                logits_processor.append(TopPLogitsWarper(generation_config.top_p))
+        sequence = Sequence(prompt, generation_config, logits_processor)
+        self.waiting.put(sequence)
+        return sequence
+
+    def generate(self, prompt: List[int], **input_kwargs) -> Sequence:
+        r"""
+        Submits a prompt and blocks until its generation has finished.
+        """
+        sequence = self.submit(prompt, **input_kwargs)
+        sequence.done.wait()
+        if sequence.error is not None:
+            raise sequence.error
+        return sequence
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self._admit()
+                self._step()
+            except Exception as e:
+                logger.error("Generation step failed: {}".format(e))
+                for sequence in self.running:
+                    sequence.error = e
+                    sequence.done.set()
+                self.running, self.cache, self.attention_mask = [], None, None
+
+    @torch.inference_mode()
+    def _admit(self) -> None:
+        new = []
+        if not self.running:
+            new.append(self.waiting.get())  # idle: wait for a request
+        while len(self.running) + len(new) < self.max_batch_size:
+            try:
+                new.append(self.waiting.get_nowait())
+            except queue.Empty:
+                break
+        if not new:
+            return
+        # the running batch is only replaced once the merge succeeded
+        try:
+            cache, attention_mask = self._prefill(new)
+            if self.running:
+                length = max(attention_mask.shape[1], self.attention_mask.shape[1])
+                cache, attention_mask = _pad_left(cache, attention_mask, length)
+                running_cache, running_mask = _pad_left(
+                    self.cache, self.attention_mask, length
+                )
+                cache = tuple(
+                    (torch.cat([rk, k]), torch.cat([rv, v]))
+                    for (rk, rv), (k, v) in zip(running_cache, cache)
+                )
+                attention_mask = torch.cat([running_mask, attention_mask])
+        except Exception as e:  # fail the new requests only, the running batch goes on
+            logger.error("Prefill failed: {}".format(e))
+            for sequence in new:
+                sequence.error = e
+                sequence.done.set()
+            return
+
+        # from here on, errors are handled by _loop, which fails every running sequence
+        self.running += new
+        self.cache, self.attention_mask = cache, attention_mask
+        self._release_finished()
+
+    def _prefill(self, new: List[Sequence]) -> Tuple[LegacyCache, torch.Tensor]:
+        r"""
+        Runs the new prompts together, left-padded, and samples their first token.
+        """
+        width = max(len(sequence.prompt) for sequence in new)
+        input_ids = torch.tensor(
+            [[self.pad_token_id] * (width - len(s.prompt)) + s.prompt for s in new],
+            device=self.model.device,
+        )
+        attention_mask = torch.tensor(
+            [[0] * (width - len(s.prompt)) + [1] * len(s.prompt) for s in new],
+            device=self.model.device,
+        )
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+        output = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=True,
+        )
+        for sequence, logits in zip(new, output.logits[:, -1]):
+            sequence.append(sequence.next_token(logits))
+        return _to_legacy(output.past_key_values), attention_mask
+
+    @torch.inference_mode()
+    def _step(self) -> None:
+        if not self.running:
+            return
+        device = self.model.device
+        input_ids = torch.tensor([[s.tokens[-1]] for s in self.running], device=device)
+        # position of the fed token: prompt plus the tokens before it
+        position_ids = torch.tensor(
+            [[len(s.prompt) + len(s.tokens) - 1] for s in self.running], device=device
+        )
+        attention_mask = torch.cat(
+            [self.attention_mask, self.attention_mask.new_ones((len(self.running), 1))],
+            dim=1,
+        )
+        output = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=DynamicCache.from_legacy_cache(self.cache),
+            use_cache=True,
+        )
+        self.cache = _to_legacy(output.past_key_values)
+        self.attention_mask = attention_mask
+        for sequence, logits in zip(self.running, output.logits[:, -1]):
+            sequence.append(sequence.next_token(logits))
+        self._release_finished()
+
+    def _release_finished(self) -> None:
+        keep = [i for i, s in enumerate(self.running) if s.finish_reason is None]
+        if len(keep) == len(self.running):
+            return
+        for sequence in self.running:
+            if sequence.finish_reason is not None:
+                sequence.done.set()
+                self.chat_model.memory_policy.after_generation()
+        self.running = [self.running[i] for i in keep]
+        if not self.running:
+            self.cache, self.attention_mask = None, None
+            return
+
+        index = torch.tensor(keep, device=self.attention_mask.device)
+        attention_mask = self.attention_mask[index]
+        # drop the padding columns left of the longest remaining row
+        start = int((attention_mask.sum(dim=0) > 0).nonzero()[0])
+        self.attention_mask = attention_mask[:, start:]
+        self.cache = tuple(
+            (key[index, :, start:], value[index, :, start:]) for key, value in self.cache
+        )
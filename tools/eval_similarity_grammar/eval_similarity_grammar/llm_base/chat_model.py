@@ -1,14 +1,18 @@
+from functools import partial
 from threading import Thread
 from typing import Any, Dict, Generator, List, Optional, Tuple
 
 import torch
-import gc
-from transformers import GenerationConfig, TextIteratorStreamer
+from transformers import GenerationConfig, LogitsProcessorList, TextIteratorStreamer
 
 from ..data_process.data_utils import get_template_and_fix_tokenizer
 from .config_parser import get_infer_args
-from .load_tokenizer import dispatch_model, load_model_and_tokenizer
+from .grammar_constraint import GrammarConstraint
+from .load_tokenizer import dispatch_model, load_draft_model, load_model_and_tokenizer
+from .memory import MemoryPolicy
 from .model_trainer import get_logits_processor
+from .prefix_cache import PrefixCache
+from .speculative import SpeculationStats
 
 
 class ChatModel:
@@ -28,26 +32,128 @@ class ChatModel:
             self.data_args.template, self.tokenizer
         )
         self.system_prompt = self.data_args.system_prompt
+        self.memory_policy = MemoryPolicy(
+            model_args.memory_cleanup,
+            model_args.memory_cleanup_interval,
+            model_args.memory_pressure_threshold,
+        )
+        self.prefix_cache = (
+            PrefixCache(self.model, model_args.prefix_cache_min_length)
+            if model_args.prefix_cache
+            else None
+        )
+        self.draft_model = (
+            load_draft_model(model_args, self.model)
+            if model_args.draft_model_name_or_path
+            else None
+        )
+        self.speculation = (
+            SpeculationStats()
+            if self.draft_model is not None
+            or self.generating_args.prompt_lookup_num_tokens
+            else None
+        )
+        # a compiled forward needs fixed-size key/value states (assisted generation cannot use them)
+        self.cache_implementation = (
+            "static"
+            if model_args.torch_compile
+            and not torch.cuda.is_available()
+            and self.speculation is None
+            else None
+        )
+        self.grammar_constraint = (
+            GrammarConstraint(self.generating_args.grammar, self.tokenizer)
+            if self.generating_args.grammar
+            else None
+        )
 
-    def process_args(
+    def encode_prompt(
         self,
         query: str,
         history: Optional[List[Tuple[str, str]]] = None,
         system: Optional[str] = None,
-        **input_kwargs
-    ) -> Tuple[Dict[str, Any], int]:
-        system = system or self.system_prompt
-
+    ) -> List[int]:
         prompt, _ = self.template.encode_oneturn(
             tokenizer=self.tokenizer,
             query=query,
             resp="",
             history=history,
-            system=system,
+            system=system or self.system_prompt,
+        )
+        return prompt
+
+    def process_args(
+        self,
+        query: str,
+        history: Optional[List[Tuple[str, str]]] = None,
+        system: Optional[str] = None,
+        **input_kwargs
+    ) -> Tuple[Dict[str, Any], int]:
+        prompt = self.encode_prompt(query, history, system)
+        prompt_length = len(prompt)
+        generation_config = self.generation_config(**input_kwargs)
+
+        gen_kwargs = dict(
+            **self.batch_inputs([prompt], generation_config),
+            generation_config=generation_config,
+            logits_processor=self.logits_processor(generation_config),
         )
-        input_ids = torch.tensor([prompt], device=self.model.device)
-        prompt_length = len(input_ids[0])
+        if self.draft_model is not None:
+            gen_kwargs["assistant_model"] = self.draft_model
 
+        return gen_kwargs, prompt_length
+
+    def logits_processor(self, generation_config: GenerationConfig) -> LogitsProcessorList:
+        logits_processor = get_logits_processor()
+        if self.grammar_constraint is not None:
+            # enough valid candidates for the decoding strategy to choose from
+            num_allowed = (
+                generation_config.top_k
+                if generation_config.do_sample
+                else generation_config.num_beams
+            )
+            logits_processor.append(
+                self.grammar_constraint.processor(
+                    generation_config.eos_token_id, num_allowed
+                )
+            )
+        return logits_processor
+
+    def batch_inputs(
+        self, prompts: List[List[int]], generation_config: GenerationConfig
+    ) -> Dict[str, Any]:
+        r"""
+        Padded inputs of `model.generate` for several prompts, all ending at the
+        same column. Padding goes right after the prefix shared with the prefix
+        cache (at the start when there is none), and that prefix is passed as
+        `past_key_values` so it is not prefilled again.
+        """
+        shared = 0
+        if (
+            self.prefix_cache is not None
+            and generation_config.num_beams == 1
+            and generation_config.cache_implementation is None
+        ):
+            shared = self.prefix_cache.update(prompts)
+        width = max(len(prompt) for prompt in prompts)
+        pad_token_id = self.tokenizer.pad_token_id
+        input_ids = [
+            prompt[:shared] + [pad_token_id] * (width - len(prompt)) + prompt[shared:]
+            for prompt in prompts
+        ]
+        attention_mask = [
+            [1] * shared + [0] * (width - len(prompt)) + [1] * (len(prompt) - shared)
+            for prompt in prompts
+        ]
+        inputs = dict(
+            inputs=torch.tensor(input_ids, device=self.model.device),
+            attention_mask=torch.tensor(attention_mask, device=self.model.device),
+        )
+        if shared:
+            inputs["past_key_values"] = self.prefix_cache.get(len(prompts))
+        return inputs
+
+    def generation_config(self, **input_kwargs) -> GenerationConfig:
         do_sample = input_kwargs.pop("do_sample", None)
         temperature = input_kwargs.pop("temperature", None)
         top_p = input_kwargs.pop("top_p", None)
@@ -81,13 +187,10 @@ class ChatModel:
             generating_args.pop("max_length", None)
             generating_args["max_new_tokens"] = max_new_tokens
 
-        gen_kwargs = dict(
-            inputs=input_ids,
-            generation_config=GenerationConfig(**generating_args),
-            logits_processor=get_logits_processor(),
-        )
-
-        return gen_kwargs, prompt_length
+        generation_config = GenerationConfig(**generating_args)
+        # set afterwards, some versions cannot build a default static cache config
+        generation_config.cache_implementation = self.cache_implementation
+        return generation_config
 
     @torch.inference_mode()
     def chat(
@@ -101,15 +204,58 @@ class ChatModel:
             query, history, system, **input_kwargs
         )
         with torch.no_grad():
-            generation_output = self.model.generate(**gen_kwargs)
+            if self.speculation is not None:
+                generation_output = self.speculation.generate(self.model, **gen_kwargs)
+            else:
+                generation_output = self.model.generate(**gen_kwargs)
             outputs = generation_output.tolist()[0][prompt_length:]
             response = self.tokenizer.decode(outputs, skip_special_tokens=True)
             response_length = len(outputs)
-            torch.cuda.empty_cache()
-            torch.cuda.ipc_collect()
-            gc.collect()
+            self.memory_policy.after_generation()
             return response, (prompt_length, response_length)
 
+    @torch.inference_mode()
+    def chat_batch(
+        self,
+        queries: List[str],
+        history: Optional[List[Tuple[str, str]]] = None,
+        system: Optional[str] = None,
+        **input_kwargs
+    ) -> List[Tuple[str, Tuple[int, int]]]:
+        """
+        Generates responses for several queries with a single `model.generate` call.
+        Prompts are padded to the longest one (see `batch_inputs`), so every row
+        continues right after its prompt; returns one
+        (response, (prompt_length, response_length)) per query, in the same order.
+        Speculative decoding only supports a batch of one, so with it the
+        queries are answered one by one with `chat`.
+        """
+        if self.speculation is not None:
+            return [self.chat(query, history, system, **input_kwargs) for query in queries]
+
+        prompts = [self.encode_prompt(query, history, system) for query in queries]
+        width = max(len(prompt) for prompt in prompts)
+        generation_config = self.generation_config(**input_kwargs)
+        eos_token_ids = set(generation_config.eos_token_id)
+
+        generation_output = self.model.generate(
+            **self.batch_inputs(prompts, generation_config),
+            generation_config=generation_config,
+            logits_processor=self.logits_processor(generation_config),
+        )
+        results = []
+        for prompt, row in zip(prompts, generation_output.tolist()):
+            outputs = row[width:]
+            # rows that finished early are padded up to the longest generation
+            for i, token in enumerate(outputs):
+                if token in eos_token_ids:
+                    outputs = outputs[: i + 1]
+                    break
+            response = self.tokenizer.decode(outputs, skip_special_tokens=True)
+            results.append((response, (len(prompt), len(outputs))))
+        self.memory_policy.after_generation()
+        return results
+
     @torch.inference_mode()
     def stream_chat(
         self,
@@ -124,7 +270,12 @@ class ChatModel:
         )
         gen_kwargs["streamer"] = streamer
 
-        thread = Thread(target=self.model.generate, kwargs=gen_kwargs)
+        generate = (
+            self.model.generate
+            if self.speculation is None
+            else partial(self.speculation.generate, self.model)
+        )
+        thread = Thread(target=generate, kwargs=gen_kwargs)
         thread.start()
 
         yield from streamer
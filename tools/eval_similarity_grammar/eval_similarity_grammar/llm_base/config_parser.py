@@ -243,6 +243,11 @@ def get_infer_args(
     ):
         raise ValueError("Quantization is only compatible with the LoRA method.")
 
+    if model_args.quantization_bit is not None and not torch.cuda.is_available():
+        raise ValueError(
+            "Quantization with bitsandbytes requires CUDA, use `cpu_quantization` on CPU."
+        )
+
     if model_args.checkpoint_dir is not None:
         if finetuning_args.finetuning_type != "lora":
             if len(model_args.checkpoint_dir) != 1:
@@ -0,0 +1,108 @@
+from typing import TYPE_CHECKING, Optional
+
+import torch
+from transformers import PreTrainedModel
+
+from .loggings import get_logger
+
+if TYPE_CHECKING:
+    from ..configs.model_args import ModelArguments
+
+
+logger = get_logger(__name__)
+
+
+def is_cpu_bf16_supported() -> bool:
+    r"""
+    Whether the CPU has native bf16 instructions (AVX512-BF16 or AMX), without
+    which bf16 matmuls are emulated and slower than fp32.
+    """
+    try:
+        return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def configure_threads(
+    num_threads: Optional[int] = None, num_interop_threads: Optional[int] = None
+) -> None:
+    r"""
+    Sets the intra-op (within a matmul) and inter-op (between independent
+    ops) thread pools. The inter-op pool can only be sized before it is used.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            logger.warning("Inter-op threads must be set before any parallel work, ignored.")
+    logger.info(
+        "CPU threads: {} intra-op, {} inter-op.".format(
+            torch.get_num_threads(), torch.get_num_interop_threads()
+        )
+    )
+
+
+def quantize_linear_int8(model: PreTrainedModel) -> PreTrainedModel:
+    r"""
+    Dynamic int8 quantization of the linear layers: weights are stored in
+    int8 and activations quantized on the fly. The output layer is kept in
+    full precision, since the logits are the most sensitive to rounding.
+    """
+    output_layer = model.get_output_embeddings()
+    qconfig_spec = {
+        name: torch.ao.quantization.default_dynamic_qconfig
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and module is not output_layer
+    }
+    torch.ao.quantization.quantize_dynamic(
+        model, qconfig_spec, dtype=torch.qint8, inplace=True
+    )
+    logger.info("Quantized {} linear layers to int8.".format(len(qconfig_spec)))
+    return model
+
+
+def compile_forward(model: PreTrainedModel) -> PreTrainedModel:
+    r"""
+    Compiles the forward pass with torch.compile, falling back to eager mode
+    for good if the compiled forward fails (unsupported ops or model code).
+    Generation must use a static key/value cache, a growing cache makes every
+    step recompile.
+    """
+    eager_forward = model.forward
+    compiled_forward = torch.compile(eager_forward)
+
+    def forward(*args, **kwargs):
+        if model.forward is forward:
+            try:
+                return compiled_forward(*args, **kwargs)
+            except Exception as e:
+                logger.warning("torch.compile failed, running eagerly: {}".format(e))
+                model.forward = eager_forward
+        return eager_forward(*args, **kwargs)
+
+    model.forward = forward
+    return model
+
+
+def prepare_cpu_model(
+    model: PreTrainedModel, model_args: "ModelArguments"
+) -> PreTrainedModel:
+    r"""
+    Prepares a model for inference on CPU: bf16 weights where the CPU
+    supports them (fp32 otherwise), optional int8 dynamic quantization of
+    the linear layers (which computes in fp32), thread pools and
+    torch.compile.
+    """
+    configure_threads(model_args.cpu_threads, model_args.cpu_interop_threads)
+
+    if model_args.cpu_quantization == "int8":
+        model = quantize_linear_int8(model.to(torch.float32))
+    else:
+        model = model.to(torch.bfloat16 if is_cpu_bf16_supported() else torch.float32)
+        logger.info("CPU inference in {}.".format(model.dtype))
+
+    if model_args.torch_compile:
+        model = compile_forward(model)
+    return model
@@ -0,0 +1,305 @@
+import importlib
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+from transformers import PreTrainedTokenizer
+from transformers.generation.logits_process import LogitsProcessor
+
+from .loggings import get_logger
+
+logger = get_logger(__name__)
+
+GRAMMAR_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eval", "evaluator", "impl"
+)
+
+# grammar name -> (folder under eval/evaluator/impl, lexer, parser, start rule)
+GRAMMARS = {
+    "lcypher": ("tugraph-db", "LcypherLexer", "LcypherParser", "oC_Cypher"),
+    "gql": ("iso-gql", "GQLLexer", "GQLParser", "gqlProgram"),
+}
+
+INVALID, INCOMPLETE, COMPLETE = 0, 1, 2
+
+# appended to a partial lexeme to check whether it can still become a token
+# (e.g. "3." -> "3.0", "'abc" -> "'abc'", "`na" -> "`na`")
+COMPLETION_PROBES = ("", "0", "'", '"', "`", "a")
+
+
+def _unescape(match: "re.Match") -> str:
+    escape = match.group(1)
+    if escape.startswith("u") and len(escape) == 5:
+        return chr(int(escape[1:], 16))
+    return {"n": "\n", "r": "\r", "t": "\t"}.get(escape, escape)
+
+
+class TerminalTrie:
+    r"""
+    Case-insensitive character trie over the literal terminals of a grammar
+    (keywords, punctuation), giving the terminal types a partial lexeme can
+    still turn into.
+    """
+
+    def __init__(self, literals: Dict[int, str]) -> None:
+        self.root = {}
+        for token_type, text in literals.items():
+            node = self.root
+            for char in text.lower():
+                node = node.setdefault(char, {})
+                node.setdefault(None, set()).add(token_type)
+
+    def types(self, prefix: str) -> set:
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+
+class GrammarOracle:
+    r"""
+    Answers whether a text can be continued into a statement of an ANTLR
+    grammar, using the lexer and parser generated for the grammar evaluators.
+
+    A text is lexed into complete tokens plus the lexeme at its end, which
+    may still grow. The complete token types are parsed with the start rule
+    (results are cached per token sequence): the prefix is invalid when the
+    parser fails before the end of the input, and complete when the whole
+    rule matches.
+    """
+
+    def __init__(self, grammar: str) -> None:
+        assert grammar in GRAMMARS, "Unknown grammar: {} (expected one of {})".format(
+            grammar, list(GRAMMARS)
+        )
+        import antlr4  # lazy load, only needed for constrained decoding
+        from antlr4.ListTokenSource import ListTokenSource
+        from antlr4.Token import CommonToken
+
+        folder, lexer_name, parser_name, start_rule = GRAMMARS[grammar]
+        grammar_path = os.path.join(GRAMMAR_DIR, folder)
+        if grammar_path not in sys.path:
+            sys.path.append(grammar_path)
+        self.antlr4 = antlr4
+        self.token_source_class = ListTokenSource
+        self.token_class = CommonToken
+        self.lexer_class = getattr(importlib.import_module(lexer_name), lexer_name)
+        self.parser_class = getattr(importlib.import_module(parser_name), parser_name)
+        self.start_rule = start_rule
+        self.literals = self._literals()
+        self.trie = TerminalTrie(self.literals)
+
+        self.status = lru_cache(maxsize=65536)(self._status)
+        self.lex = lru_cache(maxsize=65536)(self._lex)
+
+    def _literals(self) -> Dict[int, str]:
+        # the parser's name tables are indexed by token type, the lexer's are not
+        literals = {}
+        for token_type, name in enumerate(self.parser_class.literalNames):
+            if name.startswith("'") and name.endswith("'") and len(name) > 2:
+                literals[token_type] = re.sub(
+                    r"\\(u[0-9a-fA-F]{4}|.)", _unescape, name[1:-1]
+                )
+        for token_type, name in enumerate(self.parser_class.symbolicNames):
+            # case-insensitive keywords are declared with fragments, recognize them by lexing their name
+            if token_type not in literals and name.isupper():
+                tokens, error = self._lex(name)
+                if error is None and [t[0] for t in tokens] == [token_type]:
+                    literals[token_type] = name.lower()
+        return literals
+
+    def _lex(self, text: str) -> Tuple[Tuple[Tuple[int, int, int, int], ...], Optional[int]]:
+        r"""
+        ((type, start, stop, channel), ...) of the tokens of text, and the
+        position of the first lexer error (None if there is none).
+        """
+        antlr4 = self.antlr4
+        errors = []
+
+        class Listener(antlr4.error.ErrorListener.ErrorListener):
+            def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+                errors.append(getattr(e, "startIndex", None) or recognizer._tokenStartCharIndex)
+
+        lexer = self.lexer_class(antlr4.InputStream(text))
+        lexer.removeErrorListeners()
+        lexer.addErrorListener(Listener())
+        tokens = tuple(
+            (token.type, token.start, token.stop, token.channel)
+            for token in lexer.getAllTokens()
+        )
+        return tokens, (min(errors) if errors else None)
+
+    def _status(self, token_types: Tuple[int, ...]) -> int:
+        antlr4 = self.antlr4
+        tokens = []
+        for token_type in token_types:
+            token = self.token_class(type=token_type)
+            token.text = ""
+            token.line, token.column = 1, 0  # read when an error is reported
+            tokens.append(token)
+        parser = self.parser_class(antlr4.CommonTokenStream(self.token_source_class(tokens)))
+        parser.removeErrorListeners()
+        parser._errHandler = antlr4.BailErrorStrategy()
+        try:
+            getattr(parser, self.start_rule)()
+        except antlr4.error.Errors.ParseCancellationException as e:
+            cause = e.args[0] if e.args else None
+            offending = getattr(cause, "offendingToken", None)
+            if offending is not None and offending.type == antlr4.Token.EOF:
+                return INCOMPLETE
+            return INVALID
+        return COMPLETE
+
+    def split(self, text: str, open_tokens: int = 1) -> Tuple[Tuple[int, ...], str]:
+        r"""
+        Default-channel types of the tokens that cannot change anymore, and
+        the text at the end that may still grow into a token: from the first
+        lexer error, or the last `open_tokens` tokens if the last one touches
+        the end of the text (e.g. "3." may become "3.5").
+        """
+        tokens, error = self.lex(text)
+        tokens = [token for token in tokens if token[3] == 0]
+        if error is not None:
+            tokens = [token for token in tokens if token[1] < error]
+            open_from = error
+        elif tokens and tokens[-1][2] == len(text) - 1:
+            tokens, opened = tokens[:-open_tokens], tokens[-open_tokens:]
+            open_from = opened[0][1]
+        else:
+            open_from = len(text)
+        return tuple(token[0] for token in tokens), text[open_from:]
+
+    def viable(self, text: str) -> bool:
+        r"""
+        Whether text is the beginning of a statement of the grammar.
+        """
+        for open_tokens in (1, 2):
+            complete, partial = self.split(text, open_tokens)
+            status = self.status(complete)
+            if status == INVALID:
+                continue
+            if not partial or any(
+                self.status(complete + (token_type,)) != INVALID
+                for token_type in self._partial_types(partial)
+            ):
+                return True
+        return False
+
+    def _partial_types(self, partial: str) -> set:
+        types = set(self.trie.types(partial))
+        for probe in COMPLETION_PROBES:
+            tokens, error = self.lex(partial + probe)
+            if error is None and len(tokens) == 1:
+                types.add(tokens[0][0])
+        return types
+
+    def complete(self, text: str) -> bool:
+        r"""
+        Whether text is a whole statement of the grammar.
+        """
+        tokens, error = self.lex(text)
+        if error is not None:
+            return False
+        return self.status(tuple(token[0] for token in tokens if token[3] == 0)) == COMPLETE
+
+
+class GrammarConstraint:
+    r"""
+    Grammar oracle plus the text each vocabulary token appends to a
+    generation, computed once for the tokenizer.
+    """
+
+    def __init__(self, grammar: str, tokenizer: PreTrainedTokenizer) -> None:
+        self.oracle = GrammarOracle(grammar)
+        self.pieces = self._pieces(tokenizer)
+        logger.info(
+            "Grammar-constrained decoding with {}: {} terminal literals, {} usable tokens.".format(
+                grammar, len(self.oracle.literals), sum(p is not None for p in self.pieces)
+            )
+        )
+
+    @staticmethod
+    def _pieces(tokenizer: PreTrainedTokenizer) -> List[Optional[str]]:
+        special_ids = set(tokenizer.all_special_ids)
+        # decode after an anchor so that leading spaces are kept
+        anchor_ids = tokenizer.encode("a", add_special_tokens=False)
+        anchor = tokenizer.decode(anchor_ids)
+        texts = tokenizer.batch_decode(
+            [anchor_ids + [token_id] for token_id in range(len(tokenizer))]
+        )
+        pieces = []
+        for token_id, text in enumerate(texts):
+            text = text[len(anchor) :] if text.startswith(anchor) else None
+            if token_id in special_ids or not text or "\ufffd" in text:
+                text = None
+            pieces.append(text)
+        return pieces
+
+    def processor(
+        self, eos_token_ids: Sequence[int], num_allowed: int = 1, max_candidates: int = 256
+    ) -> "GrammarLogitsProcessor":
+        return GrammarLogitsProcessor(self, eos_token_ids, num_allowed, max_candidates)
+
+
+class GrammarLogitsProcessor(LogitsProcessor):
+    r"""
+    Masks the tokens that cannot continue a valid statement.
+
+    Candidates are checked in order of decreasing score until `num_allowed`
+    of them are known to be valid (1 for greedy decoding, top_k for
+    sampling); all other tokens are masked. The stop tokens are only allowed
+    once the text is a complete statement, and they are forced when the
+    statement is complete and the best token would leave the grammar, so
+    generation ends as soon as the query does.
+    """
+
+    def __init__(
+        self,
+        constraint: GrammarConstraint,
+        eos_token_ids: Sequence[int],
+        num_allowed: int = 1,
+        max_candidates: int = 256,
+    ) -> None:
+        self.oracle = constraint.oracle
+        self.pieces = constraint.pieces
+        self.eos_token_ids = list(eos_token_ids)
+        self.num_allowed = max(num_allowed, 1)
+        self.max_candidates = max_candidates
+        self.prompt_length = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+        mask = torch.ones_like(scores, dtype=torch.bool)
+        candidates = torch.topk(scores, min(self.max_candidates, scores.shape[-1]), dim=-1).indices.tolist()
+        for row, generated in enumerate(input_ids[:, self.prompt_length :].tolist()):
+            if any(token in self.eos_token_ids for token in generated):
+                mask[row] = False  # finished, generate only appends padding
+                continue
+            mask[row, self._allowed(generated, candidates[row])] = False
+        return scores.masked_fill(mask, float("-inf"))
+
+    def _allowed(self, generated: List[int], candidates: List[int]) -> List[int]:
+        text = "".join(self.pieces[token] or "" for token in generated)
+        complete = self.oracle.complete(text)
+        allowed = []
+        for rank, token in enumerate(candidates):
+            if token in self.eos_token_ids:
+                valid = complete
+            else:
+                # the embedding matrix may have more rows than the tokenizer has tokens
+                piece = self.pieces[token] if token < len(self.pieces) else None
+                valid = piece is not None and self.oracle.viable(text + piece)
+            if rank == 0 and complete and not valid:
+                return self.eos_token_ids
+            if valid:
+                allowed.append(token)
+                if len(allowed) >= self.num_allowed:
+                    break
+        # nothing valid among the candidates: end the generation
+        return allowed or self.eos_token_ids
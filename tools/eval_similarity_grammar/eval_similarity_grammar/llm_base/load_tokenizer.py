@@ -23,7 +23,8 @@ from trl import AutoModelForCausalLMWithValueHead
 
 from ..configs.config import LAYERNORM_NAMES, VALUE_HEAD_FILE_NAME
 from ..configs.model_args import FinetuningArguments
-from .adapter import init_adapter
+from .adapter import init_adapter, merged_model_path
+from .cpu_inference import prepare_cpu_model
 from .loggings import get_logger, reset_logging
 
 if TYPE_CHECKING:
@@ -290,6 +291,18 @@ def load_model_and_tokenizer(
         )
         logger.info("Quantizing model to {} bit.".format(model_args.quantization_bit))
 
+    # Load the merged weights cached by an earlier run instead of merging the LoRA checkpoints again.
+    if (
+        not is_trainable
+        and is_mergeable
+        and finetuning_args.finetuning_type == "lora"
+    ):
+        merged_path = merged_model_path(model_args, model_to_load)
+        if merged_path is not None and os.path.isdir(merged_path):
+            logger.info("Loading merged model from cache: {}".format(merged_path))
+            model_to_load = merged_path
+            finetuning_args = FinetuningArguments(finetuning_type="none")
+
     # Load and prepare pre-trained models (without valuehead).
     model = AutoModelForCausalLM.from_pretrained(
         model_to_load,
@@ -354,10 +367,13 @@ def load_model_and_tokenizer(
     # Prepare model for inference
     if not is_trainable:
         model.requires_grad_(False)  # fix all model params
-        infer_dtype = (
-            torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
-        )  # detect cuda capability
-        model = model.to(infer_dtype) if model_args.quantization_bit is None else model
+        if not torch.cuda.is_available():
+            model = prepare_cpu_model(model, model_args)
+        elif model_args.quantization_bit is None:
+            infer_dtype = (
+                torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            )  # detect cuda capability
+            model = model.to(infer_dtype)
 
     trainable_params, all_param = count_parameters(model)
     logger.info(
@@ -369,6 +385,32 @@ def load_model_and_tokenizer(
     return model, tokenizer
 
 
+def load_draft_model(
+    model_args: "ModelArguments", model: PreTrainedModel
+) -> PreTrainedModel:
+    r"""
+    Loads the draft model of speculative decoding on the device and in the
+    dtype of the target model. It must use the tokenizer of the target model.
+    """
+    draft_model = AutoModelForCausalLM.from_pretrained(
+        model_args.draft_model_name_or_path,
+        torch_dtype=model.dtype,
+        low_cpu_mem_usage=True,
+        trust_remote_code=True,
+        cache_dir=model_args.cache_dir,
+        use_auth_token=True if model_args.use_auth_token else None,
+    )
+    if draft_model.config.vocab_size != model.config.vocab_size:
+        logger.warning(
+            "The draft model {} has a different vocabulary size than the model, "
+            "its tokens may not match.".format(model_args.draft_model_name_or_path)
+        )
+    draft_model.requires_grad_(False)
+    draft_model.eval()
+    logger.info("Loaded draft model: {}".format(model_args.draft_model_name_or_path))
+    return draft_model.to(model.device)
+
+
 def dispatch_model(model: "PreTrainedModel") -> "PreTrainedModel":
     r"""
     Dispatches a pre-trained model to GPUs with balanced memory.
@@ -379,6 +421,9 @@ def dispatch_model(model: "PreTrainedModel") -> "PreTrainedModel":
     ):  # do nothing
         return model
 
+    if not torch.cuda.is_available():  # stays on CPU, see prepare_cpu_model
+        return model
+
     if torch.cuda.device_count() > 1:
         from accelerate import dispatch_model
         from accelerate.utils import get_balanced_memory, infer_auto_device_map
@@ -0,0 +1,104 @@
+import gc
+from typing import Any, Dict, Optional
+
+import torch
+
+from .loggings import get_logger
+
+logger = get_logger(__name__)
+
+MEMORY_CLEANUP_MODES = ("never", "every_n", "pressure")
+
+
+def memory_usage() -> Optional[float]:
+    r"""
+    Fraction of device memory in use: the fullest GPU when CUDA is available,
+    otherwise the host memory (Linux only), None when it cannot be read.
+    """
+    if torch.cuda.is_available():
+        fractions = []
+        for device in range(torch.cuda.device_count()):
+            free, total = torch.cuda.mem_get_info(device)
+            fractions.append(1 - free / total)
+        return max(fractions)
+
+    try:
+        with open("/proc/meminfo") as f:
+            meminfo = {
+                line.split(":")[0]: int(line.split()[1]) for line in f if ":" in line
+            }
+        return 1 - meminfo["MemAvailable"] / meminfo["MemTotal"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class MemoryPolicy:
+    r"""
+    Decides when to release memory between generations.
+
+    Releasing (gc.collect plus emptying the CUDA caching allocator) is costly
+    and makes the next generation allocate again, so by default it only
+    happens when memory usage reaches the threshold:
+    - never: leave everything to the allocator
+    - every_n: release after every `interval` generations
+    - pressure: release when memory_usage() >= `threshold`
+    """
+
+    def __init__(
+        self, mode: str = "pressure", interval: int = 100, threshold: float = 0.9
+    ) -> None:
+        assert mode in MEMORY_CLEANUP_MODES, "Unknown memory cleanup mode: {}".format(
+            mode
+        )
+        self.mode = mode
+        self.interval = max(interval, 1)
+        self.threshold = threshold
+        self.calls = 0
+        self.releases = 0
+
+    def after_generation(self) -> None:
+        self.calls += 1
+        if self.mode == "every_n":
+            release = self.calls % self.interval == 0
+        elif self.mode == "pressure":
+            usage = memory_usage()
+            release = usage is not None and usage >= self.threshold
+        else:
+            release = False
+
+        if release:
+            self.release()
+
+    def release(self) -> None:
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            torch.cuda.ipc_collect()
+        self.releases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        r"""
+        Release counters and allocator statistics, sizes in GiB.
+        """
+        stats = {
+            "mode": self.mode,
+            "generations": self.calls,
+            "releases": self.releases,
+        }
+        if torch.cuda.is_available():
+            gib = 1024**3
+            for device in range(torch.cuda.device_count()):
+                allocator = torch.cuda.memory_stats(device)
+                stats["cuda:{}".format(device)] = {
+                    "allocated": round(torch.cuda.memory_allocated(device) / gib, 2),
+                    "reserved": round(torch.cuda.memory_reserved(device) / gib, 2),
+                    "peak_allocated": round(
+                        torch.cuda.max_memory_allocated(device) / gib, 2
+                    ),
+                    "alloc_retries": allocator.get("num_alloc_retries", 0),
+                    "ooms": allocator.get("num_ooms", 0),
+                }
+        usage = memory_usage()
+        if usage is not None:
+            stats["memory_usage"] = round(usage, 3)
+        return stats
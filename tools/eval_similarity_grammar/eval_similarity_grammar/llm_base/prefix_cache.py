@@ -0,0 +1,83 @@
+from typing import List, Optional, Tuple
+
+import torch
+from transformers import DynamicCache
+
+from .loggings import get_logger
+
+logger = get_logger(__name__)
+
+
+def common_prefix_length(a: List[int], b: List[int]) -> int:
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class PrefixCache:
+    r"""
+    Keeps the key/value states of the token prefix shared by all prompts
+    (system prompt, template and instruction), so generation only prefills
+    the part of each prompt after it.
+
+    The prefix is the longest common prefix of the prompts seen so far; it
+    is computed once two different prompts have been seen, and recomputed
+    only if a later prompt shares less of it. Every request gets its own
+    copy of the states, since generation appends to them.
+    """
+
+    def __init__(self, model: torch.nn.Module, min_length: int = 32) -> None:
+        self.model = model
+        self.min_length = min_length
+        self.prefix: Optional[List[int]] = None
+        self.past_key_values: Optional[Tuple[Tuple[torch.Tensor, torch.Tensor], ...]] = None
+
+    @property
+    def length(self) -> int:
+        return len(self.prefix) if self.past_key_values is not None else 0
+
+    def update(self, prompts: List[List[int]]) -> int:
+        r"""
+        Observes the prompts of a request and returns the number of leading
+        tokens they share with the cached states (0: do not use the cache).
+        At least one token of every prompt is left to prefill.
+        """
+        if self.prefix is None and all(prompt == prompts[0] for prompt in prompts):
+            # a single prompt does not tell which part of it is shared,
+            # keep it to compare with the next request
+            self.prefix = prompts[0]
+            return 0
+
+        prefix = self.prefix if self.prefix is not None else prompts[0]
+        length = len(prefix)
+        for prompt in prompts:
+            length = min(length, common_prefix_length(prefix, prompt), len(prompt) - 1)
+        if self.past_key_values is None or length != len(self.prefix):
+            self.prefix = prefix[:length]
+            self.past_key_values = None
+            if length >= self.min_length:
+                self._compute()
+        return self.length
+
+    @torch.inference_mode()
+    def _compute(self) -> None:
+        input_ids = torch.tensor([self.prefix], device=self.model.device)
+        past_key_values = self.model(input_ids=input_ids, use_cache=True).past_key_values
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+        self.past_key_values = past_key_values
+        logger.info("Cached the key/value states of a {}-token prompt prefix.".format(len(self.prefix)))
+
+    def get(self, batch_size: int) -> DynamicCache:
+        r"""
+        A fresh cache holding the prefix states for each of `batch_size` rows.
+        """
+        return DynamicCache.from_legacy_cache(
+            tuple(
+                (key.repeat(batch_size, 1, 1, 1), value.repeat(batch_size, 1, 1, 1))
+                for key, value in self.past_key_values
+            )
+        )
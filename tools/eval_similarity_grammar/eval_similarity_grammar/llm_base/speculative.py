@@ -0,0 +1,73 @@
+import time
+from typing import Any, Dict
+
+import torch
+
+
+class SpeculationStats:
+    r"""
+    Acceptance rate and throughput of speculative (assisted) generation.
+
+    Every forward pass of the target model emits one token of its own plus
+    the drafted tokens it accepts, and is fed the drafted tokens after the
+    last emitted one. Counting the forward passes and their input lengths
+    therefore gives the drafted and accepted tokens whether they come from
+    a draft model or from prompt lookup.
+    """
+
+    def __init__(self) -> None:
+        self.generations = 0
+        self.new_tokens = 0
+        self.forwards = 0
+        self.drafted = 0
+        self.seconds = 0.0
+
+    @torch.inference_mode()
+    def generate(self, model: torch.nn.Module, **gen_kwargs) -> torch.Tensor:
+        r"""
+        Runs `model.generate` (batch size 1) and records its statistics.
+        """
+        prompt_length = gen_kwargs["inputs"].shape[1]
+        forwards, drafted = [0], [0]
+
+        def count(module, args, kwargs):
+            input_ids = kwargs.get("input_ids")
+            if input_ids is None:
+                return
+            if forwards[0] == 0:
+                # the first pass also prefills the prompt (after any cached prefix)
+                past_key_values = kwargs.get("past_key_values")
+                past_length = (
+                    past_key_values.get_seq_length()
+                    if hasattr(past_key_values, "get_seq_length")
+                    else 0
+                )
+                drafted[0] += input_ids.shape[1] - (prompt_length - past_length)
+            else:
+                drafted[0] += input_ids.shape[1] - 1
+            forwards[0] += 1
+
+        handle = model.register_forward_pre_hook(count, with_kwargs=True)
+        start_time = time.time()
+        try:
+            output = model.generate(**gen_kwargs)
+        finally:
+            handle.remove()
+        self.seconds += time.time() - start_time
+        self.generations += 1
+        self.new_tokens += output.shape[1] - prompt_length
+        self.forwards += forwards[0]
+        self.drafted += drafted[0]
+        return output
+
+    def stats(self) -> Dict[str, Any]:
+        accepted = max(self.new_tokens - self.forwards, 0)
+        return {
+            "generations": self.generations,
+            "new_tokens": self.new_tokens,
+            "drafted_tokens": self.drafted,
+            "accepted_tokens": accepted,
+            "acceptance_rate": round(accepted / max(self.drafted, 1), 3),
+            "tokens_per_forward": round(self.new_tokens / max(self.forwards, 1), 2),
+            "tokens_per_second": round(self.new_tokens / max(self.seconds, 1e-9), 2),
+        }
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT_PATH)
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from eval_similarity_grammar.llm_base.batch_scheduler import ContinuousBatchScheduler
+from eval_similarity_grammar.llm_base.chat_model import ChatModel
+
+
+def parse_messages(
+    messages: List[Dict[str, str]]
+) -> Tuple[str, List[Tuple[str, str]], Optional[str]]:
+    r"""
+    Splits OpenAI chat messages into (query, history, system) for the template:
+    the last user message, the earlier (user, assistant) turns and the system
+    messages joined.
+    """
+    system = "\n".join(m["content"] for m in messages if m["role"] == "system") or None
+    turns = [m for m in messages if m["role"] in ("user", "assistant")]
+    if not turns or turns[-1]["role"] != "user":
+        raise ValueError("The last message must come from the user.")
+    history, pending = [], None
+    for message in turns[:-1]:
+        if message["role"] == "user":
+            pending = message["content"]
+        elif pending is not None:
+            history.append((pending, message["content"]))
+            pending = None
+    return turns[-1]["content"], history, system
+
+
+class ChatCompletionHandler(BaseHTTPRequestHandler):
+    r"""
+    OpenAI-compatible `/v1/chat/completions` (non-streaming) and `/v1/models`.
+    Each request runs in its own thread and waits for its sequence in the
+    scheduler's running batch.
+    """
+
+    chat_model: ChatModel = None
+    scheduler: ContinuousBatchScheduler = None
+    model_name: str = None
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str) -> None:
+        self._reply(status, {"error": {"message": message, "type": "invalid_request_error"}})
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") != "/v1/models":
+            return self._error(404, "Unknown path: {}".format(self.path))
+        self._reply(
+            200,
+            {"object": "list", "data": [{"id": self.model_name, "object": "model", "owned_by": "local"}]},
+        )
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            return self._error(404, "Unknown path: {}".format(self.path))
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if request.get("stream"):
+                raise ValueError("Streaming is not supported.")
+            query, history, system = parse_messages(request["messages"])
+        except (ValueError, KeyError, TypeError) as e:
+            return self._error(400, str(e))
+
+        input_kwargs = {
+            "temperature": request.get("temperature"),
+            "top_p": request.get("top_p"),
+            "max_new_tokens": request.get("max_tokens") or request.get("max_completion_tokens"),
+        }
+        if request.get("temperature") == 0:  # greedy decoding, as OpenAI does
+            input_kwargs["do_sample"], input_kwargs["temperature"] = False, None
+        prompt = self.chat_model.encode_prompt(query, history, system)
+        try:
+            sequence = self.scheduler.generate(prompt, **input_kwargs)
+        except Exception as e:
+            return self._reply(500, {"error": {"message": str(e), "type": "server_error"}})
+
+        content = self.chat_model.tokenizer.decode(sequence.tokens, skip_special_tokens=True)
+        self._reply(
+            200,
+            {
+                "id": "chatcmpl-{}".format(uuid.uuid4().hex),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", self.model_name),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": sequence.finish_reason,
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": len(prompt),
+                    "completion_tokens": len(sequence.tokens),
+                    "total_tokens": len(prompt) + len(sequence.tokens),
+                },
+            },
+        )
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # one line per request is too much at high concurrency
+
+
+def serve(model: ChatModel) -> None:
+    args = model.data_args
+    ChatCompletionHandler.chat_model = model
+    ChatCompletionHandler.scheduler = ContinuousBatchScheduler(model, args.server_max_batch_size)
+    ChatCompletionHandler.model_name = os.path.basename(
+        model.model.config._name_or_path.rstrip("/")
+    )
+    server = ThreadingHTTPServer((args.server_host, args.server_port), ChatCompletionHandler)
+    print(
+        f"Serving {ChatCompletionHandler.model_name} on "
+        f"http://{args.server_host}:{args.server_port}/v1 (max batch size {args.server_max_batch_size})"
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    model = ChatModel()
+    serve(model)
@@ -0,0 +1,153 @@
+import glob
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT_PATH)
+
+from typing import Any, Dict, List, Optional, Set
+
+from eval_similarity_grammar.llm_base.config_parser import get_infer_args
+
+
+def parse_cpu_list(cpulist: str) -> Set[int]:
+    r"""
+    Parses a kernel cpu list such as "0-15,32-47".
+    """
+    cpus = set()
+    for part in cpulist.strip().split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.update(range(int(start), int(end) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def numa_nodes() -> List[Set[int]]:
+    r"""
+    Usable cores of each NUMA node, a single node with all usable cores when
+    the topology is not exposed (non-Linux, containers).
+    """
+    available = os.sched_getaffinity(0)
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        with open(path) as f:
+            cpus = parse_cpu_list(f.read()) & available
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [available]
+
+
+def assign_cores(num_workers: int) -> List[Set[int]]:
+    r"""
+    Core set of each worker. Workers are spread over the NUMA nodes round
+    robin and the cores of a node are split evenly between its workers, so a
+    replica and the memory it touches first stay on one socket. With fewer
+    workers than nodes, a worker gets several whole nodes.
+    """
+    nodes = [sorted(node) for node in numa_nodes()]
+    if num_workers <= len(nodes):
+        return [
+            set().union(*[set(node) for node in nodes[rank::num_workers]])
+            for rank in range(num_workers)
+        ]
+
+    cores = [set() for _ in range(num_workers)]
+    for n, node in enumerate(nodes):
+        workers = list(range(n, num_workers, len(nodes)))
+        for i, rank in enumerate(workers):
+            start = i * len(node) // len(workers)
+            end = (i + 1) * len(node) // len(workers)
+            # more workers than cores: they share
+            cores[rank] = set(node[start:end]) or {node[i % len(node)]}
+    return cores
+
+
+def _worker(
+    rank: int,
+    cpus: Set[int],
+    args: Optional[Dict[str, Any]],
+    items: List[Dict],
+    results: "multiprocessing.Queue",
+) -> None:
+    # pin before anything allocates, the model weights then live on the local node
+    os.sched_setaffinity(0, cpus)
+    import torch
+
+    torch.set_num_threads(len(cpus))
+
+    from eval_similarity_grammar.llm_base.chat_model import ChatModel
+    from eval_similarity_grammar.predict.predict import inference
+
+    model = ChatModel(args)
+    start_time = time.time()
+    responses = inference(
+        model,
+        items,
+        batch_size=model.data_args.predicted_batch_size,
+        batch_tokens=model.data_args.predicted_batch_tokens,
+    )
+    results.put((rank, responses, time.time() - start_time))
+
+
+def parallel_predict(args: Optional[Dict[str, Any]] = None) -> None:
+    r"""
+    Data-parallel prediction on CPU: the items are interleaved over
+    `predict_workers` processes, each with its own model replica pinned to a
+    core set (see `assign_cores`), and the responses are written back in the
+    order of the input file.
+
+    Workers are spawned and parse `args`, or the command line like the parent
+    when it is None.
+    """
+    from eval_similarity_grammar.predict.predict import prepare_dataset, write_predictions
+
+    _, data_args, _, _ = get_infer_args(args)
+    num_workers = data_args.predict_workers
+    predict_data = prepare_dataset(data_args.predicted_input_filename)
+    cores = assign_cores(num_workers)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = []
+    for rank in range(num_workers):
+        print(f"Worker {rank}: {len(predict_data[rank::num_workers])} items on cores {sorted(cores[rank])}")
+        worker = context.Process(
+            target=_worker,
+            args=(rank, cores[rank], args, predict_data[rank::num_workers], results),
+        )
+        worker.start()
+        workers.append(worker)
+
+    start_time = time.time()
+    result = [None] * len(predict_data)
+    for _ in range(num_workers):
+        while True:
+            try:
+                rank, responses, elapsed = results.get(timeout=10)
+                break
+            except queue.Empty:  # make sure no worker died
+                failed = [w.exitcode for w in workers if w.exitcode not in (None, 0)]
+                if failed:
+                    for w in workers:
+                        w.terminate()
+                    raise RuntimeError(f"Prediction worker exited with code {failed[0]}")
+        result[rank::num_workers] = responses
+        print(f"Worker {rank} done: {len(responses)} items in {elapsed:.1f}s")
+    for worker in workers:
+        worker.join()
+
+    elapsed = time.time() - start_time
+    print(
+        f"Inference summary: {len(result)} items in {elapsed:.1f}s "
+        f"({len(result) / max(elapsed, 1e-9):.2f} items/s) with {num_workers} workers"
+    )
+    write_predictions(result, data_args.predicted_out_filename)
+
+
+if __name__ == "__main__":
+    parallel_predict()
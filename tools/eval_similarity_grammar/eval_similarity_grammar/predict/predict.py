@@ -1,6 +1,7 @@
 import json
 import os
 import sys
+import time
 import torch
 import gc
 
@@ -11,6 +12,7 @@ from typing import Any, Dict, List, Optional
 
 from eval_similarity_grammar.data_process.data_utils import extract_sql_prompt_dataset
 from eval_similarity_grammar.llm_base.chat_model import ChatModel
+from eval_similarity_grammar.llm_base.config_parser import get_infer_args
 from tqdm import tqdm
 
 
@@ -23,14 +25,65 @@ def prepare_dataset(
     return predict_data
 
 
-def inference(model: ChatModel, predict_data: List[Dict], **input_kwargs):
-    res = []
-    # test
-    # for item in predict_data[:20]:
-    for item in tqdm(predict_data, desc="Inference Progress", unit="item"):
-        print(f"item[input] \n{item['input']}")
-        response, _ = model.chat(query=item["input"], history=[], **input_kwargs)
-        res.append(response)
+def schedule_batches(
+    lengths: List[int],
+    batch_size: int,
+    batch_tokens: Optional[int] = None,
+    new_tokens: int = 0,
+) -> List[List[int]]:
+    r"""
+    Groups item indices into batches of similar prompt length.
+
+    Items are taken longest first, so the first item of a batch fixes its
+    padded width. A batch grows up to `batch_size` items and, when
+    `batch_tokens` is given, while its padded prompts plus `new_tokens`
+    generated per row stay within that budget (an item that exceeds it on
+    its own still gets a batch).
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    for i in order:
+        if batches:
+            batch = batches[-1]
+            row_tokens = lengths[batch[0]] + new_tokens
+            fits = batch_tokens is None or (len(batch) + 1) * row_tokens <= batch_tokens
+            if len(batch) < batch_size and fits:
+                batch.append(i)
+                continue
+        batches.append([i])
+    return batches
+
+
+def inference(
+    model: ChatModel,
+    predict_data: List[Dict],
+    batch_size: int = 1,
+    batch_tokens: Optional[int] = None,
+    **input_kwargs
+):
+    res = [None] * len(predict_data)
+    # batch prompts of similar length so that little compute goes to padding,
+    # the responses are put back at the position of their item
+    lengths = [len(model.encode_prompt(item["input"], history=[])) for item in predict_data]
+    new_tokens = (
+        input_kwargs.get("max_new_tokens") or model.generating_args.max_new_tokens or 0
+    )
+    batches = schedule_batches(lengths, batch_size, batch_tokens, new_tokens)
+    padded = sum(len(batch) * lengths[batch[0]] for batch in batches)
+    print(
+        f"Scheduled {len(predict_data)} items in {len(batches)} batches, "
+        f"padding {1 - sum(lengths) / max(padded, 1):.1%} of prompt tokens"
+    )
+    with tqdm(total=len(predict_data), desc="Inference Progress", unit="item") as pbar:
+        for batch in batches:
+            for i in batch:
+                print(f"item[input] \n{predict_data[i]['input']}")
+            responses = model.chat_batch(
+                [predict_data[i]["input"] for i in batch], history=[], **input_kwargs
+            )
+            for i, (response, _) in zip(batch, responses):
+                res[i] = response
+            pbar.update(len(batch))
     return res
 
 
@@ -38,9 +91,26 @@ def predict(model: ChatModel):
     args = model.data_args
     ## predict file can be give by param --predicted_input_filename ,output_file can be gived by param predicted_out_filename
     predict_data = prepare_dataset(args.predicted_input_filename)
-    result = inference(model, predict_data)
+    start_time = time.time()
+    result = inference(
+        model,
+        predict_data,
+        batch_size=args.predicted_batch_size,
+        batch_tokens=args.predicted_batch_tokens,
+    )
+    elapsed = time.time() - start_time
+    print(
+        f"Inference summary: {len(result)} items in {elapsed:.1f}s "
+        f"({len(result) / max(elapsed, 1e-9):.2f} items/s), memory: {model.memory_policy.stats()}"
+    )
+    if model.speculation is not None:
+        print(f"Speculative decoding: {model.speculation.stats()}")
 
-    with open(args.predicted_out_filename, "w") as f:
+    write_predictions(result, args.predicted_out_filename)
+
+
+def write_predictions(result: List[str], predicted_out_filename: str):
+    with open(predicted_out_filename, "w") as f:
         for p in result:
             try:
                 f.write(p.replace("\n", " ") + "\n")
@@ -49,5 +119,11 @@ def predict(model: ChatModel):
 
 
 if __name__ == "__main__":
-    model = ChatModel()
-    predict(model)
+    _, data_args, _, _ = get_infer_args()
+    if data_args.predict_workers > 1:
+        from eval_similarity_grammar.predict.parallel_predict import parallel_predict
+
+        parallel_predict()
+    else:
+        model = ChatModel()
+        predict(model)
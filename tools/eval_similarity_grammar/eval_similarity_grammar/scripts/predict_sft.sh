@@ -29,6 +29,16 @@ CUDA_VISIBLE_DEVICES=0,1  python eval_similarity_grammar/predict/predict.py \
     --checkpoint_dir eval_similarity_grammar/output/adapter/CodeLlama-7b-gql-lora \
     --predicted_out_filename eval_similarity_grammar/output/pred/tugraph_db_example_dev.txt >> ${pred_log}
 
+## CPU-only machines: one model replica per NUMA node (or core set), results merged in input order
+# python eval_similarity_grammar/predict/predict.py \
+#     --model_name_or_path codellama/CodeLlama-7b-Instruct-hf \
+#     --template llama2 \
+#     --finetuning_type lora \
+#     --predicted_input_filename eval_similarity_grammar/data/tugraph-db-example/dev.json \
+#     --checkpoint_dir eval_similarity_grammar/output/adapter/CodeLlama-7b-gql-lora \
+#     --predict_workers 2 \
+#     --predicted_out_filename eval_similarity_grammar/output/pred/tugraph_db_example_dev.txt >> ${pred_log}
+
 echo "############pred end###############" >>${pred_log}
 echo "pred End time: $(date)" >>${pred_log}
 end_time=$(date +%s)